@@ -15,7 +15,8 @@ from flask_cors import CORS
 # 导入配置
 from backend.config import (
     DATABASE_PATH, OPEN_METEO_BASE_URL, CACHE_EXPIRE_HOURS,
-    FLASK_HOST, FLASK_PORT, FLASK_DEBUG, LOG_DIR, LOG_FILE
+    FLASK_HOST, FLASK_PORT, FLASK_DEBUG, LOG_DIR, LOG_FILE,
+    EXPORT_DIR, EXPORT_JOB_WORKERS, EXPORT_JOB_EXPIRE_HOURS, EXPORT_CACHE_DIR, EXPORT_CACHE_MAX_SIZE
 )
 
 # 导入模型和服务
@@ -26,9 +27,15 @@ from backend.services.weather_service import WeatherService
 from backend.services.data_exporter import DataExporter
 from backend.services.data_analyzer import DataAnalyzer
 from backend.services.data_manager import DataManager
+from backend.services.climatology import ClimatologyService
+from backend.services.data_importer import DataImporter
+from backend.services.export_jobs import ExportJobManager
+from backend.services.export_cache import ExportCache
 
 # 导入路由
 from backend.routes.api import api_bp, init_api_services
+from backend.middleware import init_compression
+from backend.json_provider import FastJSONProvider
 
 # 配置日志
 if not os.path.exists(LOG_DIR):
@@ -56,9 +63,15 @@ def create_app():
     # 创建Flask应用
     app = Flask(__name__, static_folder='../frontend', static_url_path='')
     
+    # 使用可直接序列化numpy/pandas类型的JSON提供器
+    app.json = FastJSONProvider(app)
+    
     # 启用CORS
     CORS(app)
     
+    # 启用响应压缩 (gzip/brotli)
+    init_compression(app)
+    
     # 初始化数据库管理器
     db_manager = DatabaseManager(DATABASE_PATH)
     
@@ -107,7 +120,7 @@ def create_app():
     data_exporter = DataExporter()
     
     # 初始化数据分析器
-    data_analyzer = DataAnalyzer()
+    data_analyzer = DataAnalyzer(db_manager)
     
     # 初始化数据管理器
     data_manager = DataManager(
@@ -116,13 +129,29 @@ def create_app():
         city_manager
     )
     
+    # 初始化气候基线服务
+    climatology_service = ClimatologyService(db_manager)
+    
+    # 初始化数据导入器
+    data_importer = DataImporter(db_manager)
+    
+    # 初始化异步导出任务管理器
+    export_jobs = ExportJobManager(EXPORT_DIR, EXPORT_JOB_WORKERS, EXPORT_JOB_EXPIRE_HOURS)
+    
+    # 初始化导出文件缓存
+    export_cache = ExportCache(EXPORT_CACHE_DIR, EXPORT_CACHE_MAX_SIZE)
+    
     # 初始化API服务
     init_api_services(
         weather_service,
         data_exporter,
         data_analyzer,
         city_manager,
-        data_manager
+        data_manager,
+        climatology_service,
+        data_importer,
+        export_jobs,
+        export_cache
     )
     
     # 注册蓝图
@@ -27,6 +27,53 @@ FLASK_HOST = '0.0.0.0'
 FLASK_PORT = 5001
 FLASK_DEBUG = True
 
+# 响应压缩配置
+COMPRESSION_MIN_SIZE = 1024  # 小于该字节数的响应不压缩
+COMPRESSION_LEVEL = 6  # gzip 压缩级别 (1-9)
+BROTLI_QUALITY = 5  # brotli 压缩质量 (0-11)，需安装可选依赖 brotli
+
+# 数据分析配置
+ANALYSIS_MAX_WORKERS = 4  # 多城市对比的最大进程数，1 表示不使用进程池
+PARALLEL_ANALYSIS_MIN_VALUES = 5_000_000  # 对比数据总值数超过该阈值时按字段并行计算
+PROCESS_START_METHOD = 'spawn'  # 进程池的启动方式；服务为多线程，fork 可能复制其他线程持有的锁导致子进程死锁
+
+# 气候基线配置
+CLIMATOLOGY_REF_START_YEAR = 1991  # 参考期起始年（WMO 标准气候期）
+CLIMATOLOGY_REF_END_YEAR = 2020  # 参考期结束年
+CLIMATOLOGY_FIELDS = [
+    'temperature_2m', 'relative_humidity_2m', 'precipitation', 'surface_pressure',
+    'wind_speed_10m', 'shortwave_radiation'
+]
+
+# 分位数直方图配置：字段 -> (下界, 箱宽, 箱数)，超出范围的值计入首/末箱
+HISTOGRAM_BINS = {
+    'temperature_2m': (-50.0, 0.1, 1000),
+    'relative_humidity_2m': (0.0, 1.0, 101),
+    'precipitation': (0.0, 0.1, 2000),
+    'surface_pressure': (800.0, 0.1, 3000),
+    'wind_speed_10m': (0.0, 0.1, 2000),
+    'shortwave_radiation': (0.0, 5.0, 300),
+}
+
+# 导出配置
+EXPORT_SPOOL_MAX_SIZE = 16 * 1024 * 1024  # 导出文件超过该字节数时由内存转存到临时文件
+EXPORT_WIDTH_SAMPLE_ROWS = 500  # Excel 列宽按表头与前若干行估算
+EXPORT_WRITE_CHUNK_ROWS = 10000  # Excel 每批转换并写入的行数
+EXPORT_DIR = os.path.join(BASE_DIR, 'data', 'exports')  # 异步导出任务的结果文件目录
+EXPORT_JOB_WORKERS = 2  # 同时执行的异步导出任务数
+EXPORT_JOB_EXPIRE_HOURS = 24  # 异步导出结果文件的保留时长
+EXPORT_CACHE_DIR = os.path.join(BASE_DIR, 'data', 'export_cache')  # 导出文件缓存目录
+EXPORT_CACHE_MAX_SIZE = 1024 * 1024 * 1024  # 导出缓存目录的最大字节数，超出后淘汰最久未使用的文件
+
+# 数据订阅配置（/api/data/feed）
+# 访问令牌，多个以逗号分隔，请求头 Authorization: Bearer <令牌>；未配置时接口不可用
+FEED_TOKENS = [t.strip() for t in os.environ.get('WEATHER_FEED_TOKENS', '').split(',') if t.strip()]
+FEED_BATCH_ROWS = 50000  # 每次从数据库读取并输出的行数（Arrow 每个批次的行数）
+
+# 导入配置
+IMPORT_BATCH_ROWS = 50000  # 导入时每批读取并写入的行数
+IMPORT_CACHE_SIZE_MB = 256  # 批量导入时数据库连接的页缓存大小
+
 # 时区配置
 TIMEZONE = 'Asia/Shanghai'
 
@@ -0,0 +1,125 @@
+"""
+批量导入脚本
+将 CSV / Parquet / Arrow IPC 格式的历史数据文件导入 weather_data
+
+用法:
+    python backend/import_data.py 文件1.csv 文件2.parquet
+    python backend/import_data.py 站点.csv --city-id 1 --map 时间=datetime --map 气温=temperature_2m
+"""
+import argparse
+import logging
+import time
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.models.database import DatabaseManager
+from backend.models.city import CityManager
+from backend.services.data_importer import DataImporter, IMPORT_FORMATS
+from backend.config import DATABASE_PATH, IMPORT_BATCH_ROWS, LOG_DIR, LOG_FILE
+
+# 配置日志
+if not os.path.exists(LOG_DIR):
+    os.makedirs(LOG_DIR)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler(LOG_FILE, encoding='utf-8'),
+        logging.StreamHandler()
+    ]
+)
+
+logger = logging.getLogger(__name__)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='批量导入历史天气数据文件')
+    parser.add_argument('files', nargs='+', help='CSV、Parquet 或 Arrow IPC 文件')
+    parser.add_argument('--format', choices=IMPORT_FORMATS, help='文件格式，默认按扩展名判断')
+    parser.add_argument('--city-id', type=int, help='文件中没有城市列时所有行使用的城市ID')
+    parser.add_argument(
+        '--map', action='append', default=[], metavar='源列=目标列',
+        help='列名映射，可重复，如 --map 时间=datetime'
+    )
+    parser.add_argument('--batch-rows', type=int, default=IMPORT_BATCH_ROWS, help='每批读取并写入的行数')
+    parser.add_argument(
+        '--keep-indexes', action='store_true',
+        help='写入期间保留 (city_id, datetime) 查询索引（默认先删除、导入后重建，少量数据导入大库时使用）'
+    )
+    parser.add_argument('--db', default=DATABASE_PATH, help='数据库路径')
+    return parser.parse_args(argv)
+
+
+def file_format_of(path: str, file_format: str = None) -> str:
+    """
+    确定文件格式
+
+    Args:
+        path: 文件路径
+        file_format: 指定的格式，None 时按扩展名判断
+
+    Returns:
+        csv、parquet 或 arrow
+    """
+    if file_format:
+        return file_format
+    extension = os.path.splitext(path)[1].lower()
+    formats = {'.csv': 'csv', '.parquet': 'parquet', '.arrow': 'arrow', '.feather': 'arrow'}
+    if extension not in formats:
+        raise ValueError(f"无法从扩展名判断文件格式: {path}，请使用 --format 指定")
+    return formats[extension]
+
+
+def import_files(args: argparse.Namespace) -> bool:
+    """
+    逐个导入文件，每个文件一个事务
+
+    Returns:
+        是否全部成功
+    """
+    column_map = {}
+    for item in args.map:
+        source, sep, target = item.partition('=')
+        if not sep or not source or not target:
+            logger.error(f"无效的列名映射: {item}，应为 源列=目标列")
+            return False
+        column_map[source] = target
+
+    db_manager = DatabaseManager(args.db)
+    db_manager.init_database()
+    if args.city_id is not None and not CityManager(db_manager).get_city_by_id(args.city_id):
+        logger.error(f"未知的城市: {args.city_id}")
+        return False
+    importer = DataImporter(db_manager)
+
+    success = True
+    for path in args.files:
+        started = time.time()
+        try:
+            result = importer.import_file(
+                path,
+                file_format_of(path, args.format),
+                column_map=column_map,
+                city_id=args.city_id,
+                batch_size=args.batch_rows,
+                defer_indexes=not args.keep_indexes,
+                progress=lambda rows: logger.info(f"  已写入 {rows} 行")
+            )
+            elapsed = time.time() - started
+            logger.info(
+                f"✓ {path}: {result['rows']} 行（跳过 {result['skipped']} 行），"
+                f"城市 {result['cities']}，字段 {len(result['fields'])} 个，用时 {elapsed:.1f} 秒"
+            )
+        except Exception as e:
+            logger.error(f"✗ {path}: 导入失败，未写入任何数据: {e}")
+            success = False
+    return success
+
+
+if __name__ == '__main__':
+    sys.exit(0 if import_files(parse_args()) else 1)
@@ -0,0 +1,155 @@
+"""
+JSON序列化提供器
+为Flask应用提供可直接序列化numpy/pandas类型的快速JSON编码
+优先使用可选依赖 orjson，未安装时回退到标准库 json
+"""
+import json
+import logging
+import math
+from typing import Any
+
+import numpy as np
+import pandas as pd
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - 取决于部署环境
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# orjson 基础选项：原生序列化numpy数组/标量，允许非字符串键，
+# datetime 交给 default 处理以保持与Flask默认编码一致
+ORJSON_OPTIONS = (
+    orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+    if orjson else 0
+)
+
+
+def _default(obj: Any) -> Any:
+    """
+    序列化编码器无法直接处理的对象
+
+    Args:
+        obj: 待序列化对象
+
+    Returns:
+        可被JSON编码的Python对象
+    """
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, (pd.Series, pd.Index)):
+        return obj.tolist()
+    if obj is pd.NaT or obj is pd.NA:
+        return None
+    if isinstance(obj, pd.Timestamp):
+        return obj.isoformat()
+    return DefaultJSONProvider.default(obj)
+
+
+def _sanitize(obj: Any) -> Any:
+    """
+    将NaN/Infinity替换为None（仅用于标准库回退路径）
+
+    Args:
+        obj: 待处理对象
+
+    Returns:
+        不含非有限浮点数的对象
+    """
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {key: _sanitize(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_sanitize(item) for item in obj]
+    if isinstance(obj, (np.generic, np.ndarray, pd.Series, pd.Index)):
+        return _sanitize(_default(obj))
+    return obj
+
+
+def dumps_compact(obj: Any) -> str:
+    """
+    紧凑序列化（保持键顺序，不排序），用于NDJSON等逐行输出
+
+    Args:
+        obj: 待序列化对象
+
+    Returns:
+        JSON字符串
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=ORJSON_OPTIONS).decode('utf-8')
+    try:
+        return json.dumps(obj, default=_default, ensure_ascii=False,
+                          separators=(',', ':'), allow_nan=False)
+    except ValueError:
+        return json.dumps(_sanitize(obj), default=_default, ensure_ascii=False,
+                          separators=(',', ':'))
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    快速JSON序列化提供器
+    numpy数组/标量、pandas标量和NaN无需预先转换即可直接输出，NaN输出为null
+    """
+
+    ensure_ascii = False
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        """
+        序列化为JSON字符串
+
+        Args:
+            obj: 待序列化对象
+            **kwargs: 传给标准库 json.dumps 的参数（指定时走标准库路径）
+
+        Returns:
+            JSON字符串
+        """
+        if orjson is not None and not kwargs:
+            return self._orjson_dumps(obj).decode('utf-8')
+
+        kwargs.setdefault('default', _default)
+        kwargs.setdefault('ensure_ascii', self.ensure_ascii)
+        kwargs.setdefault('sort_keys', self.sort_keys)
+        kwargs['allow_nan'] = False
+        try:
+            return json.dumps(obj, **kwargs)
+        except ValueError:
+            # 含NaN/Infinity，替换为null后重新编码
+            return json.dumps(_sanitize(obj), **kwargs)
+
+    def response(self, *args: Any, **kwargs: Any):
+        """
+        生成JSON响应，orjson 可用时直接输出字节避免二次编码
+
+        Returns:
+            Flask响应对象
+        """
+        obj = self._prepare_response_obj(args, kwargs)
+        pretty = self._pretty()
+
+        if orjson is not None:
+            body = self._orjson_dumps(obj, pretty)
+        else:
+            dump_args = {'indent': 2} if pretty else {'separators': (',', ':')}
+            body = self.dumps(obj, **dump_args) + '\n'
+
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+    def _orjson_dumps(self, obj: Any, pretty: bool = False) -> bytes:
+        """使用 orjson 序列化为字节；pretty 时按两格缩进输出"""
+        option = ORJSON_OPTIONS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE
+        return orjson.dumps(obj, default=_default, option=option)
+
+    def _pretty(self) -> bool:
+        """是否输出缩进格式（与Flask默认行为一致）"""
+        return self.compact is False or (self.compact is None and self._app.debug)
@@ -0,0 +1,185 @@
+"""
+HTTP响应中间件
+负责按 Accept-Encoding 协商压缩 JSON、CSV 和前端静态资源
+"""
+import gzip
+import logging
+import re
+import zlib
+from typing import Iterable, Iterator, Optional
+from flask import Flask, request, Response
+
+from backend.config import COMPRESSION_MIN_SIZE, COMPRESSION_LEVEL, BROTLI_QUALITY
+
+try:
+    import brotli
+except ImportError:  # brotli 为可选依赖，缺失时只提供 gzip
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# 可压缩的响应类型
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'application/x-ndjson',
+    'application/javascript',
+    'text/javascript',
+    'text/csv',
+    'text/css',
+    'text/html',
+    'text/plain',
+    'image/svg+xml',
+}
+
+
+# If-None-Match 中由本中间件追加的编码后缀，如 "abc-gzip"
+ETAG_SUFFIX_PATTERN = re.compile(r'-(br|gzip)"')
+
+# 记录剥离的编码后缀的 WSGI environ 键
+ETAG_SUFFIX_ENVIRON_KEY = 'weather.etag_encoding'
+
+
+def supported_encodings() -> list:
+    """按优先级返回服务端支持的压缩编码"""
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def negotiate_encoding() -> Optional[str]:
+    """
+    根据请求的 Accept-Encoding 选择压缩编码
+    
+    Returns:
+        编码名称，客户端不接受压缩时返回None
+    """
+    for encoding in supported_encodings():
+        if request.accept_encodings[encoding] > 0:
+            return encoding
+    return None
+
+
+def compress_bytes(data: bytes, encoding: str) -> bytes:
+    """
+    压缩完整的响应体
+    
+    Args:
+        data: 原始字节
+        encoding: br 或 gzip
+        
+    Returns:
+        压缩后的字节
+    """
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=COMPRESSION_LEVEL, mtime=0)
+
+
+def compress_stream(chunks: Iterable[bytes], encoding: str) -> Iterator[bytes]:
+    """
+    增量压缩流式响应，每个块都会刷新输出，保证数据及时到达客户端
+    
+    Args:
+        chunks: 原始字节块
+        encoding: br 或 gzip
+        
+    Yields:
+        压缩后的字节块
+    """
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        for chunk in chunks:
+            data = compressor.process(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+    else:
+        # wbits=31 输出 gzip 格式
+        compressor = zlib.compressobj(COMPRESSION_LEVEL, zlib.DEFLATED, 31)
+        for chunk in chunks:
+            data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            if data:
+                yield data
+        yield compressor.flush()
+
+
+def _strip_etag_suffix():
+    """
+    before_request 钩子：剥离 If-None-Match 中的编码后缀
+    
+    压缩后的响应使用 "<etag>-<编码>" 作为强 ETag，剥离后
+    send_file 和各路由即可直接与原始 ETag 比较
+    """
+    header = request.environ.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return
+    
+    match = ETAG_SUFFIX_PATTERN.search(header)
+    if match:
+        request.environ[ETAG_SUFFIX_ENVIRON_KEY] = match.group(1)
+        request.environ['HTTP_IF_NONE_MATCH'] = ETAG_SUFFIX_PATTERN.sub('"', header)
+
+
+def _compress_response(response: Response) -> Response:
+    """
+    after_request 钩子：对可压缩的响应进行压缩
+    
+    Args:
+        response: Flask响应
+        
+    Returns:
+        处理后的响应
+    """
+    if response.status_code == 304:
+        # 304 响应沿用客户端缓存表示的编码后缀
+        encoding = request.environ.get(ETAG_SUFFIX_ENVIRON_KEY)
+        etag, is_weak = response.get_etag()
+        if encoding and etag and not is_weak:
+            response.set_etag(f"{etag}-{encoding}")
+        return response
+    
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+    
+    # send_file 的文件下载按原样透传：不读入内存，且保持 Range / 断点续传的字节偏移正确
+    if response.direct_passthrough:
+        return response
+    
+    response.vary.add('Accept-Encoding')
+    
+    if (request.method == 'HEAD'
+            or response.status_code != 200
+            or 'Content-Encoding' in response.headers):
+        return response
+    
+    encoding = negotiate_encoding()
+    if encoding is None:
+        return response
+    
+    if response.is_streamed:
+        response.response = compress_stream(response.iter_encoded(), encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < COMPRESSION_MIN_SIZE:
+            return response
+        response.set_data(compress_bytes(data, encoding))
+    
+    response.headers['Content-Encoding'] = encoding
+    
+    # 强 ETag 必须区分不同编码的表示
+    etag, is_weak = response.get_etag()
+    if etag and not is_weak:
+        response.set_etag(f"{etag}-{encoding}")
+    
+    return response
+
+
+def init_compression(app: Flask):
+    """
+    为应用注册响应压缩
+    
+    Args:
+        app: Flask应用实例
+    """
+    app.before_request(_strip_etag_suffix)
+    app.after_request(_compress_response)
+    logger.info(f"响应压缩已启用，支持编码: {', '.join(supported_encodings())}")
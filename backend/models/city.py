@@ -4,11 +4,41 @@
 遵循单一职责原则
 """
 import logging
+import math
 from typing import List, Dict, Any, Optional, Tuple
 from backend.models.database import DatabaseManager
 
 logger = logging.getLogger(__name__)
 
+# 地球平均半径（km）
+EARTH_RADIUS_KM = 6371.0088
+
+# 每纬度对应的经线弧长（km）
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+# 最近邻检索的初始搜索半径（度）
+NEAREST_INITIAL_RADIUS_DEG = 0.5
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """
+    计算两点间的大圆距离
+    
+    Args:
+        lat1: 第一个点纬度
+        lon1: 第一个点经度
+        lat2: 第二个点纬度
+        lon2: 第二个点经度
+        
+    Returns:
+        距离（km）
+    """
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
 
 class CityManager:
     """
@@ -41,14 +71,20 @@ class CityManager:
             logger.error(f"初始化城市数据失败: {e}")
             raise
     
-    def get_all_cities(self) -> List[Dict[str, Any]]:
+    def get_all_cities(self, include_inactive: bool = False) -> List[Dict[str, Any]]:
         """
         获取所有启用的城市
         
+        Args:
+            include_inactive: 是否包含已停用的城市
+        
         Returns:
             城市列表
         """
-        sql = "SELECT * FROM city_config WHERE is_active = 1 ORDER BY id"
+        sql = "SELECT * FROM city_config"
+        if not include_inactive:
+            sql += " WHERE is_active = 1"
+        sql += " ORDER BY id"
         try:
             cities = self.db_manager.execute_query(sql)
             logger.debug(f"获取城市列表成功，共 {len(cities)} 个城市")
@@ -202,3 +238,175 @@ class CityManager:
         except Exception as e:
             logger.error(f"获取地区城市失败: {e}")
             raise
+    
+    def find_in_bbox(
+        self,
+        min_lat: float,
+        min_lon: float,
+        max_lat: float,
+        max_lon: float,
+        active_only: bool = True
+    ) -> List[Dict[str, Any]]:
+        """
+        查询经纬度矩形范围内的城市
+        
+        min_lon 大于 max_lon 时视为跨越180°经线的范围
+        
+        Args:
+            min_lat: 最小纬度
+            min_lon: 最小经度
+            max_lat: 最大纬度
+            max_lon: 最大经度
+            active_only: 是否只返回启用的城市
+            
+        Returns:
+            城市列表（按ID排序）
+        """
+        if min_lon <= max_lon:
+            lon_ranges = [(min_lon, max_lon)]
+        else:
+            lon_ranges = [(min_lon, 180.0), (-180.0, max_lon)]
+        
+        try:
+            cities = {}
+            for lon_lo, lon_hi in lon_ranges:
+                for city in self._query_bbox(min_lat, lon_lo, max_lat, lon_hi, active_only):
+                    cities[city['id']] = city
+            result = [cities[city_id] for city_id in sorted(cities)]
+            logger.debug(f"矩形范围查询成功，共 {len(result)} 个城市")
+            return result
+        except Exception as e:
+            logger.error(f"矩形范围查询城市失败: {e}")
+            raise
+    
+    def find_nearest(
+        self,
+        lat: float,
+        lon: float,
+        k: int = 1,
+        active_only: bool = True
+    ) -> List[Dict[str, Any]]:
+        """
+        查询距离指定坐标最近的k个城市
+        
+        以坐标为中心逐步扩大R*Tree检索范围，直到候选集中第k近的城市
+        落在检索框的内切圆内，保证结果与全表计算一致
+        
+        Args:
+            lat: 纬度
+            lon: 经度
+            k: 返回的城市数量
+            active_only: 是否只返回启用的城市
+            
+        Returns:
+            城市列表（按距离升序），每个城市附带 distance_km 字段
+        """
+        if k <= 0:
+            return []
+        
+        try:
+            if not self._has_spatial_index():
+                candidates = self._query_all(active_only)
+                return self._rank_by_distance(candidates, lat, lon)[:k]
+            
+            radius = NEAREST_INITIAL_RADIUS_DEG
+            while True:
+                half_lon = self._lon_half_width(lat, radius)
+                covers_world = radius >= 180 and half_lon >= 180
+                
+                min_lat, max_lat = max(lat - radius, -90.0), min(lat + radius, 90.0)
+                if half_lon >= 180:
+                    min_lon, max_lon = -180.0, 180.0
+                else:
+                    min_lon = (lon - half_lon + 180) % 360 - 180
+                    max_lon = (lon + half_lon + 180) % 360 - 180
+                
+                candidates = self.find_in_bbox(min_lat, min_lon, max_lat, max_lon, active_only)
+                if len(candidates) >= k or covers_world:
+                    ranked = self._rank_by_distance(candidates, lat, lon)
+                    if covers_world or ranked[k - 1]['distance_km'] <= self._search_radius_km(lat, radius, half_lon):
+                        logger.debug(f"最近城市查询成功: ({lat}, {lon}), k={k}, 候选 {len(candidates)} 个")
+                        return ranked[:k]
+                
+                radius *= 2
+        except Exception as e:
+            logger.error(f"查询最近城市失败: {e}")
+            raise
+    
+    def _has_spatial_index(self) -> bool:
+        """检查R*Tree空间索引是否可用"""
+        if not hasattr(self, '_spatial_index_available'):
+            self._spatial_index_available = self.db_manager.table_exists('city_rtree')
+            if not self._spatial_index_available:
+                logger.warning("城市空间索引不可用，坐标检索将使用全表扫描")
+        return self._spatial_index_available
+    
+    def _query_bbox(
+        self,
+        min_lat: float,
+        min_lon: float,
+        max_lat: float,
+        max_lon: float,
+        active_only: bool
+    ) -> List[Dict[str, Any]]:
+        """按矩形范围查询城市（不跨越180°经线）"""
+        active_clause = "AND c.is_active = 1" if active_only else ""
+        
+        if self._has_spatial_index():
+            sql = f"""
+                SELECT c.* FROM city_rtree r
+                JOIN city_config c ON c.id = r.id
+                WHERE r.max_lon >= ? AND r.min_lon <= ?
+                  AND r.max_lat >= ? AND r.min_lat <= ?
+                  {active_clause}
+            """
+            candidates = self.db_manager.execute_query(sql, (min_lon, max_lon, min_lat, max_lat))
+        else:
+            candidates = self._query_all(active_only)
+        
+        # R*Tree 以32位浮点存储边界，这里按原始坐标精确过滤
+        return [
+            city for city in candidates
+            if min_lat <= city['latitude'] <= max_lat and min_lon <= city['longitude'] <= max_lon
+        ]
+    
+    def _query_all(self, active_only: bool) -> List[Dict[str, Any]]:
+        """全表查询城市（空间索引不可用时的退化路径）"""
+        sql = "SELECT * FROM city_config"
+        if active_only:
+            sql += " WHERE is_active = 1"
+        return self.db_manager.execute_query(sql)
+    
+    @staticmethod
+    def _rank_by_distance(cities: List[Dict[str, Any]], lat: float, lon: float) -> List[Dict[str, Any]]:
+        """为城市附加距离并按距离升序排列"""
+        ranked = [
+            {**city, 'distance_km': haversine_km(lat, lon, city['latitude'], city['longitude'])}
+            for city in cities
+        ]
+        ranked.sort(key=lambda city: (city['distance_km'], city['id']))
+        return ranked
+    
+    @staticmethod
+    def _lon_half_width(lat: float, radius: float) -> float:
+        """计算检索框的经度半宽，使其东西方向与南北方向覆盖相近的距离"""
+        cos_lat = math.cos(math.radians(min(abs(lat) + radius, 90.0)))
+        if cos_lat <= radius / 180:
+            return 180.0
+        return min(radius / cos_lat, 180.0)
+    
+    @staticmethod
+    def _search_radius_km(lat: float, half_lat: float, half_lon: float) -> float:
+        """
+        计算检索框内切圆半径
+        
+        框外任意一点到中心的距离都不小于该半径
+        """
+        lat_km = half_lat * KM_PER_DEGREE
+        if half_lon >= 180:
+            return lat_km
+        # 到相距 half_lon 的经线大圆的最短距离
+        lon_km = math.asin(
+            min(1.0, math.cos(math.radians(lat)) * math.sin(math.radians(min(half_lon, 90.0))))
+        ) * EARTH_RADIUS_KM
+        return min(lat_km, lon_km)
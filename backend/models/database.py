@@ -5,10 +5,14 @@
 """
 import sqlite3
 import logging
-from typing import List, Dict, Any, Optional
-from datetime import datetime
+from typing import List, Dict, Any, Optional, Iterator, Iterable, Callable, Tuple
+from datetime import datetime, date, timedelta, timezone
 import os
 
+import numpy as np
+
+from backend.config import HISTOGRAM_BINS, IMPORT_CACHE_SIZE_MB
+
 # 配置日志
 logging.basicConfig(
     level=logging.INFO,
@@ -16,6 +20,57 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# weather_data 表中的数值字段（用于校验动态拼接的列名）
+WEATHER_DATA_FIELDS = [
+    'temperature_2m', 'relative_humidity_2m', 'dew_point_2m',
+    'precipitation', 'rain', 'snowfall', 'surface_pressure', 'cloud_cover',
+    'wind_speed_10m', 'wind_direction_10m', 'wind_gusts_10m',
+    'wind_speed_80m', 'wind_speed_120m', 'wind_speed_180m',
+    'shortwave_radiation', 'direct_radiation', 'diffuse_radiation', 'direct_normal_irradiance',
+    'visibility', 'evapotranspiration', 'soil_temperature_0_to_7cm', 'soil_moisture_0_to_7cm',
+    'weather_code', 'wind_speed_100m', 'wind_direction_100m',
+]
+
+# 游标分块读取的默认行数
+DEFAULT_CHUNK_SIZE = 5000
+
+# 刷新直方图时每次从游标读取的行数
+HISTOGRAM_CHUNK_ROWS = 100000
+
+# 批量导入时可先删除、写入后重建的 weather_data 索引；
+# 唯一约束的自动索引用于 UPSERT 冲突检测，updated_at 索引用于写入后汇总变化范围，均不延迟
+DEFERRABLE_INDEXES = ('idx_weather_city_datetime',)
+
+# 一次性数据迁移的版本号，记录在 PRAGMA user_version 中：
+# 1 - 已回填分位数直方图（weather_histogram）
+SCHEMA_VERSION = 1
+
+# weather_data.updated_at 的格式（UTC，微秒精度，可按字符串比较先后）
+CHANGE_STAMP_FORMAT = '%Y-%m-%dT%H:%M:%S.%fZ'
+
+# 气候基线分组键的SQL表达式（与 numpy 计算的 0 起始编号一致）
+CLIMATOLOGY_KEY_SQL = {
+    'doy': "CAST(strftime('%j', {column}) AS INTEGER) - 1",
+    'hour': "CAST(strftime('%H', {column}) AS INTEGER)",
+}
+
+
+def _next_month(month: str) -> str:
+    """YYYY-MM 的下一个月"""
+    year, mon = int(month[:4]), int(month[5:7])
+    return f"{year + mon // 12:04d}-{mon % 12 + 1:02d}"
+
+
+def _previous_month(month: str) -> str:
+    """YYYY-MM 的上一个月"""
+    year, mon = int(month[:4]), int(month[5:7])
+    return f"{year - (mon == 1):04d}-{(mon - 2) % 12 + 1:02d}"
+
+
+def _is_month_end(day: str) -> bool:
+    """YYYY-MM-DD 是否为当月最后一天"""
+    return (date.fromisoformat(day[:10]) + timedelta(days=1)).day == 1
+
 
 class DatabaseManager:
     """
@@ -59,6 +114,10 @@ class DatabaseManager:
         cursor = conn.cursor()
         
         try:
+            # WAL 模式（持久保存在数据库文件中）：流式导出、数据订阅等长时间读取
+            # 不再阻塞写事务提交，写入也不会阻塞读取
+            cursor.execute("PRAGMA journal_mode=WAL")
+            
             # 创建城市配置表
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS city_config (
@@ -104,6 +163,7 @@ class DatabaseManager:
                     wind_speed_100m REAL,
                     wind_direction_100m REAL,
                     created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TEXT,
                     FOREIGN KEY (city_id) REFERENCES city_config(id),
                     UNIQUE(city_id, datetime)
                 )
@@ -118,6 +178,17 @@ class DatabaseManager:
                 except sqlite3.OperationalError:
                     pass
             
+            # updated_at 为数据订阅的增量游标，老数据以写入时间（created_at，UTC）回填
+            try:
+                cursor.execute('ALTER TABLE weather_data ADD COLUMN updated_at TEXT')
+                cursor.execute('''
+                    UPDATE weather_data
+                    SET updated_at = replace(COALESCE(created_at, '1970-01-01 00:00:00'), ' ', 'T') || '.000000Z'
+                ''')
+                logger.info("添加 weather_data.updated_at 列成功")
+            except sqlite3.OperationalError:
+                pass
+            
             # 2. 检查 city_config 字段
             try:
                 cursor.execute('ALTER TABLE city_config ADD COLUMN region TEXT DEFAULT "广西"')
@@ -131,6 +202,75 @@ class DatabaseManager:
             except sqlite3.OperationalError:
                 pass
             
+            # 创建城市坐标空间索引 (R*Tree)，由触发器与 city_config 保持同步
+            try:
+                self._init_city_spatial_index(cursor)
+            except sqlite3.OperationalError as e:
+                # 部分 SQLite 编译版本不包含 R*Tree 模块，此时城市检索退化为全表扫描
+                logger.warning(f"创建城市空间索引失败，将使用全表扫描: {e}")
+
+            # 创建数据版本表，weather_data 每次写入/删除时递增，用于生成 ETag
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS data_version (
+                    city_id INTEGER PRIMARY KEY,
+                    version INTEGER NOT NULL DEFAULT 0,
+                    updated_at TEXT NOT NULL
+                )
+            ''')
+            
+            # 按城市、年份的数据版本，用于判断导出缓存中某年的数据是否变化
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS data_version_year (
+                    city_id INTEGER NOT NULL,
+                    year INTEGER NOT NULL,
+                    version INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (city_id, year)
+                )
+            ''')
+            
+            # 创建气候基线表：按城市、字段、分组方式（doy 年内日序 / hour 小时）存储常年值
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS climatology (
+                    city_id INTEGER NOT NULL,
+                    field TEXT NOT NULL,
+                    period TEXT NOT NULL,
+                    key INTEGER NOT NULL,
+                    n INTEGER NOT NULL,
+                    mean REAL,
+                    std REAL,
+                    p10 REAL,
+                    p50 REAL,
+                    p90 REAL,
+                    PRIMARY KEY (city_id, field, period, key)
+                )
+            ''')
+            
+            # 气候基线构建记录，参考期内数据变化时 stale 置1，由刷新任务增量重建
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS climatology_meta (
+                    city_id INTEGER NOT NULL,
+                    field TEXT NOT NULL,
+                    ref_start_year INTEGER NOT NULL,
+                    ref_end_year INTEGER NOT NULL,
+                    n_years INTEGER NOT NULL,
+                    stale INTEGER NOT NULL DEFAULT 0,
+                    built_at TEXT NOT NULL,
+                    PRIMARY KEY (city_id, field)
+                )
+            ''')
+            
+            # 创建按月分箱直方图表（稀疏存储非空箱），随 weather_data 写入同步维护
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS weather_histogram (
+                    city_id INTEGER NOT NULL,
+                    field TEXT NOT NULL,
+                    month TEXT NOT NULL,
+                    bin INTEGER NOT NULL,
+                    count INTEGER NOT NULL,
+                    PRIMARY KEY (city_id, field, month, bin)
+                )
+            ''')
+            
             # 创建API缓存表
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS api_cache (
@@ -148,6 +288,11 @@ class DatabaseManager:
                 ON weather_data(city_id, datetime)
             ''')
             
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_weather_updated_at
+                ON weather_data(updated_at)
+            ''')
+            
             cursor.execute('''
                 CREATE INDEX IF NOT EXISTS idx_cache_key 
                 ON api_cache(cache_key)
@@ -158,6 +303,19 @@ class DatabaseManager:
                 ON api_cache(expired_at)
             ''')
             
+            # 已有数据但直方图为空时（升级后首次启动）一次性回填；
+            # 以 user_version 标记已完成，字段全为空、回填后仍无直方图时也不会每次启动重新扫描
+            cursor.execute("PRAGMA user_version")
+            if cursor.fetchone()[0] < 1:
+                cursor.execute("SELECT 1 FROM weather_histogram LIMIT 1")
+                if cursor.fetchone() is None:
+                    cursor.execute("SELECT city_id, MIN(datetime), MAX(datetime) FROM weather_data GROUP BY city_id")
+                    backfill = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+                    if backfill:
+                        logger.info(f"回填分位数直方图: {len(backfill)} 个城市")
+                        self._refresh_histograms(cursor, backfill)
+                cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            
             conn.commit()
             logger.info("数据库表创建成功")
             
@@ -167,7 +325,69 @@ class DatabaseManager:
             raise
         finally:
             conn.close()
-    
+
+    def _init_city_spatial_index(self, cursor):
+        """
+        创建城市坐标的 R*Tree 虚拟表及同步触发器
+
+        Args:
+            cursor: 数据库游标（在 init_database 的事务中执行）
+        """
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS city_rtree USING rtree(
+                id,
+                min_lon, max_lon,
+                min_lat, max_lat
+            )
+        ''')
+
+        # INSERT OR REPLACE 会先删除旧行，因此插入触发器同样使用 INSERT OR REPLACE
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS city_rtree_insert
+            AFTER INSERT ON city_config
+            BEGIN
+                INSERT OR REPLACE INTO city_rtree
+                VALUES (new.id, new.longitude, new.longitude, new.latitude, new.latitude);
+            END
+        ''')
+
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS city_rtree_update
+            AFTER UPDATE OF id, longitude, latitude ON city_config
+            BEGIN
+                DELETE FROM city_rtree WHERE id = old.id;
+                INSERT OR REPLACE INTO city_rtree
+                VALUES (new.id, new.longitude, new.longitude, new.latitude, new.latitude);
+            END
+        ''')
+
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS city_rtree_delete
+            AFTER DELETE ON city_config
+            BEGIN
+                DELETE FROM city_rtree WHERE id = old.id;
+            END
+        ''')
+
+        # 补齐触发器创建之前已存在的城市
+        cursor.execute('''
+            INSERT OR REPLACE INTO city_rtree
+            SELECT id, longitude, longitude, latitude, latitude FROM city_config
+        ''')
+
+    def table_exists(self, table: str) -> bool:
+        """
+        检查表（含虚拟表）是否存在
+
+        Args:
+            table: 表名
+
+        Returns:
+            是否存在
+        """
+        sql = "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?"
+        return bool(self.execute_query(sql, (table,)))
+
     def execute_query(self, sql: str, params: tuple = ()) -> List[Dict[str, Any]]:
         """
         执行查询SQL语句
@@ -221,18 +441,29 @@ class DatabaseManager:
         try:
             # 获取列名
             columns = list(data_list[0].keys())
+            extra = ()
+            if table == 'weather_data':
+                columns = [col for col in columns if col != 'updated_at'] + ['updated_at']
+                extra = (self._begin_weather_write(cursor),)
             placeholders = ','.join(['?' for _ in columns])
             column_names = ','.join(columns)
             
             sql = f"INSERT OR REPLACE INTO {table} ({column_names}) VALUES ({placeholders})"
             
             # 准备数据
-            values_list = [tuple(item[col] for col in columns) for item in data_list]
+            if extra:
+                values_list = [tuple(item[col] for col in columns[:-1]) + extra for item in data_list]
+            else:
+                values_list = [tuple(item[col] for col in columns) for item in data_list]
             
             cursor.executemany(sql, values_list)
+            inserted_rows = cursor.rowcount
+            
+            if table == 'weather_data':
+                self._on_weather_data_changed(cursor, self._changed_ranges(data_list))
+            
             conn.commit()
             
-            inserted_rows = cursor.rowcount
             logger.info(f"批量插入成功，插入 {inserted_rows} 行到表 {table}")
             return inserted_rows
             
@@ -243,23 +474,164 @@ class DatabaseManager:
         finally:
             conn.close()
     
+    def upsert_weather_data(self, data_list: List[Dict[str, Any]]) -> int:
+        """
+        批量写入天气数据，已存在的 (city_id, datetime) 只更新记录中给出的字段
+
+        与 bulk_insert 的 INSERT OR REPLACE 不同，未给出的字段保留原值，
+        适合导入只包含部分字段的文件；写入的行都会更新 updated_at
+
+        Args:
+            data_list: weather_data 记录列表（各记录的键相同）
+
+        Returns:
+            写入行数
+        """
+        if not data_list:
+            return 0
+
+        columns = [col for col in data_list[0].keys() if col != 'updated_at']
+
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        try:
+            stamp = self._begin_weather_write(cursor)
+            cursor.executemany(
+                self._upsert_sql(columns, stamp),
+                [tuple(item[col] for col in columns) for item in data_list]
+            )
+            written = cursor.rowcount
+            self._on_weather_data_changed(cursor, self._changed_ranges(data_list))
+            conn.commit()
+
+            logger.info(f"批量写入成功，写入 {written} 行到表 weather_data")
+            return written
+
+        except sqlite3.Error as e:
+            logger.error(f"批量写入失败: {e}")
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def bulk_upsert_weather_rows(
+        self,
+        columns: List[str],
+        row_batches: Iterable[List[tuple]],
+        defer_indexes: bool = False,
+        progress: Optional[Callable[[int], None]] = None
+    ) -> int:
+        """
+        在单个事务中分批写入大量天气数据（批量导入使用）
+
+        所有批次共用同一条预编译的 UPSERT 语句，已存在的记录只更新给出的字段；
+        派生数据（数据版本、直方图、气候基线状态）在全部写入后统一刷新一次。
+        任一批次失败（包括 row_batches 自身抛出异常）时整体回滚
+
+        Args:
+            columns: 元组各位置的列名，须包含 city_id 与 datetime
+            row_batches: 元组行块的可迭代对象
+            defer_indexes: 是否在写入前删除 DEFERRABLE_INDEXES 中的索引、写入后在同一事务中重建
+                           （唯一约束与 updated_at 索引保留），适合数据量相对已有数据较大的导入
+            progress: 每批写入后的回调，参数为累计写入行数
+
+        Returns:
+            写入行数
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        try:
+            stamp = self._begin_weather_write(cursor)
+            cursor.execute(f"PRAGMA cache_size = -{IMPORT_CACHE_SIZE_MB * 1024}")
+
+            deferred = []
+            if defer_indexes:
+                placeholders = ', '.join('?' * len(DEFERRABLE_INDEXES))
+                deferred = cursor.execute(
+                    "SELECT name, sql FROM sqlite_master "
+                    f"WHERE type = 'index' AND tbl_name = 'weather_data' AND name IN ({placeholders})",
+                    DEFERRABLE_INDEXES
+                ).fetchall()
+                for name, _ in deferred:
+                    cursor.execute(f'DROP INDEX "{name}"')
+
+            sql = self._upsert_sql(columns, stamp)
+            written = 0
+            try:
+                for rows in row_batches:
+                    if not rows:
+                        continue
+                    cursor.executemany(sql, rows)
+                    written += len(rows)
+                    if progress:
+                        progress(written)
+            finally:
+                # 无论写入是否成功都在本事务中重建，提交的数据库中不会缺少索引
+                for name, index_sql in deferred:
+                    cursor.execute(index_sql)
+                if deferred:
+                    logger.info(f"已重建索引: {', '.join(name for name, _ in deferred)}")
+
+            # 本事务写入的行 updated_at 均为 stamp
+            cursor.execute(
+                "SELECT city_id, MIN(datetime), MAX(datetime) FROM weather_data "
+                "WHERE updated_at = ? GROUP BY city_id",
+                (stamp,)
+            )
+            self._on_weather_data_changed(cursor, {row[0]: (row[1], row[2]) for row in cursor.fetchall()})
+            conn.commit()
+
+            logger.info(f"批量导入成功，写入 {written} 行到表 weather_data")
+            return written
+
+        except Exception as e:
+            logger.error(f"批量导入失败，已回滚: {e}")
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _upsert_sql(columns: List[str], stamp: str) -> str:
+        """
+        weather_data 的 UPSERT 语句，冲突时只更新给出的字段
+
+        Args:
+            columns: 插入的列（不含 updated_at）
+            stamp: 本次写入的 updated_at（由 _begin_weather_write 生成，直接写入语句）
+
+        Returns:
+            SQL语句
+        """
+        updates = [col for col in columns if col not in ('city_id', 'datetime')] + ['updated_at']
+        return (
+            f"INSERT INTO weather_data ({', '.join(columns)}, updated_at) "
+            f"VALUES ({', '.join('?' for _ in columns)}, '{stamp}') "
+            f"ON CONFLICT(city_id, datetime) DO "
+            f"UPDATE SET {', '.join(f'{col} = excluded.{col}' for col in updates)}"
+        )
+
     def insert_weather_data(self, data: Dict[str, Any]) -> int:
         """
         插入单条天气数据
         """
+        data = {k: v for k, v in data.items() if k != 'updated_at'}
         columns = ', '.join(data.keys())
         placeholders = ', '.join(['?' for _ in data])
         values = tuple(data.values())
         
-        sql = f"INSERT OR REPLACE INTO weather_data ({columns}) VALUES ({placeholders})"
+        sql = f"INSERT OR REPLACE INTO weather_data ({columns}, updated_at) VALUES ({placeholders}, ?)"
         
         conn = self.get_connection()
         cursor = conn.cursor()
         
         try:
-            cursor.execute(sql, values)
-            conn.commit()
+            cursor.execute(sql, values + (self._begin_weather_write(cursor),))
             record_id = cursor.lastrowid
+            self._on_weather_data_changed(cursor, self._changed_ranges([data]))
+            conn.commit()
             logger.debug(f"插入天气数据成功，ID: {record_id}")
             return record_id
         except sqlite3.Error as e:
@@ -269,6 +641,413 @@ class DatabaseManager:
         finally:
             conn.close()
     
+    @staticmethod
+    def _begin_weather_write(cursor) -> str:
+        """
+        开始 weather_data 的写事务并生成本次写入的 updated_at
+        
+        先取得写锁再取时间，且不早于表中已有的最大值，保证后提交的事务时间戳更大，
+        读取方以已提交的最大 updated_at 作为游标时不会漏掉之后的写入
+        
+        Args:
+            cursor: 尚未开始事务的游标
+            
+        Returns:
+            本次写入的时间戳
+        """
+        cursor.execute("BEGIN IMMEDIATE")
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        latest = cursor.execute("SELECT MAX(updated_at) FROM weather_data").fetchone()[0]
+        if latest:
+            try:
+                now = max(now, datetime.strptime(latest, CHANGE_STAMP_FORMAT) + timedelta(microseconds=1))
+            except ValueError:
+                pass
+        return now.strftime(CHANGE_STAMP_FORMAT)
+    
+    def get_change_cursor(self) -> Optional[str]:
+        """
+        获取 weather_data 已提交的最大 updated_at，作为数据订阅的增量游标
+        
+        Returns:
+            时间戳，表为空时返回None
+        """
+        rows = self.execute_query("SELECT MAX(updated_at) AS cursor FROM weather_data")
+        return rows[0]['cursor'] if rows else None
+    
+    @staticmethod
+    def _changed_ranges(data_list: List[Dict[str, Any]]) -> Dict[int, Tuple[str, str]]:
+        """
+        汇总写入数据涉及的城市及时间范围
+        
+        Args:
+            data_list: weather_data 记录列表
+            
+        Returns:
+            {city_id: (最早datetime, 最晚datetime)}
+        """
+        changes = {}
+        for item in data_list:
+            city_id, dt = item['city_id'], item['datetime']
+            if city_id in changes:
+                start, end = changes[city_id]
+                changes[city_id] = (min(start, dt), max(end, dt))
+            else:
+                changes[city_id] = (dt, dt)
+        return changes
+    
+    def _on_weather_data_changed(self, cursor, changes: Dict[int, Tuple[str, str]]):
+        """
+        weather_data 发生写入或删除后，在同一事务内同步派生数据
+        
+        Args:
+            cursor: 当前事务的游标
+            changes: {city_id: (最早datetime, 最晚datetime)}
+        """
+        if not changes:
+            return
+        
+        now = datetime.now().isoformat()
+        cursor.executemany(
+            """
+            INSERT INTO data_version (city_id, version, updated_at) VALUES (?, 1, ?)
+            ON CONFLICT(city_id) DO UPDATE SET version = version + 1, updated_at = excluded.updated_at
+            """,
+            [(city_id, now) for city_id in changes]
+        )
+        cursor.executemany(
+            """
+            INSERT INTO data_version_year (city_id, year, version) VALUES (?, ?, 1)
+            ON CONFLICT(city_id, year) DO UPDATE SET version = version + 1
+            """,
+            [
+                (city_id, year)
+                for city_id, (start, end) in changes.items()
+                for year in range(int(start[:4]), int(end[:4]) + 1)
+            ]
+        )
+        
+        self._refresh_histograms(cursor, changes)
+        
+        # 参考期内的数据变化使对应城市的气候基线失效
+        cursor.executemany(
+            """
+            UPDATE climatology_meta SET stale = 1
+            WHERE city_id = ? AND CAST(substr(?, 1, 4) AS INTEGER) <= ref_end_year
+              AND CAST(substr(?, 1, 4) AS INTEGER) >= ref_start_year
+            """,
+            [(city_id, start, end) for city_id, (start, end) in changes.items()]
+        )
+    
+    @staticmethod
+    def _histogram_bin_sql(field: str) -> str:
+        """字段值所在直方图箱号的SQL表达式（超出范围时截断到首/末箱）"""
+        lower, width, n_bins = HISTOGRAM_BINS[field]
+        return f"MIN(MAX(CAST(({field} - {lower}) / {width} AS INTEGER), 0), {n_bins - 1})"
+    
+    def _refresh_histograms(self, cursor, changes: Dict[int, Tuple[str, str]]):
+        """
+        重新计算受影响月份的分箱直方图
+        
+        每个城市只扫描一次受影响的数据，所有字段在 numpy 中分箱计数，
+        分箱口径与 _histogram_bin_sql 一致（向零截断后截断到首/末箱）
+        
+        Args:
+            cursor: 当前事务的游标
+            changes: {city_id: (最早datetime, 最晚datetime)}
+        """
+        fields = list(HISTOGRAM_BINS)
+        for city_id, (start, end) in changes.items():
+            first_month, last_month = start[:7], end[:7]
+            cursor.execute(
+                "DELETE FROM weather_histogram WHERE city_id = ? AND month BETWEEN ? AND ?",
+                (city_id, first_month, last_month)
+            )
+            
+            base = np.datetime64(first_month, 'M')
+            n_months = int((np.datetime64(last_month, 'M') - base).astype(np.int64)) + 1
+            counts = {field: np.zeros(n_months * HISTOGRAM_BINS[field][2], dtype=np.int64) for field in fields}
+            
+            # 独立游标读取元组行，省去 sqlite3.Row 的构造开销
+            reader = cursor.connection.cursor()
+            reader.row_factory = None
+            reader.execute(
+                f"SELECT datetime, {', '.join(fields)} FROM weather_data "
+                f"WHERE city_id = ? AND datetime >= ? AND datetime < ?",
+                (city_id, f"{first_month}-01", f"{last_month}-32")
+            )
+            while True:
+                rows = reader.fetchmany(HISTOGRAM_CHUNK_ROWS)
+                if not rows:
+                    break
+                columns = list(zip(*rows))
+                months = (np.array(columns[0], dtype='U7').astype('datetime64[M]') - base).astype(np.int64)
+                for field, values in zip(fields, columns[1:]):
+                    lower, width, n_bins = HISTOGRAM_BINS[field]
+                    values = np.array(values, dtype=np.float64)
+                    valid = ~np.isnan(values)
+                    bins = np.clip(np.trunc((values[valid] - lower) / width), 0, n_bins - 1).astype(np.int64)
+                    counts[field] += np.bincount(months[valid] * n_bins + bins, minlength=len(counts[field]))
+            
+            for field in fields:
+                n_bins = HISTOGRAM_BINS[field][2]
+                keys = np.flatnonzero(counts[field])
+                month_labels = np.datetime_as_string(base + keys // n_bins, unit='M')
+                cursor.executemany(
+                    "INSERT INTO weather_histogram (city_id, field, month, bin, count) VALUES (?, ?, ?, ?, ?)",
+                    zip(
+                        [city_id] * len(keys), [field] * len(keys), month_labels.tolist(),
+                        (keys % n_bins).tolist(), counts[field][keys].tolist()
+                    )
+                )
+    
+    def get_histogram_counts(
+        self,
+        city_ids: List[int],
+        field: str,
+        start_date: str,
+        end_date: str
+    ) -> Tuple[List[int], List[int]]:
+        """
+        合并任意时间范围内的分箱计数
+        
+        范围内的整月直接读取预计算的月直方图；首尾不完整的月份
+        从 weather_data 即时分箱（最多两个月的数据）
+        
+        Args:
+            city_ids: 城市ID列表
+            field: 字段名（须在 HISTOGRAM_BINS 中）
+            start_date: 开始日期 (YYYY-MM-DD)
+            end_date: 结束日期 (YYYY-MM-DD)
+            
+        Returns:
+            (箱号列表, 计数列表)，同一箱号可能出现多次，由调用方累加
+        """
+        if field not in HISTOGRAM_BINS or not city_ids:
+            return [], []
+        
+        placeholders = ','.join(['?' for _ in city_ids])
+        first_full = start_date[:7] if start_date[8:10] == '01' else _next_month(start_date[:7])
+        last_full = end_date[:7] if _is_month_end(end_date) else _previous_month(end_date[:7])
+        
+        queries = []
+        if first_full <= last_full:
+            queries.append((
+                f"""
+                SELECT bin, SUM(count) FROM weather_histogram
+                WHERE city_id IN ({placeholders}) AND field = ? AND month BETWEEN ? AND ?
+                GROUP BY bin
+                """,
+                (*city_ids, field, first_full, last_full)
+            ))
+            partial_ranges = []
+            if start_date[:7] < first_full:
+                partial_ranges.append((f"{start_date}T00:00", f"{first_full}-01"))
+            if end_date[:7] > last_full:
+                partial_ranges.append((f"{_next_month(last_full)}-01", f"{end_date}T23:59"))
+        else:
+            partial_ranges = [(f"{start_date}T00:00", f"{end_date}T23:59")]
+        
+        for range_start, range_end in partial_ranges:
+            queries.append((
+                f"""
+                SELECT {self._histogram_bin_sql(field)}, COUNT(*) FROM weather_data
+                WHERE city_id IN ({placeholders}) AND datetime >= ? AND datetime <= ?
+                  AND {field} IS NOT NULL
+                GROUP BY 1
+                """,
+                (*city_ids, range_start, range_end)
+            ))
+        
+        bins, counts = [], []
+        conn = self.get_connection()
+        conn.row_factory = None
+        try:
+            for sql, params in queries:
+                for bin_index, count in conn.execute(sql, params):
+                    bins.append(bin_index)
+                    counts.append(count)
+        finally:
+            conn.close()
+        return bins, counts
+    
+    def get_data_versions(self, city_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """
+        获取城市数据版本
+        
+        Args:
+            city_ids: 城市ID列表
+            
+        Returns:
+            {city_id: {'version': 版本号, 'updated_at': 修改时间}}，从未写入的城市版本为0
+        """
+        if not city_ids:
+            return {}
+        
+        placeholders = ','.join(['?' for _ in city_ids])
+        rows = self.execute_query(
+            f"SELECT city_id, version, updated_at FROM data_version WHERE city_id IN ({placeholders})",
+            tuple(city_ids)
+        )
+        versions = {city_id: {'version': 0, 'updated_at': None} for city_id in city_ids}
+        for row in rows:
+            versions[row['city_id']] = {'version': row['version'], 'updated_at': row['updated_at']}
+        return versions
+    
+    def get_year_versions(self, city_ids: List[int], start_year: int, end_year: int) -> Dict[int, List[int]]:
+        """
+        获取城市在各年份的数据版本
+
+        Args:
+            city_ids: 城市ID列表
+            start_year: 起始年
+            end_year: 结束年（含）
+
+        Returns:
+            {city_id: [各年版本号]}，按年份顺序，从未写入的年份版本为0
+        """
+        versions = {city_id: [0] * (end_year - start_year + 1) for city_id in city_ids}
+        if not city_ids:
+            return versions
+
+        placeholders = ','.join(['?' for _ in city_ids])
+        rows = self.execute_query(
+            f"SELECT city_id, year, version FROM data_version_year "
+            f"WHERE city_id IN ({placeholders}) AND year BETWEEN ? AND ?",
+            (*city_ids, start_year, end_year)
+        )
+        for row in rows:
+            versions[row['city_id']][row['year'] - start_year] = row['version']
+        return versions
+    
+    def replace_climatology(
+        self,
+        city_id: int,
+        field: str,
+        rows: List[Tuple],
+        ref_start_year: int,
+        ref_end_year: int,
+        n_years: int
+    ):
+        """
+        在一个事务中替换城市某字段的气候基线并更新构建记录
+
+        Args:
+            city_id: 城市ID
+            field: 字段名
+            rows: (period, key, n, mean, std, p10, p50, p90) 元组列表
+            ref_start_year: 参考期起始年
+            ref_end_year: 参考期结束年
+            n_years: 参考期内有数据的年数
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("DELETE FROM climatology WHERE city_id = ? AND field = ?", (city_id, field))
+            cursor.executemany(
+                """
+                INSERT INTO climatology (city_id, field, period, key, n, mean, std, p10, p50, p90)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                [(city_id, field, *row) for row in rows]
+            )
+            cursor.execute(
+                """
+                INSERT OR REPLACE INTO climatology_meta
+                    (city_id, field, ref_start_year, ref_end_year, n_years, stale, built_at)
+                VALUES (?, ?, ?, ?, ?, 0, ?)
+                """,
+                (city_id, field, ref_start_year, ref_end_year, n_years, datetime.now().isoformat())
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"写入气候基线失败: {e}")
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    
+    def get_climatology_meta(self, city_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        获取气候基线构建记录
+
+        Args:
+            city_id: 城市ID，None表示全部
+
+        Returns:
+            构建记录列表
+        """
+        if city_id is None:
+            return self.execute_query("SELECT * FROM climatology_meta ORDER BY city_id, field")
+        return self.execute_query(
+            "SELECT * FROM climatology_meta WHERE city_id = ? ORDER BY field", (city_id,)
+        )
+    
+    def get_climatology(self, city_id: int, field: str, period: str) -> List[Dict[str, Any]]:
+        """
+        获取气候基线
+
+        Args:
+            city_id: 城市ID
+            field: 字段名
+            period: doy 或 hour
+
+        Returns:
+            按 key 升序的基线列表
+        """
+        return self.execute_query(
+            """
+            SELECT key, n, mean, std, p10, p50, p90 FROM climatology
+            WHERE city_id = ? AND field = ? AND period = ?
+            ORDER BY key
+            """,
+            (city_id, field, period)
+        )
+    
+    def get_departures(
+        self,
+        filters: Dict[str, Any],
+        field: str,
+        period: str
+    ) -> Dict[str, List[Any]]:
+        """
+        将小时数据与气候基线连接，计算距平
+
+        Args:
+            filters: 过滤条件（须包含 city_id）
+            field: 字段名
+            period: doy（按年内日序）或 hour（按小时）
+
+        Returns:
+            列式数据 {'datetime', 'value', 'normal', 'std', 'departure'}
+        """
+        columns = ['datetime', 'value', 'normal', 'std', 'departure']
+        if not self.valid_weather_fields([field]) or period not in CLIMATOLOGY_KEY_SQL:
+            return {column: [] for column in columns}
+        
+        where_clause, params = self._build_weather_where(filters, alias='w')
+        sql = f"""
+            SELECT w.datetime, w.{field}, c.mean, c.std, w.{field} - c.mean
+            FROM weather_data w
+            LEFT JOIN climatology c
+              ON c.city_id = w.city_id AND c.field = ? AND c.period = ?
+             AND c.key = {CLIMATOLOGY_KEY_SQL[period].format(column='w.datetime')}
+            WHERE {where_clause}
+            ORDER BY w.datetime
+        """
+        
+        conn = self.get_connection()
+        conn.row_factory = None
+        try:
+            rows = conn.execute(sql, (field, period, *params)).fetchall()
+        finally:
+            conn.close()
+        
+        if not rows:
+            return {column: [] for column in columns}
+        return {column: list(values) for column, values in zip(columns, zip(*rows))}
+    
     def get_weather_data(self, filters: Dict[str, Any]) -> List[Dict[str, Any]]:
         """
         根据过滤条件获取天气数据
@@ -323,9 +1102,33 @@ class DatabaseManager:
             return 0
             
         where_clause = " AND ".join(conditions)
-        sql = f"DELETE FROM weather_data WHERE {where_clause}"
         
-        return self.execute_update(sql, tuple(params))
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            # 先记录受影响的城市及时间范围，供派生数据同步
+            cursor.execute(
+                f"SELECT city_id, MIN(datetime) AS start, MAX(datetime) AS end "
+                f"FROM weather_data WHERE {where_clause} GROUP BY city_id",
+                tuple(params)
+            )
+            changes = {row['city_id']: (row['start'], row['end']) for row in cursor.fetchall()}
+            
+            cursor.execute(f"DELETE FROM weather_data WHERE {where_clause}", tuple(params))
+            deleted_rows = cursor.rowcount
+            
+            self._on_weather_data_changed(cursor, changes)
+            conn.commit()
+            
+            logger.debug(f"删除天气数据成功，删除 {deleted_rows} 行")
+            return deleted_rows
+        except sqlite3.Error as e:
+            logger.error(f"删除天气数据失败: {e}")
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
 
     def get_weather_data_stats(self, filters: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -368,3 +1171,229 @@ class DatabaseManager:
         if result:
             return dict(result[0])
         return {'count': 0, 'start_date': None, 'end_date': None}
+
+    def _build_weather_where(self, filters: Dict[str, Any], alias: str = '') -> Tuple[str, tuple]:
+        """
+        根据过滤条件构建 weather_data 的 WHERE 子句
+
+        Args:
+            filters: 过滤条件（city_id 或 city_ids、start_date、end_date，
+                     changed_after / changed_until 按 updated_at 过滤，前者不含边界）
+            alias: weather_data 的表别名（连接查询时使用）
+
+        Returns:
+            (WHERE子句, 参数元组)
+        """
+        prefix = f"{alias}." if alias else ''
+        conditions = []
+        params = []
+
+        if 'city_id' in filters:
+            conditions.append(f"{prefix}city_id = ?")
+            params.append(filters['city_id'])
+
+        if filters.get('city_ids'):
+            placeholders = ','.join(['?' for _ in filters['city_ids']])
+            conditions.append(f"{prefix}city_id IN ({placeholders})")
+            params.extend(filters['city_ids'])
+
+        if 'start_date' in filters:
+            conditions.append(f"{prefix}datetime >= ?")
+            params.append(filters['start_date'])
+
+        if 'end_date' in filters:
+            conditions.append(f"{prefix}datetime <= ?")
+            params.append(filters['end_date'])
+
+        if 'changed_after' in filters:
+            conditions.append(f"{prefix}updated_at > ?")
+            params.append(filters['changed_after'])
+
+        if 'changed_until' in filters:
+            conditions.append(f"{prefix}updated_at <= ?")
+            params.append(filters['changed_until'])
+
+        where_clause = " AND ".join(conditions) if conditions else "1=1"
+        return where_clause, tuple(params)
+
+    @staticmethod
+    def valid_weather_fields(fields: Optional[List[str]]) -> List[str]:
+        """
+        过滤出 weather_data 表中实际存在的数值字段，保持原顺序
+
+        Args:
+            fields: 字段列表，None表示全部字段
+
+        Returns:
+            有效字段列表
+        """
+        if fields is None:
+            return list(WEATHER_DATA_FIELDS)
+        seen = set()
+        valid = []
+        for field in fields:
+            if field in WEATHER_DATA_FIELDS and field not in seen:
+                seen.add(field)
+                valid.append(field)
+        return valid
+
+    def iter_weather_rows(
+        self,
+        filters: Dict[str, Any],
+        fields: Optional[List[str]] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        with_city: bool = False
+    ) -> Iterator[List[tuple]]:
+        """
+        按块迭代读取天气数据，避免一次性加载全部记录
+
+        每行是一个元组：(datetime, 字段1, 字段2, ...)，
+        with_city 为 True 时行首额外包含 city_id
+
+        Args:
+            filters: 过滤条件
+            fields: 要读取的字段列表，None表示全部字段
+            chunk_size: 每块的行数
+            with_city: 是否在行首包含 city_id
+
+        Yields:
+            行元组列表
+        """
+        columns = ['datetime'] + self.valid_weather_fields(fields)
+        order_by = "datetime"
+        if with_city:
+            columns.insert(0, 'city_id')
+            order_by = "city_id, datetime"
+
+        where_clause, params = self._build_weather_where(filters)
+        sql = f"SELECT {', '.join(columns)} FROM weather_data WHERE {where_clause} ORDER BY {order_by}"
+
+        conn = self.get_connection()
+        conn.row_factory = None  # 元组行，省去字典构造开销
+        try:
+            cursor = conn.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+        except sqlite3.Error as e:
+            logger.error(f"分块读取天气数据失败: {e}")
+            raise
+        finally:
+            conn.close()
+
+    def get_weather_columns(
+        self,
+        filters: Dict[str, Any],
+        fields: Optional[List[str]] = None
+    ) -> Dict[str, List[Any]]:
+        """
+        以列式结构读取天气数据
+
+        Args:
+            filters: 过滤条件
+            fields: 要读取的字段列表，None表示全部字段
+
+        Returns:
+            {'datetime': [...], 字段: [...]} 形式的字典
+        """
+        columns = ['datetime'] + self.valid_weather_fields(fields)
+        result = {column: [] for column in columns}
+
+        for rows in self.iter_weather_rows(filters, fields):
+            for column, values in zip(columns, zip(*rows)):
+                result[column].extend(values)
+
+        logger.debug(f"列式查询成功，返回 {len(result['datetime'])} 条记录")
+        return result
+
+    def count_weather_fields(
+        self,
+        filters: Dict[str, Any],
+        fields: List[str]
+    ) -> Dict[str, int]:
+        """
+        统计范围内的总行数以及各字段的非空值数量
+
+        Args:
+            filters: 过滤条件
+            fields: 字段列表
+
+        Returns:
+            {'total': 总行数, 字段: 非空数量}
+        """
+        valid_fields = self.valid_weather_fields(fields)
+        select_items = ["COUNT(*) AS total"] + [f"COUNT({f}) AS {f}" for f in valid_fields]
+
+        where_clause, params = self._build_weather_where(filters)
+        sql = f"SELECT {', '.join(select_items)} FROM weather_data WHERE {where_clause}"
+
+        result = self.execute_query(sql, params)
+        return result[0] if result else {'total': 0, **{f: 0 for f in valid_fields}}
+
+    def aggregate_weather_fields(
+        self,
+        filters: Dict[str, Any],
+        fields: List[str]
+    ) -> Dict[str, Any]:
+        """
+        在一条聚合SQL中计算各字段的矩统计量，不读取任何小时记录
+
+        Args:
+            filters: 过滤条件
+            fields: 字段列表
+
+        Returns:
+            {'total': 总行数, 字段: {'count', 'sum', 'sum_sq', 'min', 'max', 'positive'}}
+        """
+        valid_fields = self.valid_weather_fields(fields)
+        stat_exprs = {
+            'count': 'COUNT({f})',
+            'sum': 'SUM({f})',
+            'sum_sq': 'SUM({f} * {f})',
+            'min': 'MIN({f})',
+            'max': 'MAX({f})',
+            'positive': 'SUM({f} > 0)',
+        }
+        select_items = ["COUNT(*)"] + [
+            expr.format(f=f) for f in valid_fields for expr in stat_exprs.values()
+        ]
+
+        where_clause, params = self._build_weather_where(filters)
+        sql = f"SELECT {', '.join(select_items)} FROM weather_data WHERE {where_clause}"
+
+        conn = self.get_connection()
+        conn.row_factory = None
+        try:
+            row = conn.execute(sql, params).fetchone()
+        finally:
+            conn.close()
+
+        result = {'total': row[0]}
+        values = iter(row[1:])
+        for f in valid_fields:
+            result[f] = {stat: next(values) for stat in stat_exprs}
+        return result
+
+    def count_weather_values(self, filters: Dict[str, Any], field: str) -> Dict[int, int]:
+        """
+        统计分类字段（如天气代码）各取值的出现次数
+
+        Args:
+            filters: 过滤条件
+            field: 字段名
+
+        Returns:
+            {取值(整数): 次数}，无数据时为空字典
+        """
+        if not self.valid_weather_fields([field]):
+            return {}
+
+        where_clause, params = self._build_weather_where(filters)
+        sql = f"""
+            SELECT CAST({field} AS INTEGER) AS value, COUNT(*) AS n FROM weather_data
+            WHERE {where_clause} AND {field} IS NOT NULL
+            GROUP BY value
+        """
+        return {row['value']: row['n'] for row in self.execute_query(sql, params)}
@@ -2,18 +2,58 @@
 API路由
 定义所有RESTful API接口
 """
+import hashlib
+import hmac
+import json
 import logging
-from flask import Blueprint, request, jsonify, send_file
-from typing import Dict, Any
+import unicodedata
+from datetime import datetime
+from functools import wraps
+from itertools import groupby
+from flask import Blueprint, request, jsonify, send_file, Response, stream_with_context, make_response, g
+from typing import Dict, Any, List, Optional, Tuple, Iterator, Callable, IO
 from io import BytesIO
+from urllib.parse import quote
 from backend.services.weather_service import WeatherService
 from backend.services.data_exporter import DataExporter
-from backend.services.data_analyzer import DataAnalyzer
+from backend.services.data_importer import DataImporter, IMPORT_FORMATS
+from backend.services.columnar_format import (
+    COLUMNAR_FORMATS, ARROW_STREAM_MIMETYPE, pyarrow_available, weather_schema, rows_to_batch, iter_ipc_stream
+)
+from backend.services.export_jobs import ExportJobManager
+from backend.services.export_cache import ExportCache
+from backend.services.bundle_exporter import BUNDLE_MODES, bundle_parts, iter_bundle
+from backend.services.data_analyzer import DataAnalyzer, SummaryAccumulator, DEFAULT_PERCENTILES
+from backend.services.downsampler import downsample_columns, DOWNSAMPLE_METHODS, MIN_POINTS_PER_FIELD
+from backend.services.anomaly_detector import (
+    find_anomalies, ANOMALY_METHODS, SEASONAL_BASELINES, DEFAULT_WINDOW_HOURS, DEFAULT_THRESHOLD
+)
+from backend.services.climatology import ClimatologyService, CLIMATOLOGY_PERIODS
+from backend.services.energy_analyzer import (
+    solar_resource, wind_resource, screen_site, validate_power_curve,
+    ENERGY_PERIODS, WIND_SPEED_FIELDS, SOLAR_FIELDS, DEFAULT_PANEL
+)
+from backend.json_provider import dumps_compact
 from backend.models.city import CityManager
-from backend.config import AVAILABLE_FIELDS, DEFAULT_FIELDS
+from backend.config import AVAILABLE_FIELDS, DEFAULT_FIELDS, TIMEZONE, HISTOGRAM_BINS, FEED_TOKENS, FEED_BATCH_ROWS
 
 logger = logging.getLogger(__name__)
 
+# /weather/query 支持的返回格式
+QUERY_FORMATS = ('records', 'columnar', 'ndjson')
+
+# max_points 的最小取值
+MIN_MAX_POINTS = MIN_POINTS_PER_FIELD
+
+# 趋势默认窗口（小时）：日、周、月
+DEFAULT_TREND_WINDOWS = (24, 168, 720)
+MAX_TREND_WINDOW = 24 * 366
+
+EXCEL_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# /data/feed 支持的输出格式
+FEED_FORMATS = ('ndjson', 'arrow')
+
 # 创建蓝图
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
@@ -23,6 +63,10 @@ data_exporter: DataExporter = None
 data_analyzer: DataAnalyzer = None
 city_manager: CityManager = None
 data_manager = None  # 数据管理器
+climatology_service: ClimatologyService = None
+data_importer: DataImporter = None
+export_jobs: ExportJobManager = None
+export_cache: ExportCache = None
 
 
 def init_api_services(
@@ -30,7 +74,11 @@ def init_api_services(
     de: DataExporter,
     da: DataAnalyzer,
     cm: CityManager,
-    dm=None  # 数据管理器
+    dm=None,  # 数据管理器
+    cs: ClimatologyService = None,
+    di: DataImporter = None,
+    ej: ExportJobManager = None,
+    ec: ExportCache = None
 ):
     """
     初始化API服务
@@ -41,16 +89,176 @@ def init_api_services(
         da: 数据分析器实例
         cm: 城市管理器实例
         dm: 数据管理器实例
+        cs: 气候基线服务实例
+        di: 数据导入器实例
+        ej: 异步导出任务管理器实例
+        ec: 导出文件缓存实例
     """
-    global weather_service, data_exporter, data_analyzer, city_manager, data_manager
+    global weather_service, data_exporter, data_analyzer, city_manager, data_manager, climatology_service
+    global data_importer, export_jobs, export_cache
     weather_service = ws
     data_exporter = de
     data_analyzer = da
     city_manager = cm
     data_manager = dm
+    climatology_service = cs
+    data_importer = di
+    export_jobs = ej
+    export_cache = ec
     logger.info("API服务初始化完成")
 
 
+def _request_params() -> Dict[str, Any]:
+    """
+    读取请求参数：POST 读取 JSON 请求体，GET 读取查询字符串
+    
+    GET 请求中列表参数以逗号分隔，数值与布尔参数按 GET_PARAM_TYPES 转换
+    
+    Returns:
+        参数字典
+    """
+    if 'request_params' in g:
+        return g.request_params
+    
+    if request.method != 'GET':
+        params = request.get_json(silent=True) or {}
+    else:
+        params = request.args.to_dict()
+        for key, value in params.items():
+            if key not in GET_PARAM_TYPES:
+                continue
+            kind, convert = GET_PARAM_TYPES[key]
+            try:
+                if kind == 'list':
+                    params[key] = [convert(v) for v in value.split(',') if v]
+                else:
+                    params[key] = convert(value)
+            except ValueError:
+                pass  # 保留原值，由各接口的参数校验处理
+    
+    g.request_params = params
+    return params
+
+
+def _parse_bool(value: str) -> bool:
+    """解析查询字符串中的布尔值"""
+    return value.lower() in ('1', 'true', 'yes')
+
+
+# GET 查询参数的类型转换：参数名 -> (scalar 或 list, 转换函数)
+GET_PARAM_TYPES = {
+    'fields': ('list', str),
+    'city_ids': ('list', int),
+    'windows': ('list', int),
+    'percentiles': ('list', float),
+    'city_id': ('scalar', int),
+    'max_points': ('scalar', int),
+    'window': ('scalar', int),
+    'limit': ('scalar', int),
+    'threshold': ('scalar', float),
+    'summary_only': ('scalar', _parse_bool),
+    'include_histogram': ('scalar', _parse_bool),
+}
+
+
+def _param_city_ids(params: Dict[str, Any]) -> List[int]:
+    """请求参数中涉及的城市ID（city_ids 或 city_id）"""
+    city_ids = params.get('city_ids') or [params.get('city_id')]
+    return sorted({c for c in city_ids if isinstance(c, int)})
+
+
+def _data_etag(params: Dict[str, Any]) -> Optional[str]:
+    """
+    根据请求参数和所涉城市的数据版本计算强 ETag
+    
+    Args:
+        params: 请求参数
+        
+    Returns:
+        ETag，请求不涉及城市时返回None
+    """
+    city_ids = _param_city_ids(params)
+    if not city_ids:
+        return None
+    
+    versions = weather_service.db_manager.get_data_versions(city_ids)
+    payload = json.dumps(
+        {'path': request.path, 'params': params, 'versions': versions},
+        sort_keys=True, ensure_ascii=False, default=str
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+
+def _stored_range_complete(params: Dict[str, Any]) -> bool:
+    """
+    请求涉及的城市在请求时间范围内的本地数据是否完整
+    
+    补齐下载失败时数据版本不变，此时的响应只包含部分数据，不能以 ETag 复用
+    
+    Args:
+        params: 请求参数
+        
+    Returns:
+        是否完整；无法判断时为False
+    """
+    start_date = params.get('start_date')
+    end_date = params.get('end_date')
+    if not isinstance(start_date, str) or not isinstance(end_date, str):
+        return False
+    
+    fields = params.get('fields') or [params.get('field')]
+    try:
+        fields = weather_service.db_manager.valid_weather_fields(fields if isinstance(fields, list) else [fields])
+        return all(
+            weather_service.is_local_complete(city_id, start_date[:10], end_date[:10], fields)
+            for city_id in _param_city_ids(params)
+        )
+    except Exception as e:
+        logger.warning(f"检查本地数据完整性失败: {e}")
+        return False
+
+
+def data_versioned(view):
+    """
+    为基于已存储数据的接口提供 ETag 条件请求支持
+    
+    ETag 由请求路径、请求参数和所涉城市的数据版本计算，城市数据被写入或删除后自动失效。
+    只有请求范围的本地数据完整时才使用 ETag：If-None-Match 命中时 GET/HEAD 返回304，
+    其他方法返回412；响应的 ETag 在视图执行（可能补齐下载）之后按新的数据版本计算
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        params = None
+        etag = None
+        try:
+            params = _request_params()
+            etag = _data_etag(params)
+        except Exception as e:
+            logger.warning(f"计算ETag失败: {e}")
+        
+        if etag and request.if_none_match.contains(etag) and _stored_range_complete(params):
+            if request.method not in ('GET', 'HEAD'):
+                return jsonify({'code': 412, 'message': '数据未变化（If-None-Match 匹配）', 'data': None}), 412
+            response = Response(status=304)
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        
+        response = make_response(view(*args, **kwargs))
+        if etag and response.status_code == 200:
+            try:
+                etag = _data_etag(params) if _stored_range_complete(params) else None
+            except Exception as e:
+                logger.warning(f"计算ETag失败: {e}")
+                etag = None
+            if etag:
+                response.set_etag(etag)
+                response.headers['Cache-Control'] = 'no-cache'
+        return response
+    
+    return wrapper
+
+
 @api_bp.route('/cities', methods=['GET'])
 def get_cities():
     """
@@ -102,6 +310,46 @@ def search_cities():
         logger.error(f"搜索城市失败: {e}")
         return jsonify({'code': 500, 'message': str(e), 'data': []})
 
+@api_bp.route('/cities/nearest', methods=['GET'])
+def nearest_cities():
+    """
+    查询距离指定坐标最近的城市
+
+    Query Params:
+        lat: 纬度
+        lon: 经度
+        k: 返回数量，默认1
+
+    Returns:
+        JSON响应
+    """
+    lat = request.args.get('lat', type=float)
+    lon = request.args.get('lon', type=float)
+    k = request.args.get('k', 1, type=int)
+
+    if lat is None or lon is None:
+        return jsonify({'code': 400, 'message': '缺少必要参数：lat, lon', 'data': None}), 400
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return jsonify({'code': 400, 'message': '坐标超出范围', 'data': None}), 400
+
+    try:
+        cities = city_manager.find_nearest(lat, lon, max(1, min(k, 100)))
+        city_list = [
+            {
+                'id': city['id'],
+                'name': city['city_name'],
+                'longitude': city['longitude'],
+                'latitude': city['latitude'],
+                'region': city['region'],
+                'distance_km': round(city['distance_km'], 2)
+            }
+            for city in cities
+        ]
+        return jsonify({'code': 200, 'message': '查询成功', 'data': city_list})
+    except Exception as e:
+        logger.error(f"查询最近城市失败: {e}")
+        return jsonify({'code': 500, 'message': f'查询失败: {str(e)}', 'data': None}), 500
+
 @api_bp.route('/cities/add', methods=['POST'])
 def add_city():
     """添加城市到默认列表"""
@@ -249,7 +497,8 @@ def get_weather_forecast():
         return jsonify({'code': 500, 'message': f'获取失败: {str(e)}', 'data': None}), 500
 
 
-@api_bp.route('/weather/query', methods=['POST'])
+@api_bp.route('/weather/query', methods=['GET', 'POST'])
+@data_versioned
 def query_weather():
     """
     查询历史天气数据
@@ -259,20 +508,42 @@ def query_weather():
             "city_id": 1,
             "start_date": "2024-01-01",
             "end_date": "2024-01-31",
-            "fields": ["temperature_2m", "wind_speed_10m"]
+            "fields": ["temperature_2m", "wind_speed_10m"],
+            "format": "records",  // 可选：records（默认）、columnar、ndjson
+            "max_points": 1000,   // 可选：服务端降采样后的最大点数（不适用于ndjson）
+            "downsample": "lttb", // 可选：降采样算法 lttb（默认）或 minmax
+            "summary_only": false // 可选：仅返回统计摘要，不返回小时记录
         }
     
+    format 说明:
+        records: data.records 为逐小时记录列表
+        columnar: data.columns 为 {"datetime": [...], 字段: [...]} 列式数组
+        ndjson: 流式返回，首行为元信息，其后每行一个 [datetime, 字段值...] 数组，
+                末行为 {"type": "end", "total_records": n, "summary": {...}}，
+                summary 在流式输出过程中分块累积计算
+    
+    指定 max_points 时 summary 仍基于完整数据计算，
+    data.downsampled 记录降采样算法与原始记录数
+    
+    summary_only 为真时本地数据完整则直接在数据库中聚合，不读取小时记录
+    
+    GET 请求使用同名查询参数，fields 以逗号分隔；响应携带基于数据版本的 ETag
+    
     Returns:
-        JSON响应
+        JSON响应或NDJSON流
     """
     try:
         # 获取请求参数
-        data = request.get_json()
+        data = _request_params()
         
         city_id = data.get('city_id')
         start_date = data.get('start_date')
         end_date = data.get('end_date')
         fields = data.get('fields', DEFAULT_FIELDS)
+        response_format = data.get('format', 'records')
+        max_points = data.get('max_points')
+        downsample_method = data.get('downsample', 'lttb')
+        summary_only = bool(data.get('summary_only', False))
         
         # 参数验证
         if not all([city_id, start_date, end_date]):
@@ -282,6 +553,27 @@ def query_weather():
                 'data': None
             }), 400
         
+        if response_format not in QUERY_FORMATS:
+            return jsonify({
+                'code': 400,
+                'message': f'不支持的格式: {response_format}',
+                'data': None
+            }), 400
+        
+        if max_points is not None and (not isinstance(max_points, int) or max_points < MIN_MAX_POINTS):
+            return jsonify({
+                'code': 400,
+                'message': f'max_points 必须是不小于 {MIN_MAX_POINTS} 的整数',
+                'data': None
+            }), 400
+        
+        if downsample_method not in DOWNSAMPLE_METHODS:
+            return jsonify({
+                'code': 400,
+                'message': f'不支持的降采样算法: {downsample_method}',
+                'data': None
+            }), 400
+        
         # 获取城市信息
         city_info = city_manager.get_city_by_id(city_id)
         if not city_info:
@@ -291,6 +583,30 @@ def query_weather():
                 'data': None
             }), 404
         
+        if summary_only:
+            total_records, summary = _summarize_city(city_info, start_date, end_date, fields)
+            return jsonify({
+                'code': 200,
+                'message': '查询成功',
+                'data': {
+                    'city_id': city_id,
+                    'city_name': city_info['city_name'],
+                    'longitude': city_info['longitude'],
+                    'latitude': city_info['latitude'],
+                    'timezone': TIMEZONE,
+                    'start_date': start_date,
+                    'end_date': end_date,
+                    'total_records': total_records,
+                    'summary': summary
+                }
+            })
+        
+        if response_format != 'records' or max_points:
+            return _query_weather_from_store(
+                city_info, start_date, end_date, fields, response_format,
+                max_points=max_points, downsample_method=downsample_method
+            )
+        
         # 获取天气数据
         weather_data = weather_service.get_historical_weather(
             longitude=city_info['longitude'],
@@ -333,6 +649,199 @@ def query_weather():
         }), 500
 
 
+def _prepare_city_data(
+    city_info: Dict[str, Any],
+    start_date: str,
+    end_date: str,
+    fields: List[str]
+) -> Tuple[Dict[str, Any], Optional[List[Dict[str, Any]]]]:
+    """
+    补齐单个城市的本地数据，供直接读取 weather_data 的查询使用
+    
+    补齐下载失败时抛出异常（不重复请求）；补齐后本地仍不完整时
+    返回补齐过程中已获取的小时记录，调用方直接使用而不再次获取
+    
+    Args:
+        city_info: 城市信息
+        start_date: 开始日期
+        end_date: 结束日期
+        fields: 字段列表
+        
+    Returns:
+        (weather_data 过滤条件, 本地完整时为None，否则为小时记录列表)
+    """
+    city_id = city_info['id']
+    weather_data = weather_service.fetch_missing_data(city_id, start_date, end_date, fields)
+    filters = {
+        'city_id': city_id,
+        'start_date': f"{start_date}T00:00",
+        'end_date': f"{end_date}T23:59"
+    }
+    return filters, (None if weather_data is None else weather_data['hourly_data'])
+
+
+def _query_weather_from_store(
+    city_info: Dict[str, Any],
+    start_date: str,
+    end_date: str,
+    fields: List[str],
+    response_format: str,
+    max_points: int = None,
+    downsample_method: str = 'lttb'
+):
+    """
+    以列式、NDJSON流式或降采样后的格式返回查询结果
+    
+    本地数据完整时直接从 weather_data 游标读取，不构造逐行字典；
+    否则使用补齐时获取的数据
+    
+    Args:
+        city_info: 城市信息
+        start_date: 开始日期
+        end_date: 结束日期
+        fields: 请求的字段列表
+        response_format: records、columnar 或 ndjson
+        max_points: 降采样后的最大点数，None表示不降采样
+        downsample_method: 降采样算法
+        
+    Returns:
+        Flask响应
+    """
+    db_manager = weather_service.db_manager
+    city_id = city_info['id']
+    columns = ['datetime'] + db_manager.valid_weather_fields(fields)
+    
+    filters, records = _prepare_city_data(city_info, start_date, end_date, fields)
+    if records is None:
+        row_chunks = db_manager.iter_weather_rows(filters, fields)
+    else:
+        row_chunks = [[tuple(r.get(c) for c in columns) for r in records]]
+    
+    meta = {
+        'city_id': city_id,
+        'city_name': city_info['city_name'],
+        'longitude': city_info['longitude'],
+        'latitude': city_info['latitude'],
+        'timezone': TIMEZONE,
+        'start_date': start_date,
+        'end_date': end_date,
+    }
+    
+    if response_format == 'ndjson':
+        def generate():
+            yield _ndjson_line({'type': 'meta', **meta, 'columns': columns})
+            total = 0
+            accumulator = SummaryAccumulator(columns[1:])
+            for rows in row_chunks:
+                yield ''.join(_ndjson_line(row) for row in rows)
+                accumulator.update_rows(rows, columns)
+                total += len(rows)
+            yield _ndjson_line({'type': 'end', 'total_records': total, 'summary': accumulator.summary()})
+        
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    
+    column_data = {column: [] for column in columns}
+    for rows in row_chunks:
+        for column, values in zip(columns, zip(*rows)):
+            column_data[column].extend(values)
+    
+    summary = data_analyzer.calculate_summary(column_data)
+    total_records = len(column_data['datetime'])
+    
+    response_data = {
+        **meta,
+        'total_records': total_records,
+        'summary': summary
+    }
+    
+    if max_points and total_records > max_points:
+        column_data, _ = downsample_columns(column_data, columns[1:], max_points, downsample_method)
+        response_data['downsampled'] = {
+            'method': downsample_method,
+            'max_points': max_points,
+            'original_records': total_records,
+            'returned_records': len(column_data['datetime'])
+        }
+    
+    if response_format == 'columnar':
+        response_data.update({
+            'format': 'columnar',
+            'fields': columns[1:],
+            'columns': column_data
+        })
+    else:
+        response_data['records'] = [
+            dict(zip(columns, row)) for row in zip(*(column_data[c] for c in columns))
+        ]
+    
+    return jsonify({
+        'code': 200,
+        'message': '查询成功',
+        'data': response_data
+    })
+
+
+def _summarize_city(
+    city_info: Dict[str, Any],
+    start_date: str,
+    end_date: str,
+    fields: List[str]
+) -> Tuple[int, Dict[str, Any]]:
+    """
+    计算单个城市的统计摘要
+    
+    本地数据完整时由数据库聚合计算，否则由补齐时获取的小时数据计算
+    
+    Args:
+        city_info: 城市信息
+        start_date: 开始日期
+        end_date: 结束日期
+        fields: 字段列表
+        
+    Returns:
+        (记录数, 统计摘要)
+    """
+    filters, records = _prepare_city_data(city_info, start_date, end_date, fields)
+    if records is None:
+        result = data_analyzer.summarize_stored(filters, fields)
+        return result['total_records'], result['summary']
+    return len(records), data_analyzer.calculate_summary(records)
+
+
+def _load_weather_columns(
+    city_info: Dict[str, Any],
+    start_date: str,
+    end_date: str,
+    fields: List[str]
+) -> Dict[str, List[Any]]:
+    """
+    以列式读取单个城市的天气数据
+    
+    本地数据完整时直接从 weather_data 读取，否则使用补齐时获取的数据
+    
+    Args:
+        city_info: 城市信息
+        start_date: 开始日期
+        end_date: 结束日期
+        fields: 字段列表
+        
+    Returns:
+        列式数据 {'datetime': [...], 字段: [...]}
+    """
+    db_manager = weather_service.db_manager
+    filters, records = _prepare_city_data(city_info, start_date, end_date, fields)
+    if records is None:
+        return db_manager.get_weather_columns(filters, fields)
+    
+    columns = ['datetime'] + db_manager.valid_weather_fields(fields)
+    return {column: [r.get(column) for r in records] for column in columns}
+
+
+def _ndjson_line(obj: Any) -> str:
+    """序列化为一行NDJSON"""
+    return dumps_compact(obj) + '\n'
+
+
 @api_bp.route('/weather/export', methods=['POST'])
 def export_weather():
     """
@@ -343,7 +852,7 @@ def export_weather():
             "city_id": 1,
             "start_date": "2024-01-01",
             "end_date": "2024-01-31",
-            "format": "excel",  // or "csv"
+            "format": "excel",  // csv, parquet, arrow
             "fields": ["temperature_2m", "wind_speed_10m"]
         }
     
@@ -352,7 +861,7 @@ def export_weather():
     """
     try:
         # 获取请求参数
-        data = request.get_json()
+        data = _request_params()
         
         city_id = data.get('city_id')
         start_date = data.get('start_date')
@@ -377,136 +886,1251 @@ def export_weather():
                 'data': None
             }), 404
         
-        # 获取天气数据
-        weather_data = weather_service.get_historical_weather(
-            longitude=city_info['longitude'],
-            latitude=city_info['latitude'],
-            start_date=start_date,
-            end_date=end_date,
-            fields=fields,
-            city_id=city_id
-        )
+        unavailable = _columnar_unavailable(export_format)
+        if unavailable:
+            return unavailable
         
         # 生成文件名
         filename = f"{city_info['city_name']}_天气数据_{start_date}_{end_date}"
         
+        if export_format in COLUMNAR_FORMATS:
+            return _columnar_response([city_info], start_date, end_date, fields, export_format, filename)
+        
+        # 本地数据完整时CSV直接从数据库游标流式输出
+        try:
+            is_local = export_format == 'csv' and weather_service.ensure_local_data(
+                city_id, start_date, end_date, fields
+            )
+        except Exception as e:
+            logger.warning(f"检查本地数据失败，回退到常规导出: {e}")
+            is_local = False
+        
+        if is_local:
+            db_manager = weather_service.db_manager
+            columns = ['datetime'] + db_manager.valid_weather_fields(fields)
+            row_chunks = db_manager.iter_weather_rows({
+                'city_id': city_id,
+                'start_date': f"{start_date}T00:00",
+                'end_date': f"{end_date}T23:59"
+            }, fields)
+            return _csv_response(
+                data_exporter.iter_csv(row_chunks, columns, fields, city_name=city_info['city_name']),
+                filename + '.csv'
+            )
+        
         # 导出数据
         if export_format == 'csv':
-            file_bytes = data_exporter.export_to_csv(
+            weather_data = weather_service.get_historical_weather(
+                longitude=city_info['longitude'],
+                latitude=city_info['latitude'],
+                start_date=start_date,
+                end_date=end_date,
+                fields=fields,
+                city_id=city_id
+            )
+            output = BytesIO(data_exporter.export_to_csv(
                 weather_data['hourly_data'],
                 filename,
                 fields,
                 city_name=city_info['city_name']
-            )
+            ))
             mimetype = 'text/csv'
             filename += '.csv'
         else:
-            file_bytes = data_exporter.export_to_excel(
-                weather_data['hourly_data'],
-                filename,
-                fields,
-                city_name=city_info['city_name'],
-                include_summary=True
-            )
-            mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-            filename += '.xlsx'
+            output = _cached_export(
+                [city_info], start_date, end_date, fields, 'excel', 'single',
+                lambda: data_exporter.write_excel(
+                    _iter_city_records([city_info], start_date, end_date, fields, with_city=False),
+                    filename,
+                    fields,
+                    city_name=city_info['city_name'],
+                    include_summary=True
+                )
+            )
+            mimetype = EXCEL_MIMETYPE
+            filename += '.xlsx'
+        
+        # 返回文件（send_file 在响应结束后关闭临时文件）
+        return send_file(
+            output,
+            mimetype=mimetype,
+            as_attachment=True,
+            download_name=filename
+        )
+        
+    except Exception as e:
+        logger.error(f"导出数据失败: {e}")
+        return jsonify({
+            'code': 500,
+            'message': f'导出失败: {str(e)}',
+            'data': None
+        }), 500
+
+
+def _content_disposition(filename: str) -> str:
+    """
+    生成附件下载的 Content-Disposition（RFC 6266 / RFC 5987）
+    
+    中文文件名放在 filename*，filename 为去除非ASCII字符后的兼容名称
+    
+    Args:
+        filename: 文件名
+        
+    Returns:
+        响应头的值
+    """
+    ascii_name = unicodedata.normalize('NFKD', filename).encode('ascii', 'ignore').decode('ascii')
+    ascii_name = ascii_name.replace('"', '').replace('\\', '').strip('_') or 'download'
+    if ascii_name == filename:
+        return f'attachment; filename="{filename}"'
+    return f"attachment; filename=\"{ascii_name}\"; filename*=UTF-8''{quote(filename, safe='')}"
+
+
+def _csv_response(chunks: Iterator[bytes], filename: str) -> Response:
+    """
+    以分块传输返回流式CSV下载
+    
+    Args:
+        chunks: CSV字节块
+        filename: 下载文件名
+        
+    Returns:
+        流式Flask响应
+    """
+    response = Response(stream_with_context(chunks), mimetype='text/csv')
+    response.headers['Content-Disposition'] = _content_disposition(filename)
+    return response
+
+
+def _backfill_cities(
+    cities: List[Dict[str, Any]],
+    start_date: str,
+    end_date: str,
+    fields: List[str],
+    progress: Optional[Callable[[int, int], None]] = None
+) -> None:
+    """
+    逐城市补齐本地缺失的数据，任一城市下载失败时抛出异常
+    
+    Args:
+        cities: 城市信息列表
+        start_date: 开始日期
+        end_date: 结束日期
+        fields: 需要的字段
+        progress: 进度回调 (已完成城市数, 城市总数)，每个城市开始前调用
+    """
+    for index, city in enumerate(cities):
+        if progress:
+            progress(index, len(cities))
+        weather_service.ensure_local_data(city['id'], start_date, end_date, fields)
+
+
+def _iter_bulk_csv(
+    cities: List[Dict[str, Any]],
+    start_date: str,
+    end_date: str,
+    fields: List[str],
+    progress: Optional[Callable[[int, int], None]] = None
+) -> Iterator[bytes]:
+    """
+    逐城市生成批量导出的CSV内容
+    
+    输出第一个字节之前先补齐所有城市的缺失数据，下载失败时直接抛出异常（仍可返回错误状态码），
+    随后从 weather_data 游标分块读取
+    
+    Args:
+        cities: 城市信息列表
+        start_date: 开始日期
+        end_date: 结束日期
+        fields: 导出字段
+        progress: 进度回调 (已完成城市数, 城市总数)，每个城市补齐前调用
+        
+    Returns:
+        CSV字节块的迭代器，首块为表头
+    """
+    _backfill_cities(cities, start_date, end_date, fields, progress)
+    
+    db_manager = weather_service.db_manager
+    columns = ['city_id', 'datetime'] + db_manager.valid_weather_fields(fields)
+    city_names = {c['id']: c['city_name'] for c in cities}
+    
+    def row_chunks():
+        """逐城市分块读取"""
+        for city in cities:
+            yield from db_manager.iter_weather_rows({
+                'city_id': city['id'],
+                'start_date': f"{start_date}T00:00",
+                'end_date': f"{end_date}T23:59"
+            }, fields, with_city=True)
+    
+    return data_exporter.iter_csv(row_chunks(), columns, fields, city_names=city_names)
+
+
+def _iter_city_years(
+    cities: List[Dict[str, Any]],
+    start_date: str,
+    end_date: str,
+    fields: List[str],
+    progress: Optional[Callable[[int, int], None]] = None
+) -> Iterator[Tuple[int, List[tuple]]]:
+    """
+    逐城市、逐年读取导出数据，供列式导出按 城市-年 写入行组
+    
+    每个城市先补齐缺失数据，下载失败时抛出异常，不生成只含部分城市数据的文件
+    
+    Args:
+        cities: 城市信息列表
+        start_date: 开始日期
+        end_date: 结束日期
+        fields: 导出字段
+        progress: 进度回调 (已完成城市数, 城市总数)，每个城市开始前调用
+        
+    Yields:
+        (city_id, 元组行)，行为 (datetime, 字段1, ...)
+    """
+    db_manager = weather_service.db_manager
+    for index, city in enumerate(cities):
+        if progress:
+            progress(index, len(cities))
+        weather_service.ensure_local_data(city['id'], start_date, end_date, fields)
+        
+        for year in range(int(start_date[:4]), int(end_date[:4]) + 1):
+            rows = []
+            for chunk in db_manager.iter_weather_rows({
+                'city_id': city['id'],
+                'start_date': max(f"{start_date}T00:00", f"{year}-01-01T00:00"),
+                'end_date': min(f"{end_date}T23:59", f"{year}-12-31T23:59")
+            }, fields):
+                rows.extend(chunk)
+            yield city['id'], rows
+
+
+def _export_file_type(export_format: str) -> Tuple[str, str]:
+    """导出格式对应的 (扩展名, MIME类型)"""
+    if export_format in COLUMNAR_FORMATS:
+        return COLUMNAR_FORMATS[export_format]
+    if export_format == 'csv':
+        return '.csv', 'text/csv'
+    return '.xlsx', EXCEL_MIMETYPE
+
+
+def _export_cache_key(
+    cities: List[Dict[str, Any]],
+    start_date: str,
+    end_date: str,
+    fields: List[str],
+    export_format: str,
+    layout: Optional[str]
+) -> str:
+    """
+    计算导出缓存键：导出参数 + 所涉城市在各年份的数据版本
+    
+    Args:
+        cities: 城市信息列表
+        start_date: 开始日期
+        end_date: 结束日期
+        fields: 导出字段
+        export_format: 导出格式
+        layout: 同一格式下的版式区分（如单城市/批量Excel），无区分时为None
+        
+    Returns:
+        缓存键
+    """
+    versions = weather_service.db_manager.get_year_versions(
+        [c['id'] for c in cities], int(start_date[:4]), int(end_date[:4])
+    )
+    return ExportCache.make_key({
+        'cities': [(c['id'], c['city_name']) for c in cities],
+        'start_date': start_date,
+        'end_date': end_date,
+        'fields': fields,
+        'format': export_format,
+        'layout': layout,
+        'versions': versions,
+    })
+
+
+def _cached_export(
+    cities: List[Dict[str, Any]],
+    start_date: str,
+    end_date: str,
+    fields: List[str],
+    export_format: str,
+    layout: Optional[str],
+    write: Callable[[], Optional[IO[bytes]]]
+) -> Optional[IO[bytes]]:
+    """
+    优先返回缓存的导出文件，未命中时生成并写入缓存
+    
+    生成过程中若补齐下载改变了数据版本，本次结果不写入缓存
+    （下一次导出时按新版本缓存），避免文件与缓存键对应的数据不一致
+    
+    Args:
+        cities: 城市信息列表
+        start_date: 开始日期
+        end_date: 结束日期
+        fields: 导出字段
+        export_format: 导出格式
+        layout: 版式区分，见 _export_cache_key
+        write: 生成导出文件的函数，无数据时返回None
+        
+    Returns:
+        缓存文件或生成的临时文件对象（定位在开头）；write 返回None时为None
+    """
+    if export_cache is None:
+        return write()
+    
+    extension, _ = _export_file_type(export_format)
+    key = _export_cache_key(cities, start_date, end_date, fields, export_format, layout)
+    cached = export_cache.get(key, extension)
+    if cached:
+        return cached
+    
+    output = write()
+    if output is None:
+        return None
+    if _export_cache_key(cities, start_date, end_date, fields, export_format, layout) != key:
+        return output
+    try:
+        export_cache.put(key, extension, output)
+    except OSError as e:
+        logger.warning(f"写入导出缓存失败: {e}")
+    # 返回生成的临时文件而不是缓存路径，缓存文件随后被淘汰也不影响本次下载
+    output.seek(0)
+    return output
+
+
+def _write_columnar(
+    cities: List[Dict[str, Any]],
+    start_date: str,
+    end_date: str,
+    fields: List[str],
+    file_format: str,
+    filename: str,
+    progress: Optional[Callable[[int, int], None]] = None
+) -> IO[bytes]:
+    """逐城市、逐年写入 Parquet 或 Arrow IPC 临时文件"""
+    return data_exporter.write_columnar(
+        _iter_city_years(cities, start_date, end_date, fields, progress),
+        weather_service.db_manager.valid_weather_fields(fields),
+        {c['id']: c['city_name'] for c in cities},
+        file_format,
+        filename
+    )
+
+
+def _iter_city_records(
+    cities: List[Dict[str, Any]],
+    start_date: str,
+    end_date: str,
+    fields: List[str],
+    with_city: bool = True,
+    progress: Optional[Callable[[int, int], None]] = None
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    逐城市获取记录，每个城市作为一个Excel导出块
+    
+    使用 get_historical_weather，触发“缺失字段自动下载”逻辑
+    
+    Args:
+        cities: 城市信息列表
+        start_date: 开始日期
+        end_date: 结束日期
+        fields: 导出字段
+        with_city: 是否为每条记录添加城市名称
+        progress: 进度回调 (已完成城市数, 城市总数)，每个城市开始前调用
+        
+    Yields:
+        单个城市的记录列表
+    """
+    for index, city_info in enumerate(cities):
+        if progress:
+            progress(index, len(cities))
+        weather_data = weather_service.get_historical_weather(
+            longitude=city_info['longitude'],
+            latitude=city_info['latitude'],
+            start_date=start_date,
+            end_date=end_date,
+            fields=fields,
+            city_id=city_info['id']
+        )
+        
+        records = weather_data['hourly_data']
+        if with_city:
+            for r in records:
+                r['city'] = city_info['city_name']
+        yield records
+
+
+def _columnar_response(
+    cities: List[Dict[str, Any]],
+    start_date: str,
+    end_date: str,
+    fields: List[str],
+    file_format: str,
+    filename: str
+) -> Response:
+    """
+    导出 Parquet 或 Arrow IPC 文件
+    
+    Args:
+        cities: 城市信息列表
+        start_date: 开始日期
+        end_date: 结束日期
+        fields: 导出字段
+        file_format: parquet 或 arrow
+        filename: 不含扩展名的文件名
+        
+    Returns:
+        文件下载响应
+    """
+    extension, mimetype = COLUMNAR_FORMATS[file_format]
+    output = _cached_export(
+        cities, start_date, end_date, fields, file_format, None,
+        lambda: _write_columnar(cities, start_date, end_date, fields, file_format, filename)
+    )
+    return send_file(
+        output,
+        mimetype=mimetype,
+        as_attachment=True,
+        download_name=filename + extension
+    )
+
+
+def _iter_bundle_zip(
+    cities: List[Dict[str, Any]],
+    start_date: str,
+    end_date: str,
+    fields: List[str],
+    export_format: str,
+    mode: str,
+    progress: Optional[Callable[[int, int], None]] = None
+) -> Iterator[bytes]:
+    """
+    分文件打包导出：每个城市（或城市-年）一个文件，进程池并行生成后写入 ZIP 流
+    
+    每个城市提交前先补齐缺失数据；下载失败的城市只导出本地已有数据
+    
+    Args:
+        cities: 城市信息列表
+        start_date: 开始日期
+        end_date: 结束日期
+        fields: 导出字段
+        export_format: excel、csv、parquet 或 arrow
+        mode: city 或 city_year
+        progress: 进度回调 (已完成文件数, 文件总数)
+        
+    Returns:
+        ZIP 字节块的迭代器
+    """
+    def prepare(city_id: int, start: str, end: str):
+        try:
+            weather_service.ensure_local_data(city_id, start, end, fields)
+        except Exception as e:
+            logger.warning(f"补齐数据失败，只导出本地数据: 城市ID={city_id}, {e}")
+    
+    return iter_bundle(
+        bundle_parts(cities, start_date, end_date, mode),
+        fields,
+        export_format,
+        weather_service.db_manager.db_path,
+        prepare=prepare,
+        progress=progress
+    )
+
+
+def _columnar_unavailable(export_format: str):
+    """请求了列式格式但未安装 pyarrow 时返回400响应，否则返回None"""
+    if export_format in COLUMNAR_FORMATS and not pyarrow_available():
+        return jsonify({
+            'code': 400,
+            'message': f'{export_format} 格式需要服务端安装 pyarrow',
+            'data': None
+        }), 400
+    return None
+
+
+@api_bp.route('/weather/compare', methods=['POST'])
+def compare_cities():
+    """
+    对比多个城市的天气数据
+    
+    Request Body:
+        {
+            "city_ids": [1, 2, 3],
+            "start_date": "2024-01-01",
+            "end_date": "2024-01-31",
+            "fields": ["temperature_2m", "wind_speed_10m"],
+            "summary_only": false  // 可选：仅返回各城市统计摘要，details 不含小时记录
+        }
+    
+    Returns:
+        JSON响应
+    """
+    try:
+        # 获取请求参数
+        data = _request_params()
+        
+        city_ids = data.get('city_ids', [])
+        start_date = data.get('start_date')
+        end_date = data.get('end_date')
+        fields = data.get('fields', DEFAULT_FIELDS)
+        summary_only = bool(data.get('summary_only', False))
+        
+        # 参数验证
+        if not all([city_ids, start_date, end_date]):
+            return jsonify({
+                'code': 400,
+                'message': '缺少必要参数：city_ids, start_date, end_date',
+                'data': None
+            }), 400
+        
+        if summary_only:
+            comparison = {}
+            details = []
+            for city_id in city_ids:
+                city_info = city_manager.get_city_by_id(city_id)
+                if not city_info:
+                    logger.warning(f"城市ID {city_id} 不存在，跳过")
+                    continue
+                total_records, summary = _summarize_city(city_info, start_date, end_date, fields)
+                if total_records:
+                    comparison[city_info['city_name']] = summary
+                details.append({
+                    'city_id': city_id,
+                    'city_name': city_info['city_name'],
+                    'total_records': total_records,
+                    'summary': summary
+                })
+            
+            return jsonify({
+                'code': 200,
+                'message': '对比成功',
+                'data': {
+                    'cities': [d['city_name'] for d in details],
+                    'comparison': comparison,
+                    'details': details
+                }
+            })
+        
+        # 批量查询城市数据
+        cities_data = weather_service.batch_query_cities(
+            city_ids, start_date, end_date, fields
+        )
+        
+        # 准备对比数据
+        comparison_data = [
+            {
+                'city_name': city_data['city_name'],
+                'data': city_data['hourly_data']
+            }
+            for city_data in cities_data
+        ]
+        
+        # 计算对比结果
+        comparison = data_analyzer.compare_cities(comparison_data)
+        
+        return jsonify({
+            'code': 200,
+            'message': '对比成功',
+            'data': {
+                'cities': [cd['city_name'] for cd in cities_data],
+                'comparison': comparison,
+                'details': cities_data
+            }
+        })
+        
+    except Exception as e:
+        logger.error(f"对比城市数据失败: {e}")
+        return jsonify({
+            'code': 500,
+            'message': f'对比失败: {str(e)}',
+            'data': None
+        }), 500
+
+@api_bp.route('/weather/anomalies', methods=['GET', 'POST'])
+@data_versioned
+def detect_anomalies():
+    """
+    检测天气数据异常值
+    
+    Request Body / Query:
+        {
+            "city_id": 1,
+            "start_date": "2020-01-01",
+            "end_date": "2024-12-31",
+            "fields": ["temperature_2m", "wind_speed_10m"],
+            "method": "seasonal",      // 可选：seasonal（默认，季节气候基线）或 rolling（滑动窗口）
+            "baseline": "month_hour",  // 可选：hour、month_hour（默认）或 day_of_year
+            "window": 168,             // 可选：rolling 窗口大小（小时）
+            "threshold": 3.0,          // 可选：|z| 阈值
+            "limit": 100               // 可选：每个字段最多返回的异常数量
+        }
+    
+    Returns:
+        JSON响应，data.anomalies 为 {字段: {count, indices, datetime, values, zscores}}
+    """
+    try:
+        data = _request_params()
+        
+        city_id = data.get('city_id')
+        start_date = data.get('start_date')
+        end_date = data.get('end_date')
+        fields = data.get('fields', ['temperature_2m'])
+        method = data.get('method', 'seasonal')
+        baseline = data.get('baseline', 'month_hour')
+        window = data.get('window', DEFAULT_WINDOW_HOURS)
+        threshold = data.get('threshold', DEFAULT_THRESHOLD)
+        limit = data.get('limit')
+        
+        if not all([city_id, start_date, end_date]):
+            return jsonify({
+                'code': 400,
+                'message': '缺少必要参数：city_id, start_date, end_date',
+                'data': None
+            }), 400
+        
+        if method not in ANOMALY_METHODS or baseline not in SEASONAL_BASELINES:
+            return jsonify({
+                'code': 400,
+                'message': f'不支持的检测方法: {method}/{baseline}',
+                'data': None
+            }), 400
+        
+        if not isinstance(window, int) or window < 2 or not isinstance(threshold, (int, float)) or threshold <= 0 \
+                or (limit is not None and (not isinstance(limit, int) or limit < 1)):
+            return jsonify({
+                'code': 400,
+                'message': 'window 须为不小于2的整数，threshold 须为正数，limit 须为正整数',
+                'data': None
+            }), 400
+        
+        fields = weather_service.db_manager.valid_weather_fields(fields if isinstance(fields, list) else [fields])
+        if not fields:
+            return jsonify({
+                'code': 400,
+                'message': 'fields 中没有可检测的天气数据字段',
+                'data': None
+            }), 400
+        
+        city_info = city_manager.get_city_by_id(city_id)
+        if not city_info:
+            return jsonify({
+                'code': 404,
+                'message': f'城市ID {city_id} 不存在',
+                'data': None
+            }), 404
+        
+        columns = _load_weather_columns(city_info, start_date, end_date, fields)
+        anomalies = find_anomalies(
+            columns, fields, method=method, threshold=threshold,
+            window=window, baseline=baseline, limit=limit
+        )
+        
+        return jsonify({
+            'code': 200,
+            'message': '检测成功',
+            'data': {
+                'city_id': city_id,
+                'city_name': city_info['city_name'],
+                'start_date': start_date,
+                'end_date': end_date,
+                'method': method,
+                'baseline': baseline if method == 'seasonal' else None,
+                'window': window if method == 'rolling' else None,
+                'threshold': threshold,
+                'total_records': len(columns['datetime']),
+                'anomalies': anomalies
+            }
+        })
+        
+    except Exception as e:
+        logger.error(f"异常检测失败: {e}")
+        return jsonify({
+            'code': 500,
+            'message': f'异常检测失败: {str(e)}',
+            'data': None
+        }), 500
+
+
+@api_bp.route('/weather/trends', methods=['GET', 'POST'])
+@data_versioned
+def weather_trends():
+    """
+    计算多字段、多窗口的移动平均趋势
+    
+    Request Body / Query:
+        {
+            "city_id": 1,
+            "start_date": "2024-01-01",
+            "end_date": "2024-12-31",
+            "fields": ["temperature_2m", "wind_speed_10m"],
+            "windows": [24, 168, 720],  // 可选：窗口大小（小时）
+            "max_points": 1000,         // 可选：按原始字段降采样后的最大点数
+            "downsample": "lttb"        // 可选：降采样算法
+        }
+    
+    Returns:
+        JSON响应，data.columns 为 {datetime, 字段, 字段_trend_窗口} 列式数组
+    """
+    try:
+        data = _request_params()
+        
+        city_id = data.get('city_id')
+        start_date = data.get('start_date')
+        end_date = data.get('end_date')
+        fields = data.get('fields', ['temperature_2m'])
+        windows = data.get('windows', list(DEFAULT_TREND_WINDOWS))
+        max_points = data.get('max_points')
+        downsample_method = data.get('downsample', 'lttb')
+        
+        if not all([city_id, start_date, end_date]):
+            return jsonify({
+                'code': 400,
+                'message': '缺少必要参数：city_id, start_date, end_date',
+                'data': None
+            }), 400
+        
+        if not windows or not all(isinstance(w, int) and 1 <= w <= MAX_TREND_WINDOW for w in windows):
+            return jsonify({
+                'code': 400,
+                'message': f'windows 须为 1 到 {MAX_TREND_WINDOW} 之间的整数列表',
+                'data': None
+            }), 400
+        
+        if max_points is not None and (not isinstance(max_points, int) or max_points < MIN_MAX_POINTS):
+            return jsonify({
+                'code': 400,
+                'message': f'max_points 必须是不小于 {MIN_MAX_POINTS} 的整数',
+                'data': None
+            }), 400
+        
+        if downsample_method not in DOWNSAMPLE_METHODS:
+            return jsonify({
+                'code': 400,
+                'message': f'不支持的降采样算法: {downsample_method}',
+                'data': None
+            }), 400
+        
+        fields = weather_service.db_manager.valid_weather_fields(fields if isinstance(fields, list) else [fields])
+        if not fields:
+            return jsonify({
+                'code': 400,
+                'message': 'fields 中没有可计算趋势的天气数据字段',
+                'data': None
+            }), 400
+        
+        city_info = city_manager.get_city_by_id(city_id)
+        if not city_info:
+            return jsonify({
+                'code': 404,
+                'message': f'城市ID {city_id} 不存在',
+                'data': None
+            }), 404
+        
+        columns = _load_weather_columns(city_info, start_date, end_date, fields)
+        trend_fields = [f for f in fields if f in columns]
+        trends = data_analyzer.calculate_multi_trends(columns, trend_fields, windows)
+        total_records = len(trends['datetime'])
+        
+        response_data = {
+            'city_id': city_id,
+            'city_name': city_info['city_name'],
+            'start_date': start_date,
+            'end_date': end_date,
+            'fields': trend_fields,
+            'windows': windows,
+            'total_records': total_records
+        }
+        
+        if max_points and total_records > max_points:
+            trends, _ = downsample_columns(trends, trend_fields, max_points, downsample_method)
+            response_data['downsampled'] = {
+                'method': downsample_method,
+                'max_points': max_points,
+                'original_records': total_records,
+                'returned_records': len(trends['datetime'])
+            }
+        
+        response_data['columns'] = trends
+        
+        return jsonify({
+            'code': 200,
+            'message': '计算成功',
+            'data': response_data
+        })
+        
+    except Exception as e:
+        logger.error(f"计算趋势失败: {e}")
+        return jsonify({
+            'code': 500,
+            'message': f'计算趋势失败: {str(e)}',
+            'data': None
+        }), 500
+
+
+@api_bp.route('/weather/departures', methods=['GET', 'POST'])
+@data_versioned
+def weather_departures():
+    """
+    查询相对气候基线（常年值）的距平
+    
+    Request Body / Query:
+        {
+            "city_id": 1,
+            "start_date": "2024-01-01",
+            "end_date": "2024-12-31",
+            "field": "temperature_2m",
+            "period": "doy"  // 可选：doy（年内日序，默认）或 hour（一天中的小时）
+        }
+    
+    基线缺失或参考期内数据变化时会先增量重建该城市该字段的基线
+    
+    Returns:
+        JSON响应，data.columns 为 {datetime, value, normal, departure, zscore} 列式数组
+    """
+    try:
+        data = _request_params()
+        
+        city_id = data.get('city_id')
+        start_date = data.get('start_date')
+        end_date = data.get('end_date')
+        field = data.get('field', 'temperature_2m')
+        period = data.get('period', 'doy')
+        
+        if not all([city_id, start_date, end_date]):
+            return jsonify({
+                'code': 400,
+                'message': '缺少必要参数：city_id, start_date, end_date',
+                'data': None
+            }), 400
+        
+        if period not in CLIMATOLOGY_PERIODS or not weather_service.db_manager.valid_weather_fields([field]):
+            return jsonify({
+                'code': 400,
+                'message': f'不支持的字段或基线分组: {field}/{period}',
+                'data': None
+            }), 400
+        
+        city_info = city_manager.get_city_by_id(city_id)
+        if not city_info:
+            return jsonify({
+                'code': 404,
+                'message': f'城市ID {city_id} 不存在',
+                'data': None
+            }), 404
+        
+        try:
+            weather_service.ensure_local_data(city_id, start_date, end_date, [field])
+        except Exception as e:
+            logger.warning(f"检查本地数据失败: {e}")
+        
+        result = climatology_service.departures(city_id, start_date, end_date, field, period)
+        
+        return jsonify({
+            'code': 200,
+            'message': '查询成功',
+            'data': {
+                'city_id': city_id,
+                'city_name': city_info['city_name'],
+                'start_date': start_date,
+                'end_date': end_date,
+                'field': field,
+                'period': period,
+                'reference': [climatology_service.ref_start_year, climatology_service.ref_end_year],
+                **result
+            }
+        })
+        
+    except Exception as e:
+        logger.error(f"查询距平失败: {e}")
+        return jsonify({
+            'code': 500,
+            'message': f'查询距平失败: {str(e)}',
+            'data': None
+        }), 500
+
+
+@api_bp.route('/climatology', methods=['GET'])
+def get_climatology():
+    """
+    获取城市某字段的气候基线
+    
+    Query:
+        city_id: 城市ID
+        field: 字段名（默认 temperature_2m）
+        period: doy（默认）或 hour
+    
+    Returns:
+        JSON响应，data.baseline 为按 key 升序的 {key, n, mean, std, p10, p50, p90}
+    """
+    try:
+        city_id = request.args.get('city_id', type=int)
+        field = request.args.get('field', 'temperature_2m')
+        period = request.args.get('period', 'doy')
+        
+        if not city_id or period not in CLIMATOLOGY_PERIODS:
+            return jsonify({
+                'code': 400,
+                'message': '缺少 city_id 或基线分组不支持',
+                'data': None
+            }), 400
+        
+        db_manager = weather_service.db_manager
+        meta = [m for m in db_manager.get_climatology_meta(city_id) if m['field'] == field]
+        
+        return jsonify({
+            'code': 200,
+            'message': '获取成功',
+            'data': {
+                'city_id': city_id,
+                'field': field,
+                'period': period,
+                'meta': meta[0] if meta else None,
+                'baseline': db_manager.get_climatology(city_id, field, period)
+            }
+        })
+        
+    except Exception as e:
+        logger.error(f"获取气候基线失败: {e}")
+        return jsonify({
+            'code': 500,
+            'message': f'获取失败: {str(e)}',
+            'data': None
+        }), 500
+
+
+@api_bp.route('/climatology/refresh', methods=['POST'])
+def refresh_climatology():
+    """
+    构建或增量刷新气候基线
+    
+    Request Body:
+        {
+            "city_ids": [1, 2],   // 可选：默认全部启用城市
+            "fields": [...],      // 可选：默认 CLIMATOLOGY_FIELDS
+            "force": false        // 可选：为真时全部重建
+        }
+    
+    Returns:
+        JSON响应，data.rebuilt 为 {city_id: {字段: 有数据的年数}}
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        city_ids = data.get('city_ids') or [c['id'] for c in city_manager.get_all_cities()]
+        
+        rebuilt = climatology_service.refresh(
+            city_ids, data.get('fields'), force=bool(data.get('force', False))
+        )
+        
+        return jsonify({
+            'code': 200,
+            'message': f'已重建 {len(rebuilt)} 个城市的气候基线',
+            'data': {'rebuilt': rebuilt}
+        })
+        
+    except Exception as e:
+        logger.error(f"刷新气候基线失败: {e}")
+        return jsonify({
+            'code': 500,
+            'message': f'刷新失败: {str(e)}',
+            'data': None
+        }), 500
+
+
+@api_bp.route('/weather/percentiles', methods=['GET', 'POST'])
+@data_versioned
+def weather_percentiles():
+    """
+    查询任意时间范围的近似分位数分布
+    
+    Request Body / Query:
+        {
+            "city_id": 1,                  // 或 "city_ids": [1, 2]（合并为一个分布）
+            "start_date": "2015-01-01",
+            "end_date": "2024-12-31",
+            "fields": ["temperature_2m", "wind_speed_10m"],
+            "percentiles": [5, 50, 95],    // 可选：默认 5,25,50,75,95
+            "include_histogram": false     // 可选：返回非空箱
+        }
+    
+    由按月预计算的分箱直方图合并得到，误差不超过一个箱宽（见 HISTOGRAM_BINS）
+    
+    Returns:
+        JSON响应，data.distributions 为 {字段: {count, bin_width, percentiles, histogram?}}
+    """
+    try:
+        data = _request_params()
+        
+        city_ids = data.get('city_ids') or ([data['city_id']] if data.get('city_id') else [])
+        start_date = data.get('start_date')
+        end_date = data.get('end_date')
+        fields = data.get('fields', ['temperature_2m'])
+        percentiles = data.get('percentiles', list(DEFAULT_PERCENTILES))
+        include_histogram = bool(data.get('include_histogram', False))
+        
+        if not all([city_ids, start_date, end_date]):
+            return jsonify({
+                'code': 400,
+                'message': '缺少必要参数：city_id 或 city_ids, start_date, end_date',
+                'data': None
+            }), 400
+        
+        unsupported = [f for f in fields if f not in HISTOGRAM_BINS]
+        if unsupported or not percentiles or not all(
+            isinstance(p, (int, float)) and 0 <= p <= 100 for p in percentiles
+        ):
+            return jsonify({
+                'code': 400,
+                'message': f'不支持的字段 {unsupported} 或百分位不在 0-100 之间',
+                'data': None
+            }), 400
+        
+        for city_id in city_ids:
+            try:
+                weather_service.ensure_local_data(city_id, start_date, end_date, fields)
+            except Exception as e:
+                logger.warning(f"检查本地数据失败: 城市ID={city_id}, {e}")
+        
+        distributions = {
+            field: data_analyzer.calculate_percentiles(
+                city_ids, field, start_date, end_date, percentiles, include_histogram
+            )
+            for field in fields
+        }
+        
+        return jsonify({
+            'code': 200,
+            'message': '查询成功',
+            'data': {
+                'city_ids': city_ids,
+                'start_date': start_date,
+                'end_date': end_date,
+                'distributions': distributions
+            }
+        })
+        
+    except Exception as e:
+        logger.error(f"查询分位数失败: {e}")
+        return jsonify({
+            'code': 500,
+            'message': f'查询分位数失败: {str(e)}',
+            'data': None
+        }), 500
+
+
+def _energy_options(data: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[str]]:
+    """
+    解析新能源分析的公共参数
+    
+    Args:
+        data: 请求参数
+        
+    Returns:
+        (选项字典, 错误信息)，参数合法时错误信息为None
+    """
+    options = {
+        'period': data.get('period', 'day'),
+        'speed_field': data.get('speed_field', 'wind_speed_100m'),
+        'power_curve': data.get('power_curve'),
+        'panel': data.get('panel'),
+    }
+    
+    if options['period'] not in ENERGY_PERIODS:
+        return options, f"不支持的统计周期: {options['period']}"
+    if options['speed_field'] not in WIND_SPEED_FIELDS:
+        return options, f"不支持的风速字段: {options['speed_field']}"
+    if options['power_curve'] is not None:
+        error = validate_power_curve(options['power_curve'])
+        if error:
+            return options, error
+    panel = options['panel']
+    if panel is not None and (
+        not isinstance(panel, dict)
+        or not all(k in DEFAULT_PANEL and isinstance(v, (int, float)) for k, v in panel.items())
+    ):
+        return options, f'panel 仅支持数值参数 {list(DEFAULT_PANEL)}'
+    return options, None
+
+
+def _energy_fields(speed_field: str) -> List[str]:
+    """新能源分析需要读取的字段"""
+    return SOLAR_FIELDS + ['surface_pressure', speed_field]
+
+
+@api_bp.route('/energy/solar', methods=['GET', 'POST'])
+@api_bp.route('/energy/wind', methods=['GET', 'POST'])
+@data_versioned
+def energy_resource():
+    """
+    单个城市的太阳能或风能资源分析
+    
+    Request Body / Query:
+        {
+            "city_id": 1,
+            "start_date": "2024-01-01",
+            "end_date": "2024-12-31",
+            "period": "day",                  // 可选：day（默认）或 month
+            "speed_field": "wind_speed_100m", // 可选（风能）：轮毂高度风速字段
+            "power_curve": {"speeds": [...], "power_kw": [...]},  // 可选（风能，POST）：风机功率曲线 m/s -> kW
+            "panel": {"performance_ratio": 0.8}                   // 可选（太阳能，POST）：光伏组件参数
+        }
+    
+    太阳能：辐照量 kWh/m² 与 MJ/m²、峰值日照时数、每 kWp 发电量与容量系数；
+    风能：平均风速 m/s、风功率密度 W/m²、单机发电量 MWh 与容量系数
+    
+    Returns:
+        JSON响应，data 包含 periods、series（各指标按周期的数组）与 summary
+    """
+    try:
+        data = _request_params()
+        resource = request.path.rsplit('/', 1)[-1]
+        
+        city_id = data.get('city_id')
+        start_date = data.get('start_date')
+        end_date = data.get('end_date')
+        
+        if not all([city_id, start_date, end_date]):
+            return jsonify({
+                'code': 400,
+                'message': '缺少必要参数：city_id, start_date, end_date',
+                'data': None
+            }), 400
+        
+        options, error = _energy_options(data)
+        if error:
+            return jsonify({'code': 400, 'message': error, 'data': None}), 400
+        
+        city_info = city_manager.get_city_by_id(city_id)
+        if not city_info:
+            return jsonify({
+                'code': 404,
+                'message': f'城市ID {city_id} 不存在',
+                'data': None
+            }), 404
+        
+        if resource == 'solar':
+            columns = _load_weather_columns(city_info, start_date, end_date, SOLAR_FIELDS)
+            result = solar_resource(columns, options['period'], options['panel'])
+        else:
+            fields = ['surface_pressure', 'temperature_2m', options['speed_field']]
+            columns = _load_weather_columns(city_info, start_date, end_date, fields)
+            result = wind_resource(columns, options['period'], options['speed_field'], options['power_curve'])
         
-        # 返回文件
-        return send_file(
-            BytesIO(file_bytes),
-            mimetype=mimetype,
-            as_attachment=True,
-            download_name=filename
-        )
+        return jsonify({
+            'code': 200,
+            'message': '分析成功',
+            'data': {
+                'city_id': city_id,
+                'city_name': city_info['city_name'],
+                'start_date': start_date,
+                'end_date': end_date,
+                'resource': resource,
+                'period': options['period'],
+                **result
+            }
+        })
         
     except Exception as e:
-        logger.error(f"导出数据失败: {e}")
+        logger.error(f"新能源资源分析失败: {e}")
         return jsonify({
             'code': 500,
-            'message': f'导出失败: {str(e)}',
+            'message': f'分析失败: {str(e)}',
             'data': None
         }), 500
 
 
-@api_bp.route('/weather/compare', methods=['POST'])
-def compare_cities():
+@api_bp.route('/energy/screening', methods=['POST'])
+def energy_screening():
     """
-    对比多个城市的天气数据
+    多城市新能源选址初筛
     
     Request Body:
         {
-            "city_ids": [1, 2, 3],
-            "start_date": "2024-01-01",
-            "end_date": "2024-01-31",
-            "fields": ["temperature_2m", "wind_speed_10m"]
+            "city_ids": [1, 2, 3],            // 可选：默认全部城市
+            "start_date": "2015-01-01",
+            "end_date": "2024-12-31",
+            "speed_field": "wind_speed_100m", // 可选
+            "power_curve": {...},             // 可选
+            "panel": {...}                    // 可选
         }
     
+    只使用本地已存储的数据，不触发下载，无数据的城市 hours 为0
+    
     Returns:
-        JSON响应
+        JSON响应，data.sites 为 [{city_id, city_name, solar, wind}]
     """
     try:
-        # 获取请求参数
-        data = request.get_json()
-        
-        city_ids = data.get('city_ids', [])
+        data = request.get_json(silent=True) or {}
         start_date = data.get('start_date')
         end_date = data.get('end_date')
-        fields = data.get('fields', DEFAULT_FIELDS)
         
-        # 参数验证
-        if not all([city_ids, start_date, end_date]):
+        if not all([start_date, end_date]):
             return jsonify({
                 'code': 400,
-                'message': '缺少必要参数：city_ids, start_date, end_date',
+                'message': '缺少必要参数：start_date, end_date',
                 'data': None
             }), 400
         
-        # 批量查询城市数据
-        cities_data = weather_service.batch_query_cities(
-            city_ids, start_date, end_date, fields
-        )
+        options, error = _energy_options(data)
+        if error:
+            return jsonify({'code': 400, 'message': error, 'data': None}), 400
         
-        # 准备对比数据
-        comparison_data = [
-            {
-                'city_name': city_data['city_name'],
-                'data': city_data['hourly_data']
-            }
-            for city_data in cities_data
-        ]
+        cities = city_manager.get_all_cities()
+        if data.get('city_ids'):
+            wanted = set(data['city_ids'])
+            cities = [c for c in cities if c['id'] in wanted]
         
-        # 计算对比结果
-        comparison = data_analyzer.compare_cities(comparison_data)
+        db_manager = weather_service.db_manager
+        fields = _energy_fields(options['speed_field'])
+        sites = []
+        for city in cities:
+            columns = db_manager.get_weather_columns({
+                'city_id': city['id'],
+                'start_date': f"{start_date}T00:00",
+                'end_date': f"{end_date}T23:59"
+            }, fields)
+            sites.append({
+                'city_id': city['id'],
+                'city_name': city['city_name'],
+                **screen_site(columns, options['speed_field'], options['power_curve'], options['panel'])
+            })
         
         return jsonify({
             'code': 200,
-            'message': '对比成功',
+            'message': '分析成功',
             'data': {
-                'cities': [cd['city_name'] for cd in cities_data],
-                'comparison': comparison,
-                'details': cities_data
+                'start_date': start_date,
+                'end_date': end_date,
+                'speed_field': options['speed_field'],
+                'sites': sites
             }
         })
         
     except Exception as e:
-        logger.error(f"对比城市数据失败: {e}")
+        logger.error(f"新能源选址初筛失败: {e}")
         return jsonify({
             'code': 500,
-            'message': f'对比失败: {str(e)}',
+            'message': f'初筛失败: {str(e)}',
             'data': None
         }), 500
 
+
 @api_bp.route('/data/export-bulk', methods=['POST'])
 def export_bulk_data():
     """
     导出多个城市的完整天气数据
+    
+    默认所有城市写入同一个文件；bundle 为 city / city_year 时每个城市（或城市-年）
+    生成一个文件，由进程池并行生成并以 ZIP 流式返回
     """
     try:
-        data = request.get_json()
+        data = _request_params()
         city_ids = data.get('city_ids', [])
         start_date = data.get('start_date')
         end_date = data.get('end_date')
         export_format = data.get('format', 'excel')
+        bundle = data.get('bundle')
         
         if not all([city_ids, start_date, end_date]):
              return jsonify({
@@ -514,59 +2138,268 @@ def export_bulk_data():
                 'message': '缺少必要参数：city_ids, start_date, end_date',
                 'data': None
             }), 400
+        
+        if bundle and bundle not in BUNDLE_MODES:
+            return jsonify({
+                'code': 400,
+                'message': f"bundle 必须是 {', '.join(BUNDLE_MODES)} 之一",
+                'data': None
+            }), 400
             
-        all_data = []
         # 获取所有可能的字段
         all_fields = []
         for cat in AVAILABLE_FIELDS.values():
             all_fields.extend(cat.keys())
-            
-        for city_id in city_ids:
-            city_info = city_manager.get_city_by_id(city_id)
-            if not city_info: continue
-            
-            # 使用 weather_service 获取数据，触发“缺失字段自动下载”逻辑
-            weather_data = weather_service.get_historical_weather(
-                longitude=city_info['longitude'],
-                latitude=city_info['latitude'],
-                start_date=start_date,
-                end_date=end_date,
-                fields=all_fields,
-                city_id=city_id
-            )
-            
-            records = weather_data['hourly_data']
-            # 为每条记录添加城市名称
-            for r in records:
-                r['city'] = city_info['city_name']
-            
-            all_data.extend(records)
-            
-        if not all_data:
-            return jsonify({'code': 404, 'message': '选定范围内暂无数据，请先点击下载到数据库', 'data': None}), 404
-            
+        
+        exported = {'records': 0}
+        cities = [c for c in (city_manager.get_city_by_id(i) for i in city_ids) if c]
+        
+        def city_chunks():
+            """逐个城市获取数据并计数，每个城市作为一个导出块"""
+            for records in _iter_city_records(cities, start_date, end_date, all_fields):
+                exported['records'] += len(records)
+                yield records
+        
         filename = f"广西天气数据_批量_{start_date}_{end_date}"
         
-        if export_format == 'csv':
-            file_bytes = data_exporter.export_to_csv(all_data, filename, all_fields)
-            mimetype = 'text/csv'
-            filename += '.csv'
-        else:
-            file_bytes = data_exporter.export_to_excel(all_data, filename, all_fields, include_summary=True)
-            mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-            filename += '.xlsx'
+        unavailable = _columnar_unavailable(export_format)
+        if unavailable:
+            return unavailable
+        
+        if bundle or export_format == 'csv' or export_format in COLUMNAR_FORMATS:
+            if not cities:
+                return jsonify({'code': 404, 'message': '选定的城市不存在', 'data': None}), 404
+            if bundle:
+                # 每个城市（或城市-年）一个文件，不受单表行数限制
+                response = Response(
+                    stream_with_context(_iter_bundle_zip(cities, start_date, end_date, all_fields, export_format, bundle)),
+                    mimetype='application/zip'
+                )
+                response.headers['Content-Disposition'] = _content_disposition(filename + '.zip')
+                return response
+            if export_format in COLUMNAR_FORMATS:
+                return _columnar_response(cities, start_date, end_date, all_fields, export_format, filename)
+            # 先补齐所有城市的缺失数据（失败时返回500），再从数据库游标流式输出
+            return _csv_response(
+                _iter_bulk_csv(cities, start_date, end_date, all_fields),
+                filename + '.csv'
+            )
+        
+        def write():
+            """只写模式逐城市写入，内存中只保留当前城市的数据；无数据时返回None"""
+            output = data_exporter.write_excel(city_chunks(), filename, all_fields, include_summary=True)
+            if not exported['records']:
+                output.close()
+                return None
+            return output
+        
+        output = _cached_export(cities, start_date, end_date, all_fields, 'excel', 'bulk', write)
+        if output is None:
+            return jsonify({'code': 404, 'message': '选定范围内暂无数据，请先点击下载到数据库', 'data': None}), 404
             
         return send_file(
-            BytesIO(file_bytes),
-            mimetype=mimetype,
+            output,
+            mimetype=EXCEL_MIMETYPE,
             as_attachment=True,
-            download_name=filename
+            download_name=filename + '.xlsx'
         )
     except Exception as e:
         logger.error(f"批量导出数据失败: {e}")
         return jsonify({'code': 500, 'message': f'导出失败: {str(e)}', 'data': None}), 500
 
 
+def _export_producer(
+    cities: List[Dict[str, Any]],
+    start_date: str,
+    end_date: str,
+    fields: List[str],
+    export_format: str,
+    filename: str,
+    bundle: Optional[str] = None
+) -> Callable[[Callable[[int, int], None]], Any]:
+    """
+    构造异步导出任务的生成函数（在工作线程中执行，不依赖请求上下文）
+    
+    Args:
+        cities: 城市信息列表
+        start_date: 开始日期
+        end_date: 结束日期
+        fields: 导出字段
+        export_format: excel、csv、parquet 或 arrow
+        filename: 不含扩展名的文件名
+        bundle: 分文件打包方式（city / city_year），None 表示单个文件
+        
+    Returns:
+        接收进度回调、返回文件对象或字节块迭代器的函数
+    """
+    def write(progress):
+        if export_format in COLUMNAR_FORMATS:
+            return _write_columnar(cities, start_date, end_date, fields, export_format, filename, progress)
+        single = len(cities) == 1
+        return data_exporter.write_excel(
+            _iter_city_records(cities, start_date, end_date, fields, with_city=not single, progress=progress),
+            filename,
+            fields,
+            include_summary=True,
+            city_name=cities[0]['city_name'] if single else None
+        )
+    
+    def produce(progress):
+        if bundle:
+            return _iter_bundle_zip(cities, start_date, end_date, fields, export_format, bundle, progress)
+        if export_format == 'csv':
+            return _iter_bulk_csv(cities, start_date, end_date, fields, progress)
+        layout = None if export_format in COLUMNAR_FORMATS else ('single' if len(cities) == 1 else 'bulk')
+        return _cached_export(
+            cities, start_date, end_date, fields, export_format, layout,
+            lambda: write(progress)
+        )
+    return produce
+
+
+def _export_job_info(job: Dict[str, Any]) -> Dict[str, Any]:
+    """任务信息附带查询与下载地址"""
+    job_id = job['job_id']
+    return {
+        **job,
+        'status_url': f"{api_bp.url_prefix}/export/jobs/{job_id}",
+        'download_url': f"{api_bp.url_prefix}/export/jobs/{job_id}/download",
+    }
+
+
+@api_bp.route('/export/jobs', methods=['POST'])
+def create_export_job():
+    """
+    创建异步导出任务，立即返回任务ID
+    
+    Request Body:
+        {
+            "city_ids": [1, 2],  // 或 "city_id": 1
+            "start_date": "2024-01-01",
+            "end_date": "2024-12-31",
+            "format": "excel",  // csv, parquet, arrow
+            "fields": ["temperature_2m"],  // 可选，单城市默认常用字段，多城市默认全部字段
+            "bundle": "city"  // 可选，city / city_year：每个城市（或城市-年）一个文件，打包为ZIP
+        }
+    
+    Returns:
+        202，任务信息（含 status_url、download_url）
+    """
+    try:
+        data = _request_params()
+        city_ids = data.get('city_ids') or ([data['city_id']] if data.get('city_id') else [])
+        start_date = data.get('start_date')
+        end_date = data.get('end_date')
+        export_format = data.get('format', 'excel')
+        bundle = data.get('bundle')
+        
+        if not all([city_ids, start_date, end_date]):
+            return jsonify({
+                'code': 400,
+                'message': '缺少必要参数：city_id 或 city_ids, start_date, end_date',
+                'data': None
+            }), 400
+        
+        if bundle and bundle not in BUNDLE_MODES:
+            return jsonify({
+                'code': 400,
+                'message': f"bundle 必须是 {', '.join(BUNDLE_MODES)} 之一",
+                'data': None
+            }), 400
+        
+        if export_format not in ('excel', 'csv') and export_format not in COLUMNAR_FORMATS:
+            return jsonify({'code': 400, 'message': f'不支持的导出格式: {export_format}', 'data': None}), 400
+        
+        unavailable = _columnar_unavailable(export_format)
+        if unavailable:
+            return unavailable
+        
+        cities = [c for c in (city_manager.get_city_by_id(i) for i in city_ids) if c]
+        if not cities:
+            return jsonify({'code': 404, 'message': '选定的城市不存在', 'data': None}), 404
+        
+        if len(cities) == 1:
+            fields = data.get('fields', DEFAULT_FIELDS)
+            filename = f"{cities[0]['city_name']}_天气数据_{start_date}_{end_date}"
+        else:
+            fields = data.get('fields') or [f for cat in AVAILABLE_FIELDS.values() for f in cat]
+            filename = f"广西天气数据_批量_{start_date}_{end_date}"
+        
+        extension, mimetype = ('.zip', 'application/zip') if bundle else _export_file_type(export_format)
+        job = export_jobs.submit(
+            _export_producer(cities, start_date, end_date, fields, export_format, filename, bundle),
+            filename + extension,
+            mimetype
+        )
+        
+        return jsonify({
+            'code': 202,
+            'message': '导出任务已创建',
+            'data': _export_job_info(job)
+        }), 202
+        
+    except Exception as e:
+        logger.error(f"创建导出任务失败: {e}")
+        return jsonify({'code': 500, 'message': f'创建导出任务失败: {str(e)}', 'data': None}), 500
+
+
+@api_bp.route('/export/jobs/<job_id>', methods=['GET'])
+def get_export_job(job_id: str):
+    """
+    查询导出任务状态与进度
+    
+    Returns:
+        任务信息：status 为 pending/running/done/failed/cancelled，progress 为 0-1
+    """
+    job = export_jobs.get(job_id)
+    if job is None:
+        return jsonify({'code': 404, 'message': '导出任务不存在或已过期', 'data': None}), 404
+    return jsonify({'code': 200, 'message': '获取导出任务成功', 'data': _export_job_info(job)})
+
+
+@api_bp.route('/export/jobs/<job_id>', methods=['DELETE'])
+def delete_export_job(job_id: str):
+    """取消导出任务或删除其结果文件"""
+    if not export_jobs.cancel(job_id):
+        return jsonify({'code': 404, 'message': '导出任务不存在或已过期', 'data': None}), 404
+    return jsonify({'code': 200, 'message': '导出任务已删除', 'data': None})
+
+
+@api_bp.route('/export/jobs/<job_id>/download', methods=['GET'])
+def download_export_job(job_id: str):
+    """
+    下载导出任务的结果文件
+    
+    支持 Range 请求（断点续传）与 ETag 条件请求
+    
+    Returns:
+        文件流；任务未完成时返回409
+    """
+    job = export_jobs.get(job_id)
+    if job is None:
+        return jsonify({'code': 404, 'message': '导出任务不存在或已过期', 'data': None}), 404
+    
+    path = export_jobs.result_path(job_id)
+    if path is None:
+        return jsonify({
+            'code': 409,
+            'message': f"导出任务尚未完成: {job['status']}",
+            'data': _export_job_info(job)
+        }), 409
+    
+    # 取得路径后并发的取消或过期清理可能已删除文件；send_file 打开文件后删除不影响本次下载
+    try:
+        return send_file(
+            path,
+            mimetype=job['mimetype'],
+            as_attachment=True,
+            download_name=job['download_name'],
+            conditional=True
+        )
+    except FileNotFoundError:
+        return jsonify({'code': 404, 'message': '导出任务不存在或已过期', 'data': None}), 404
+
+
 @api_bp.route('/stats', methods=['GET'])
 def get_stats():
     """
@@ -900,3 +2733,265 @@ def get_data_statistics():
             'message': f'获取统计失败: {str(e)}',
             'data': None
         }), 500
+
+
+def feed_authorized(view):
+    """
+    数据订阅接口的访问令牌校验
+    
+    请求头须为 Authorization: Bearer <令牌>，令牌由环境变量 WEATHER_FEED_TOKENS 配置；
+    未配置任何令牌时接口不可用
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not FEED_TOKENS:
+            return jsonify({'code': 503, 'message': '数据订阅未启用：未配置访问令牌', 'data': None}), 503
+        
+        scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+        token = token.strip().encode('utf-8')
+        if scheme.lower() != 'bearer' or not any(
+            hmac.compare_digest(token, allowed.encode('utf-8')) for allowed in FEED_TOKENS
+        ):
+            response = jsonify({'code': 401, 'message': '访问令牌无效', 'data': None})
+            response.status_code = 401
+            response.headers['WWW-Authenticate'] = 'Bearer'
+            return response
+        
+        return view(*args, **kwargs)
+    
+    return wrapper
+
+
+@api_bp.route('/data/feed', methods=['GET', 'POST'])
+@feed_authorized
+def data_feed():
+    """
+    数据订阅：流式输出本地数据库中的天气数据，供下游定时全量或增量同步
+    
+    Request Body（GET 使用同名查询参数，列表以逗号分隔）:
+        {
+            "city_ids": [1, 2],          // 可选，默认全部城市
+            "start_date": "2024-01-01",  // 可选，按数据时间过滤
+            "end_date": "2024-12-31",    // 可选
+            "fields": ["temperature_2m"],// 可选，默认全部字段
+            "since": "...",              // 可选，上次同步返回的游标，只输出之后写入或更新的行
+            "format": "ndjson"           // 可选：ndjson（默认）或 arrow（Arrow IPC 流）
+        }
+    
+    游标为 weather_data.updated_at，本次输出截止到请求开始时已提交的最大值，
+    由响应头 X-Feed-Cursor 返回（ndjson 的首行与末行、arrow 表结构元数据中也包含），
+    下次同步以其作为 since。只读取本地数据，不触发下载；删除的数据不会出现在增量结果中
+    
+    ndjson: 首行为 {"type": "meta", ...}，其后每行一个 [city_id, datetime, 字段值...] 数组，
+            末行为 {"type": "end", "total_records": n, "cursor": 游标}
+    arrow: 与 /weather/export 的列结构相同，每批最多 FEED_BATCH_ROWS 行
+    
+    Returns:
+        NDJSON 或 Arrow IPC 流
+    """
+    try:
+        data = _request_params()
+        city_ids = data.get('city_ids')
+        start_date = data.get('start_date')
+        end_date = data.get('end_date')
+        fields = data.get('fields')
+        since = data.get('since')
+        feed_format = data.get('format', 'ndjson')
+        db_manager = weather_service.db_manager
+        
+        if feed_format not in FEED_FORMATS:
+            return jsonify({
+                'code': 400,
+                'message': f"format 必须是 {', '.join(FEED_FORMATS)} 之一",
+                'data': None
+            }), 400
+        
+        if city_ids is not None and (
+            not isinstance(city_ids, list) or not all(isinstance(c, int) for c in city_ids)
+        ):
+            return jsonify({'code': 400, 'message': 'city_ids 必须是城市ID列表', 'data': None}), 400
+        
+        if since is not None:
+            try:
+                datetime.fromisoformat(str(since))
+            except ValueError:
+                return jsonify({'code': 400, 'message': f'无效的 since 游标: {since}', 'data': None}), 400
+        
+        valid_fields = db_manager.valid_weather_fields(fields)
+        if not valid_fields:
+            return jsonify({'code': 400, 'message': '没有有效的字段', 'data': None}), 400
+        
+        unavailable = _columnar_unavailable(feed_format)
+        if unavailable:
+            return unavailable
+        
+        if city_ids:
+            cities = [city_manager.get_city_by_id(i) for i in city_ids]
+            missing = [i for i, c in zip(city_ids, cities) if not c]
+            if missing:
+                return jsonify({
+                    'code': 404,
+                    'message': f"城市ID {', '.join(map(str, missing))} 不存在",
+                    'data': None
+                }), 404
+        else:
+            cities = city_manager.get_all_cities(include_inactive=True)
+        
+        # 先取游标再读取数据，之后提交的写入留给下一次同步
+        cursor = db_manager.get_change_cursor()
+        filters = {'changed_until': cursor or ''}
+        if city_ids:
+            filters['city_ids'] = city_ids
+        if start_date:
+            filters['start_date'] = f"{start_date}T00:00"
+        if end_date:
+            filters['end_date'] = f"{end_date}T23:59"
+        if since:
+            filters['changed_after'] = since
+        cursor = cursor or since
+        
+        chunks = db_manager.iter_weather_rows(filters, valid_fields, chunk_size=FEED_BATCH_ROWS, with_city=True)
+        city_names = {c['id']: c['city_name'] for c in cities}
+        
+        if feed_format == 'arrow':
+            body = _iter_feed_arrow(chunks, valid_fields, city_names, cursor)
+            mimetype = ARROW_STREAM_MIMETYPE
+        else:
+            meta = {
+                'type': 'meta',
+                'timezone': TIMEZONE,
+                'since': since,
+                'cursor': cursor,
+                'cities': {str(i): name for i, name in city_names.items()},
+                'columns': ['city_id', 'datetime'] + valid_fields,
+            }
+            body = _iter_feed_ndjson(chunks, meta)
+            mimetype = 'application/x-ndjson'
+        
+        response = Response(stream_with_context(body), mimetype=mimetype)
+        response.headers['X-Feed-Cursor'] = cursor or ''
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+        
+    except Exception as e:
+        logger.error(f"数据订阅失败: {e}")
+        return jsonify({'code': 500, 'message': f'数据订阅失败: {str(e)}', 'data': None}), 500
+
+
+def _iter_feed_ndjson(chunks: Iterator[List[tuple]], meta: Dict[str, Any]) -> Iterator[str]:
+    """逐块输出订阅数据的NDJSON行"""
+    yield _ndjson_line(meta)
+    total = 0
+    for rows in chunks:
+        yield ''.join(_ndjson_line(row) for row in rows)
+        total += len(rows)
+    yield _ndjson_line({'type': 'end', 'total_records': total, 'cursor': meta['cursor']})
+
+
+def _iter_feed_arrow(
+    chunks: Iterator[List[tuple]],
+    fields: List[str],
+    city_names: Dict[int, str],
+    cursor: Optional[str]
+) -> Iterator[bytes]:
+    """
+    逐块输出订阅数据的 Arrow IPC 流
+    
+    Args:
+        chunks: (city_id, datetime, 字段...) 元组行块，按城市、时间排序
+        fields: 数值字段
+        city_names: {city_id: 城市名称}
+        cursor: 增量游标，写入表结构元数据
+        
+    Yields:
+        IPC 流的字节块
+    """
+    names = list(city_names.values())
+    index = {city_id: i for i, city_id in enumerate(city_names)}
+    schema = weather_schema(fields)
+    schema = schema.with_metadata({**schema.metadata, b'cursor': (cursor or '').encode('utf-8')})
+    
+    def batches():
+        for rows in chunks:
+            for city_id, city_rows in groupby(rows, key=lambda row: row[0]):
+                if city_id not in index:
+                    index[city_id] = len(names)
+                    names.append(str(city_id))
+                yield rows_to_batch(schema, [row[1:] for row in city_rows], city_id, index[city_id], names)
+    
+    return iter_ipc_stream(schema, batches())
+
+
+@api_bp.route('/data/import', methods=['POST'])
+def import_data():
+    """
+    导入 CSV / Parquet / Arrow IPC 文件
+    
+    Request:
+        multipart/form-data
+            file: 上传文件
+            format: 可选，csv、parquet 或 arrow（默认按扩展名判断）
+            city_id: 可选，文件中没有城市列时所有行使用的城市ID
+            column_map: 可选，JSON 对象 {文件列名: weather_data 列名}
+            defer_indexes: 可选，为真时写入期间删除 (city_id, datetime) 查询索引、结束后重建（大文件使用）
+    
+    整个文件在一个事务中写入，失败时不写入任何数据
+    
+    Returns:
+        JSON响应 {'rows': 写入行数, 'skipped': 跳过行数, 'cities': 城市ID列表, 'fields': 字段}
+    """
+    try:
+        upload = request.files.get('file')
+        if not upload or not upload.filename:
+            return jsonify({'code': 400, 'message': '缺少上传文件 file', 'data': None}), 400
+        
+        import_format = request.form.get('format')
+        if not import_format:
+            extension = '.' + upload.filename.rsplit('.', 1)[-1].lower()
+            extensions = {'.csv': 'csv', **{ext: fmt for fmt, (ext, _) in COLUMNAR_FORMATS.items()}}
+            import_format = extensions.get(extension)
+        if import_format not in IMPORT_FORMATS:
+            return jsonify({
+                'code': 400,
+                'message': f"format 必须是 {', '.join(IMPORT_FORMATS)} 之一",
+                'data': None
+            }), 400
+        
+        unavailable = _columnar_unavailable(import_format)
+        if unavailable:
+            return unavailable
+        
+        try:
+            city_id = int(request.form['city_id']) if request.form.get('city_id') else None
+            column_map = json.loads(request.form['column_map']) if request.form.get('column_map') else None
+        except ValueError:
+            return jsonify({'code': 400, 'message': 'city_id 或 column_map 格式错误', 'data': None}), 400
+        if city_id is not None and not city_manager.get_city_by_id(city_id):
+            return jsonify({'code': 400, 'message': f'未知的城市: {city_id}', 'data': None}), 400
+        if column_map is not None and not (
+            isinstance(column_map, dict) and all(isinstance(v, str) for v in column_map.values())
+        ):
+            return jsonify({'code': 400, 'message': 'column_map 必须是 {文件列名: 字段名} 对象', 'data': None}), 400
+        
+        result = data_importer.import_file(
+            upload.stream, import_format,
+            column_map=column_map,
+            city_id=city_id,
+            defer_indexes=_parse_bool(request.form.get('defer_indexes', ''))
+        )
+        
+        return jsonify({
+            'code': 200,
+            'message': f"导入成功，共 {result['rows']} 条记录",
+            'data': result
+        })
+        
+    except ValueError as e:
+        return jsonify({'code': 400, 'message': f'导入失败: {str(e)}', 'data': None}), 400
+    except Exception as e:
+        logger.error(f"导入数据失败: {e}")
+        return jsonify({
+            'code': 500,
+            'message': f'导入失败: {str(e)}',
+            'data': None
+        }), 500
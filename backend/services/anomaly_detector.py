@@ -0,0 +1,221 @@
+"""
+异常检测服务
+基于滑动窗口或季节气候基线的 z-score 异常检测
+遵循单一职责原则
+"""
+import logging
+from typing import List, Dict, Any, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 支持的检测方法
+ANOMALY_METHODS = ('rolling', 'seasonal')
+
+# 季节基线的分组方式
+SEASONAL_BASELINES = ('hour', 'month_hour', 'day_of_year')
+
+DEFAULT_WINDOW_HOURS = 168  # 滑动窗口默认一周
+DEFAULT_THRESHOLD = 3.0
+
+
+def parse_hours(datetimes: Sequence[str]) -> np.ndarray:
+    """
+    将 ISO 时间字符串解析为小时精度的 datetime64 数组
+
+    Args:
+        datetimes: 形如 2024-01-01T00:00 的时间字符串序列
+
+    Returns:
+        datetime64[h] 数组
+    """
+    return np.asarray(datetimes, dtype='datetime64[m]').astype('datetime64[h]')
+
+
+def seasonal_keys(hours: np.ndarray, baseline: str) -> np.ndarray:
+    """
+    计算每个时刻所属的季节分组
+
+    Args:
+        hours: datetime64[h] 数组
+        baseline: hour（一天中的小时）、month_hour（月份 x 小时）或 day_of_year（年内日序）
+
+    Returns:
+        整数分组编号数组
+    """
+    hour_of_day = hours.astype(np.int64) % 24
+    if baseline == 'hour':
+        return hour_of_day
+    if baseline == 'month_hour':
+        month = hours.astype('datetime64[M]').astype(np.int64) % 12
+        return month * 24 + hour_of_day
+    if baseline == 'day_of_year':
+        return (hours.astype('datetime64[D]') - hours.astype('datetime64[Y]')).astype(np.int64)
+    raise ValueError(f"不支持的季节基线: {baseline}")
+
+
+def rolling_zscores(
+    matrix: np.ndarray,
+    window: int = DEFAULT_WINDOW_HOURS,
+    min_periods: Optional[int] = None
+) -> np.ndarray:
+    """
+    相对居中滑动窗口（不含当前点）的 z-score
+
+    使用累积和计算窗口内的均值与标准差，复杂度与窗口大小无关
+
+    Args:
+        matrix: 字段 x 时间 的二维数组，缺失值为NaN
+        window: 窗口大小（小时）
+        min_periods: 窗口内最少有效值数量，默认 window 的一半
+
+    Returns:
+        与 matrix 同形状的 z-score 数组，无法计算处为NaN
+    """
+    matrix = np.atleast_2d(np.asarray(matrix, dtype=np.float64))
+    n = matrix.shape[1]
+    min_periods = max(min_periods if min_periods is not None else window // 2, 2)
+
+    valid = ~np.isnan(matrix)
+    shifted = _center(matrix, valid)
+
+    zeros = np.zeros((matrix.shape[0], 1))
+    csum = np.concatenate([zeros, np.cumsum(shifted, axis=1)], axis=1)
+    csq = np.concatenate([zeros, np.cumsum(shifted * shifted, axis=1)], axis=1)
+    ccount = np.concatenate([zeros, np.cumsum(valid, axis=1)], axis=1)
+
+    half = window // 2
+    positions = np.arange(n)
+    lo = np.clip(positions - half, 0, n)
+    hi = np.clip(positions + half + 1, 0, n)
+
+    # 窗口统计量中剔除当前点本身
+    count = ccount[:, hi] - ccount[:, lo] - valid
+    total = csum[:, hi] - csum[:, lo] - shifted
+    total_sq = csq[:, hi] - csq[:, lo] - shifted * shifted
+
+    return _zscores(shifted, valid, count, total, total_sq, min_periods)
+
+
+def seasonal_zscores(
+    matrix: np.ndarray,
+    keys: np.ndarray,
+    min_periods: int = 3
+) -> np.ndarray:
+    """
+    相对同一季节分组（不含当前点）气候基线的 z-score
+
+    Args:
+        matrix: 字段 x 时间 的二维数组，缺失值为NaN
+        keys: 每个时刻的季节分组编号
+        min_periods: 分组内最少有效值数量
+
+    Returns:
+        与 matrix 同形状的 z-score 数组，无法计算处为NaN
+    """
+    matrix = np.atleast_2d(np.asarray(matrix, dtype=np.float64))
+    n_keys = int(keys.max()) + 1 if len(keys) else 0
+
+    valid = ~np.isnan(matrix)
+    shifted = _center(matrix, valid)
+
+    count = np.empty_like(shifted)
+    total = np.empty_like(shifted)
+    total_sq = np.empty_like(shifted)
+    for row in range(matrix.shape[0]):
+        count[row] = np.bincount(keys, weights=valid[row], minlength=n_keys)[keys]
+        total[row] = np.bincount(keys, weights=shifted[row], minlength=n_keys)[keys]
+        total_sq[row] = np.bincount(keys, weights=shifted[row] ** 2, minlength=n_keys)[keys]
+
+    count -= valid
+    total -= shifted
+    total_sq -= shifted * shifted
+
+    return _zscores(shifted, valid, count, total, total_sq, min_periods)
+
+
+def _center(matrix: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    """减去各字段均值（缺失值置0），降低平方和相减时的精度损失"""
+    counts = valid.sum(axis=1, keepdims=True)
+    means = np.where(valid, matrix, 0.0).sum(axis=1, keepdims=True) / np.maximum(counts, 1)
+    return np.where(valid, matrix - means, 0.0)
+
+
+def _zscores(
+    values: np.ndarray,
+    valid: np.ndarray,
+    count: np.ndarray,
+    total: np.ndarray,
+    total_sq: np.ndarray,
+    min_periods: int
+) -> np.ndarray:
+    """由基线的计数、和与平方和计算 z-score"""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total / count
+        variance = (total_sq - total * mean) / (count - 1)
+        std = np.sqrt(np.maximum(variance, 0.0))
+        z = (values - mean) / std
+
+    usable = valid & (count >= min_periods) & (std > 1e-9)
+    return np.where(usable, z, np.nan)
+
+
+def find_anomalies(
+    columns: Dict[str, Sequence[Any]],
+    fields: List[str],
+    method: str = 'seasonal',
+    threshold: float = DEFAULT_THRESHOLD,
+    window: int = DEFAULT_WINDOW_HOURS,
+    baseline: str = 'month_hour',
+    limit: Optional[int] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    对多个字段同时检测异常值
+
+    Args:
+        columns: 列式数据 {'datetime': [...], 字段: [...]}
+        fields: 需要检测的字段
+        method: rolling（滑动窗口）或 seasonal（季节气候基线）
+        threshold: |z| 超过该值视为异常
+        window: rolling 方法的窗口大小（小时）
+        baseline: seasonal 方法的分组方式
+        limit: 每个字段最多返回的异常数量（按 |z| 取最大者），None表示全部
+
+    Returns:
+        {字段: {'count', 'indices', 'datetime', 'values', 'zscores'}}，
+        indices/values/zscores 为按时间升序的数组
+    """
+    if method not in ANOMALY_METHODS:
+        raise ValueError(f"不支持的检测方法: {method}")
+
+    fields = [f for f in fields if f in columns]
+    if not fields or not len(columns.get('datetime', ())):
+        return {}
+
+    matrix = np.array([columns[f] for f in fields], dtype=np.float64)
+    if method == 'rolling':
+        z = rolling_zscores(matrix, window)
+    else:
+        z = seasonal_zscores(matrix, seasonal_keys(parse_hours(columns['datetime']), baseline))
+
+    datetimes = columns['datetime']
+    result = {}
+    for row, field in enumerate(fields):
+        with np.errstate(invalid='ignore'):
+            indices = np.flatnonzero(np.abs(z[row]) > threshold)
+        count = len(indices)
+        if limit is not None and count > limit:
+            top = np.argsort(-np.abs(z[row, indices]), kind='stable')[:limit]
+            indices = np.sort(indices[top])
+
+        result[field] = {
+            'count': count,
+            'indices': indices,
+            'datetime': [datetimes[i] for i in indices.tolist()],
+            'values': matrix[row, indices],
+            'zscores': np.round(z[row, indices], 3),
+        }
+
+    logger.debug(f"异常检测完成({method}): {sum(r['count'] for r in result.values())} 个异常值")
+    return result
@@ -0,0 +1,239 @@
+"""
+分文件打包导出
+每个城市（或城市-年）生成一个独立文件，在进程池中并行生成，完成一个写入一个到 ZIP 流
+遵循单一职责原则
+"""
+import os
+import shutil
+import logging
+import tempfile
+import zipfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, Future, as_completed
+from typing import List, Dict, Any, Iterator, Optional, Callable, Tuple
+
+from backend.models.database import DatabaseManager
+from backend.services.data_exporter import DataExporter
+from backend.services.columnar_format import COLUMNAR_FORMATS
+from backend.config import ANALYSIS_MAX_WORKERS, PROCESS_START_METHOD
+
+logger = logging.getLogger(__name__)
+
+# 打包方式：每个城市一个文件，或每个城市每年一个文件
+BUNDLE_MODES = ('city', 'city_year')
+
+# 自身已压缩的格式在 ZIP 中直接存储
+STORED_FORMATS = ('excel', 'parquet')
+
+
+def bundle_parts(
+    cities: List[Dict[str, Any]],
+    start_date: str,
+    end_date: str,
+    mode: str
+) -> List[List[Dict[str, Any]]]:
+    """
+    按打包方式拆分导出文件
+
+    Args:
+        cities: 城市信息列表
+        start_date: 开始日期
+        end_date: 结束日期
+        mode: city 或 city_year
+
+    Returns:
+        按城市分组的文件描述列表 [[{city_id, city_name, start_date, end_date, name}, ...], ...]
+    """
+    if mode not in BUNDLE_MODES:
+        raise ValueError(f"不支持的打包方式: {mode}")
+
+    groups = []
+    for city in cities:
+        if mode == 'city':
+            ranges = [(start_date, end_date, f"{start_date}_{end_date}")]
+        else:
+            ranges = [
+                (max(start_date, f"{year}-01-01"), min(end_date, f"{year}-12-31"), str(year))
+                for year in range(int(start_date[:4]), int(end_date[:4]) + 1)
+            ]
+        groups.append([
+            {
+                'city_id': city['id'],
+                'city_name': city['city_name'],
+                'start_date': start,
+                'end_date': end,
+                'name': f"{city['city_name']}_天气数据_{suffix}",
+            }
+            for start, end, suffix in ranges
+        ])
+    return groups
+
+
+def _year_row_groups(db_manager: DatabaseManager, part: Dict[str, Any], fields: List[str]) -> Iterator[List[tuple]]:
+    """逐年读取一个文件的数据，每年一组（同一天的数据不会被拆开）"""
+    for year in range(int(part['start_date'][:4]), int(part['end_date'][:4]) + 1):
+        rows = []
+        for chunk in db_manager.iter_weather_rows({
+            'city_id': part['city_id'],
+            'start_date': max(f"{part['start_date']}T00:00", f"{year}-01-01T00:00"),
+            'end_date': min(f"{part['end_date']}T23:59", f"{year}-12-31T23:59")
+        }, fields):
+            rows.extend(chunk)
+        if rows:
+            yield rows
+
+
+def export_part(task: Tuple[str, Dict[str, Any], List[str], str, str]) -> Tuple[str, str, int]:
+    """
+    在工作进程中生成单个导出文件（只读取本地数据库）
+
+    Args:
+        task: (数据库路径, 文件描述, 字段列表, 导出格式, 输出目录)
+
+    Returns:
+        (ZIP内文件名, 文件路径, 行数)，无数据时行数为0
+    """
+    db_path, part, fields, export_format, output_dir = task
+    db_manager = DatabaseManager(db_path)
+    exporter = DataExporter()
+    valid_fields = db_manager.valid_weather_fields(fields)
+    columns = ['datetime'] + valid_fields
+    counted = {'rows': 0}
+
+    def row_groups():
+        for rows in _year_row_groups(db_manager, part, fields):
+            counted['rows'] += len(rows)
+            yield rows
+
+    if export_format == 'csv':
+        extension = '.csv'
+        output = None
+        chunks = exporter.iter_csv(row_groups(), columns, fields, city_name=part['city_name'])
+    elif export_format in COLUMNAR_FORMATS:
+        extension = COLUMNAR_FORMATS[export_format][0]
+        output = exporter.write_columnar(
+            ((part['city_id'], rows) for rows in row_groups()),
+            valid_fields, {part['city_id']: part['city_name']}, export_format, part['name']
+        )
+    else:
+        extension = '.xlsx'
+        output = exporter.write_excel(
+            ([dict(zip(columns, row)) for row in rows] for rows in row_groups()),
+            part['name'], fields, include_summary=True, city_name=part['city_name']
+        )
+
+    path = os.path.join(output_dir, f"{part['city_id']}_{part['start_date']}_{part['end_date']}{extension}")
+    with open(path, 'wb') as f:
+        if output is None:
+            for block in chunks:
+                f.write(block)
+        else:
+            with output:
+                shutil.copyfileobj(output, f)
+    return part['name'] + extension, path, counted['rows']
+
+
+class _ZipStream:
+    """只写的字节缓冲区，供 zipfile 以不可定位流的方式写入，写入的内容由 take 取出"""
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def write(self, data) -> int:
+        self.buffer += data
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self) -> bytes:
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+def iter_bundle(
+    groups: List[List[Dict[str, Any]]],
+    fields: List[str],
+    export_format: str,
+    db_path: str,
+    prepare: Optional[Callable[[int, str, str], None]] = None,
+    progress: Optional[Callable[[int, int], None]] = None,
+    max_workers: Optional[int] = None
+) -> Iterator[bytes]:
+    """
+    生成分文件打包的 ZIP 流
+
+    按城市依次调用 prepare（如补齐缺失数据）后把该城市的文件提交到进程池，
+    已完成的文件立即写入 ZIP 并输出，无数据的文件不写入
+
+    Args:
+        groups: bundle_parts 的结果
+        fields: 导出字段
+        export_format: excel、csv、parquet 或 arrow
+        db_path: 数据库路径（工作进程自行打开连接）
+        prepare: 每个城市提交前的准备函数，参数为 (city_id, 开始日期, 结束日期)
+        progress: 进度回调 (已写入文件数, 文件总数)
+        max_workers: 最大进程数，None 使用 ANALYSIS_MAX_WORKERS，1 表示在当前进程中生成
+
+    Yields:
+        ZIP 文件的字节块
+    """
+    total = sum(len(parts) for parts in groups)
+    workers = ANALYSIS_MAX_WORKERS if max_workers is None else max_workers
+    compression = zipfile.ZIP_STORED if export_format in STORED_FORMATS else zipfile.ZIP_DEFLATED
+    output_dir = tempfile.mkdtemp(prefix='bundle_')
+    stream = _ZipStream()
+    executor = None
+    written = 0
+
+    try:
+        if workers > 1 and total > 1:
+            try:
+                executor = ProcessPoolExecutor(
+                    max_workers=min(workers, total),
+                    mp_context=multiprocessing.get_context(PROCESS_START_METHOD)
+                )
+            except Exception as e:
+                logger.warning(f"创建进程池失败，改为顺序生成: {e}")
+
+        with zipfile.ZipFile(stream, 'w', compression=compression) as archive:
+            def add(result: Tuple[str, str, int]) -> bytes:
+                nonlocal written
+                name, path, rows = result
+                if rows:
+                    archive.write(path, name)
+                os.remove(path)
+                written += 1
+                if progress:
+                    progress(written, total)
+                return stream.take()
+
+            pending: List[Future] = []
+            for parts in groups:
+                if progress:
+                    progress(written, total)
+                if prepare and parts:
+                    prepare(parts[0]['city_id'], parts[0]['start_date'], parts[-1]['end_date'])
+                tasks = [(db_path, part, fields, export_format, output_dir) for part in parts]
+
+                if executor is None:
+                    for task in tasks:
+                        yield add(export_part(task))
+                    continue
+
+                pending.extend(executor.submit(export_part, task) for task in tasks)
+                for future in [f for f in pending if f.done()]:
+                    pending.remove(future)
+                    yield add(future.result())
+
+            for future in as_completed(pending):
+                yield add(future.result())
+
+        yield stream.take()
+        logger.info(f"打包导出完成: {written} 个文件")
+
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+        shutil.rmtree(output_dir, ignore_errors=True)
@@ -0,0 +1,272 @@
+"""
+气候基线服务
+按城市、字段计算参考期内的常年值（年内日序 / 小时的均值、标准差与分位数），
+存入数据库供距平与异常查询直接连接使用
+遵循单一职责原则
+"""
+import logging
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from backend.config import (
+    CLIMATOLOGY_REF_START_YEAR, CLIMATOLOGY_REF_END_YEAR, CLIMATOLOGY_FIELDS
+)
+from backend.services.anomaly_detector import parse_hours, seasonal_keys
+
+logger = logging.getLogger(__name__)
+
+# 基线分组方式：doy 年内日序（0-365），hour 一天中的小时（0-23）
+CLIMATOLOGY_PERIODS = {'doy': 'day_of_year', 'hour': 'hour'}
+
+# 存储的分位数
+CLIMATOLOGY_PERCENTILES = (10, 50, 90)
+
+
+def group_statistics(keys: np.ndarray, values: np.ndarray) -> List[Tuple]:
+    """
+    按分组计算样本数、均值、标准差与分位数
+
+    分位数采用线性插值（与 numpy.percentile 默认方式一致），
+    所有分组在一次排序后向量化计算
+
+    Args:
+        keys: 分组编号（非负整数）
+        values: 不含NaN的数值
+
+    Returns:
+        (key, n, mean, std, p10, p50, p90) 元组列表，按 key 升序
+    """
+    if len(values) == 0:
+        return []
+
+    order = np.lexsort((values, keys))
+    sorted_keys = keys[order]
+    sorted_values = values[order]
+    group_keys, starts, counts = np.unique(sorted_keys, return_index=True, return_counts=True)
+
+    sums = np.add.reduceat(sorted_values, starts)
+    means = sums / counts
+    deviations = sorted_values - np.repeat(means, counts)
+    m2 = np.add.reduceat(deviations * deviations, starts)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        stds = np.where(counts > 1, np.sqrt(m2 / (counts - 1)), np.nan)
+
+    percentiles = []
+    for q in CLIMATOLOGY_PERCENTILES:
+        position = starts + q / 100 * (counts - 1)
+        lower = np.floor(position).astype(np.int64)
+        upper = np.ceil(position).astype(np.int64)
+        fraction = position - lower
+        percentiles.append(sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * fraction)
+
+    rows = []
+    for i, key in enumerate(group_keys.tolist()):
+        std = float(stds[i]) if counts[i] > 1 else None
+        rows.append((
+            key, int(counts[i]), float(means[i]), std,
+            *(float(p[i]) for p in percentiles)
+        ))
+    return rows
+
+
+class ClimatologyService:
+    """
+    气候基线服务类
+    负责基线的构建、增量刷新与距平查询
+    """
+
+    def __init__(
+        self,
+        db_manager,
+        ref_start_year: int = CLIMATOLOGY_REF_START_YEAR,
+        ref_end_year: int = CLIMATOLOGY_REF_END_YEAR
+    ):
+        """
+        初始化气候基线服务
+
+        Args:
+            db_manager: 数据库管理器实例
+            ref_start_year: 参考期起始年
+            ref_end_year: 参考期结束年
+        """
+        self.db_manager = db_manager
+        self.ref_start_year = ref_start_year
+        self.ref_end_year = ref_end_year
+        logger.info(f"气候基线服务初始化完成，参考期: {ref_start_year}-{ref_end_year}")
+
+    @property
+    def reference_filters(self) -> Dict[str, str]:
+        """参考期的时间过滤条件"""
+        return {
+            'start_date': f"{self.ref_start_year}-01-01T00:00",
+            'end_date': f"{self.ref_end_year}-12-31T23:59"
+        }
+
+    def build_city(self, city_id: int, fields: Optional[List[str]] = None) -> Dict[str, int]:
+        """
+        重新计算单个城市的气候基线
+
+        Args:
+            city_id: 城市ID
+            fields: 字段列表，None 使用 CLIMATOLOGY_FIELDS
+
+        Returns:
+            {字段: 参考期内有数据的年数}；无数据的字段不在其中，
+            但仍写入 n_years=0 的构建记录，参考期内写入数据前不再重复构建
+        """
+        fields = self.db_manager.valid_weather_fields(fields or CLIMATOLOGY_FIELDS)
+        columns = self.db_manager.get_weather_columns({'city_id': city_id, **self.reference_filters}, fields)
+        if not columns['datetime']:
+            logger.info(f"城市ID={city_id} 参考期内无数据，跳过气候基线构建")
+            for field in fields:
+                self._record_empty(city_id, field)
+            return {}
+
+        hours = parse_hours(columns['datetime'])
+        years = hours.astype('datetime64[Y]').astype(np.int64) + 1970
+        keys = {period: seasonal_keys(hours, baseline) for period, baseline in CLIMATOLOGY_PERIODS.items()}
+
+        built = {}
+        for field in fields:
+            values = np.asarray(columns[field], dtype=np.float64)
+            valid = ~np.isnan(values)
+            if not valid.any():
+                self._record_empty(city_id, field)
+                continue
+
+            rows = [
+                (period, *row)
+                for period in CLIMATOLOGY_PERIODS
+                for row in group_statistics(keys[period][valid], values[valid])
+            ]
+            n_years = len(np.unique(years[valid]))
+            self.db_manager.replace_climatology(
+                city_id, field, rows, self.ref_start_year, self.ref_end_year, n_years
+            )
+            built[field] = n_years
+
+        logger.info(f"气候基线构建完成: 城市ID={city_id}, 字段: {list(built.keys())}")
+        return built
+
+    def _record_empty(self, city_id: int, field: str):
+        """清除参考期内无数据字段的基线，并记录 n_years=0 的构建记录"""
+        self.db_manager.replace_climatology(city_id, field, [], self.ref_start_year, self.ref_end_year, 0)
+
+    def stale_entries(
+        self,
+        city_ids: List[int],
+        fields: Optional[List[str]] = None
+    ) -> Dict[int, List[str]]:
+        """
+        找出需要重建的基线：从未构建、参考期变化或参考期内数据已变化
+
+        Args:
+            city_ids: 城市ID列表
+            fields: 字段列表，None 使用 CLIMATOLOGY_FIELDS
+
+        Returns:
+            {city_id: [需要重建的字段]}
+        """
+        fields = self.db_manager.valid_weather_fields(fields or CLIMATOLOGY_FIELDS)
+        result = {}
+        for city_id in city_ids:
+            meta = {m['field']: m for m in self.db_manager.get_climatology_meta(city_id)}
+            stale = [
+                field for field in fields
+                if field not in meta
+                or meta[field]['stale']
+                or (meta[field]['ref_start_year'], meta[field]['ref_end_year'])
+                != (self.ref_start_year, self.ref_end_year)
+            ]
+            if stale:
+                result[city_id] = stale
+        return result
+
+    def refresh(
+        self,
+        city_ids: List[int],
+        fields: Optional[List[str]] = None,
+        force: bool = False
+    ) -> Dict[int, Dict[str, int]]:
+        """
+        增量刷新气候基线，只重建失效的城市与字段
+
+        Args:
+            city_ids: 城市ID列表
+            fields: 字段列表，None 使用 CLIMATOLOGY_FIELDS
+            force: 为True时全部重建
+
+        Returns:
+            {city_id: {字段: 有数据的年数}}，仅包含实际重建的城市
+        """
+        if force:
+            targets = {city_id: fields for city_id in city_ids}
+        else:
+            targets = self.stale_entries(city_ids, fields)
+
+        rebuilt = {}
+        for city_id, stale_fields in targets.items():
+            try:
+                built = self.build_city(city_id, stale_fields)
+                if built:
+                    rebuilt[city_id] = built
+            except Exception as e:
+                logger.error(f"构建气候基线失败: 城市ID={city_id}, {e}")
+        return rebuilt
+
+    def departures(
+        self,
+        city_id: int,
+        start_date: str,
+        end_date: str,
+        field: str,
+        period: str = 'doy'
+    ) -> Dict[str, Any]:
+        """
+        查询相对气候基线的距平（基线失效时先增量重建）
+
+        Args:
+            city_id: 城市ID
+            start_date: 开始日期 (YYYY-MM-DD)
+            end_date: 结束日期 (YYYY-MM-DD)
+            field: 字段名
+            period: doy 或 hour
+
+        Returns:
+            {'columns': {datetime, value, normal, departure, zscore}, 'summary': {...}}
+        """
+        if period not in CLIMATOLOGY_PERIODS:
+            raise ValueError(f"不支持的基线分组: {period}")
+
+        self.refresh([city_id], [field])
+
+        joined = self.db_manager.get_departures({
+            'city_id': city_id,
+            'start_date': f"{start_date}T00:00",
+            'end_date': f"{end_date}T23:59"
+        }, field, period)
+
+        departure = np.asarray(joined['departure'], dtype=np.float64)
+        std = np.asarray(joined['std'], dtype=np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            zscore = np.where(std > 0, departure / std, np.nan)
+
+        valid = ~np.isnan(departure)
+        summary = {
+            'n': int(valid.sum()),
+            'mean_departure': round(float(departure[valid].mean()), 3) if valid.any() else None,
+            'max_departure': round(float(departure[valid].max()), 3) if valid.any() else None,
+            'min_departure': round(float(departure[valid].min()), 3) if valid.any() else None,
+        }
+
+        return {
+            'columns': {
+                'datetime': joined['datetime'],
+                'value': joined['value'],
+                'normal': joined['normal'],
+                'departure': departure,
+                'zscore': np.round(zscore, 3),
+            },
+            'summary': summary
+        }
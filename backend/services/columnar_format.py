@@ -0,0 +1,217 @@
+"""
+列式文件格式（Parquet / Arrow IPC）
+定义天气数据的 Arrow 表结构，以及元组行与 RecordBatch 之间的转换
+依赖可选的 pyarrow，未安装时相关导出/导入接口不可用
+"""
+import io
+import logging
+from typing import List, Dict, Any, Iterator, Iterable, IO, Union
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - 取决于部署环境
+    pa = None
+    pq = None
+
+from backend.config import TIMEZONE
+
+logger = logging.getLogger(__name__)
+
+# 支持的列式格式: 格式 -> (扩展名, MIME类型)
+COLUMNAR_FORMATS = {
+    'parquet': ('.parquet', 'application/vnd.apache.parquet'),
+    'arrow': ('.arrow', 'application/vnd.apache.arrow.file'),
+}
+
+# Arrow IPC 流格式的MIME类型（数据订阅接口使用，可边生成边传输）
+ARROW_STREAM_MIMETYPE = 'application/vnd.apache.arrow.stream'
+
+# Parquet 压缩算法
+PARQUET_COMPRESSION = 'zstd'
+
+
+def pyarrow_available() -> bool:
+    """是否已安装 pyarrow"""
+    return pa is not None
+
+
+def require_pyarrow():
+    """未安装 pyarrow 时抛出 RuntimeError"""
+    if pa is None:
+        raise RuntimeError("Parquet/Arrow 格式需要安装可选依赖 pyarrow")
+
+
+def weather_schema(fields: List[str]):
+    """
+    天气数据的 Arrow 表结构
+
+    city 为字典编码的城市名称，datetime 为本地时间（无时区，时区记录在元数据中），
+    数值字段统一为 float32
+
+    Args:
+        fields: 数值字段列表
+
+    Returns:
+        pyarrow.Schema
+    """
+    require_pyarrow()
+    return pa.schema(
+        [
+            ('city_id', pa.int32()),
+            ('city', pa.dictionary(pa.int32(), pa.string())),
+            ('datetime', pa.timestamp('s')),
+            *[(field, pa.float32()) for field in fields],
+        ],
+        metadata={'timezone': TIMEZONE}
+    )
+
+
+def rows_to_batch(schema, rows: List[tuple], city_id: int, city_index: int, city_names: List[str]):
+    """
+    将单个城市的元组行转换为 RecordBatch
+
+    Args:
+        schema: weather_schema 的结果
+        rows: (datetime, 字段1, 字段2, ...) 元组行
+        city_id: 城市ID
+        city_index: 城市名称在 city_names 中的下标
+        city_names: 导出文件中所有城市名称（字典编码的取值表，各批次共用）
+
+    Returns:
+        pyarrow.RecordBatch
+    """
+    columns = list(zip(*rows))
+    n = len(rows)
+    arrays = [
+        pa.array(np.full(n, city_id, dtype=np.int32)),
+        pa.DictionaryArray.from_arrays(
+            pa.array(np.full(n, city_index, dtype=np.int32)), pa.array(city_names, pa.string())
+        ),
+        pa.array(np.asarray(columns[0], dtype='datetime64[m]').astype('datetime64[s]')),
+    ]
+    for values in columns[1:]:
+        values = np.array(values, dtype=np.float64)
+        nulls = np.isnan(values)
+        arrays.append(pa.array(values.astype(np.float32), mask=nulls if nulls.any() else None))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def open_writer(sink: IO[bytes], schema, file_format: str):
+    """
+    创建列式文件写入器
+
+    Args:
+        sink: 可写的二进制文件对象
+        schema: 表结构
+        file_format: parquet 或 arrow
+
+    Returns:
+        写入器，write_batch 写入批次，close 结束文件
+    """
+    require_pyarrow()
+    if file_format == 'parquet':
+        return _ParquetBatchWriter(pq.ParquetWriter(sink, schema, compression=PARQUET_COMPRESSION))
+    return pa.ipc.new_file(sink, schema)
+
+
+def iter_ipc_stream(schema, batches: Iterable[Any]) -> Iterator[bytes]:
+    """
+    以 Arrow IPC 流格式逐批输出字节，内存中只保留当前批次
+
+    Args:
+        schema: 表结构
+        batches: RecordBatch 迭代器
+
+    Yields:
+        IPC 流的字节块（首块包含表结构）
+    """
+    require_pyarrow()
+    sink = io.BytesIO()
+
+    def take() -> bytes:
+        data = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return data
+
+    writer = pa.ipc.new_stream(sink, schema)
+    yield take()
+    for batch in batches:
+        writer.write_batch(batch)
+        yield take()
+    writer.close()
+    yield take()
+
+
+class _ParquetBatchWriter:
+    """ParquetWriter 的适配器：每个批次写为一个行组"""
+
+    def __init__(self, writer):
+        self.writer = writer
+
+    def write_batch(self, batch):
+        self.writer.write_table(pa.Table.from_batches([batch]))
+
+    def close(self):
+        self.writer.close()
+
+
+def iter_batches(source: Union[str, IO[bytes]], file_format: str, batch_size: int) -> Iterator[Any]:
+    """
+    逐批读取 Parquet 或 Arrow IPC 文件
+
+    Args:
+        source: 文件路径或二进制文件对象
+        file_format: parquet 或 arrow
+        batch_size: Parquet 每批的最大行数（Arrow IPC 按文件中的批次读取）
+
+    Yields:
+        pyarrow.RecordBatch
+    """
+    require_pyarrow()
+    if file_format == 'parquet':
+        yield from pq.ParquetFile(source).iter_batches(batch_size=batch_size)
+        return
+
+    reader = pa.ipc.open_file(source)
+    for i in range(reader.num_record_batches):
+        yield reader.get_batch(i)
+
+
+def batch_to_columns(batch, fields: List[str]) -> Dict[str, np.ndarray]:
+    """
+    将 RecordBatch 转换为 weather_data 的列
+
+    datetime 转回 YYYY-MM-DDTHH:MM 字符串；float32 字段按最短十进制表示
+    还原为 float64（如 20.1 而不是 20.100000381），空值为NaN
+
+    Args:
+        batch: RecordBatch，须包含 city_id 与 datetime
+        fields: 需要读取的数值字段（批次中不存在的字段会被忽略）
+
+    Returns:
+        {'city_id': int64数组, 'datetime': 字符串数组, 字段: float64数组}
+    """
+    names = batch.schema.names
+    datetimes = batch.column(names.index('datetime'))
+    if pa.types.is_timestamp(datetimes.type):
+        datetimes = datetimes.to_numpy(zero_copy_only=False).astype('datetime64[m]').astype(str)
+    else:
+        datetimes = np.asarray(datetimes.to_pylist(), dtype='datetime64[m]').astype(str)
+
+    columns = {
+        'city_id': batch.column(names.index('city_id')).to_numpy(zero_copy_only=False).astype(np.int64),
+        'datetime': datetimes,
+    }
+    for field in fields:
+        if field not in names:
+            continue
+        column = batch.column(names.index(field))
+        values = column.to_numpy(zero_copy_only=False)
+        if pa.types.is_float32(column.type):
+            values = values.astype(str).astype(np.float64)
+        columns[field] = np.asarray(values, dtype=np.float64)
+    return columns
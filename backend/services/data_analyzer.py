@@ -4,34 +4,368 @@
 遵循单一职责原则
 """
 import logging
-from typing import List, Dict, Any
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Union, Iterable, Tuple, Optional
 import pandas as pd
 import numpy as np
+from backend.services.statistics import RunningStats, CodeHistogram, FixedBinHistogram
+from backend.services.weather_codes import grouped_code_counts, code_distribution
+from backend.config import ANALYSIS_MAX_WORKERS, PARALLEL_ANALYSIS_MIN_VALUES, HISTOGRAM_BINS, PROCESS_START_METHOD
 
 logger = logging.getLogger(__name__)
 
+# 众数统计标记（用于天气代码等分类字段），同时返回代码分布
+MODE_STATS = ('most_frequent', 'distribution')
 
-def convert_to_python_types(obj):
+# 统计摘要规格: 摘要名称 -> (数据字段, 统计量)
+SUMMARY_SPEC: Dict[str, Tuple[str, Tuple[str, ...]]] = {
+    'temperature': ('temperature_2m', ('avg', 'max', 'min', 'std')),
+    'precipitation': ('precipitation', ('total', 'avg', 'max', 'rainy_hours')),
+    'wind_speed': ('wind_speed_10m', ('avg', 'max', 'min')),
+    'solar_radiation': ('shortwave_radiation', ('total', 'total_mj', 'total_kwh', 'avg', 'max')),
+    'humidity': ('relative_humidity_2m', ('avg', 'max', 'min')),
+    'pressure': ('surface_pressure', ('avg', 'max', 'min')),
+    'weather': ('weather_code', MODE_STATS),
+}
+
+SUMMARY_SOURCE_FIELDS = [field for field, _ in SUMMARY_SPEC.values()]
+
+# 默认返回的百分位
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+
+# 辐照度单位换算: Wh/m² -> MJ/m², Wh/m² -> kWh/m²
+WH_TO_MJ = 0.0036
+WH_TO_KWH = 0.001
+
+
+def to_columns(
+    data: Union[List[Dict[str, Any]], Dict[str, Any]],
+    fields: Iterable[str]
+) -> Dict[str, np.ndarray]:
     """
-    将numpy/pandas类型转换为Python原生类型
+    将记录列表或列式数据转换为 float64 数组，缺失值为 NaN
     
     Args:
-        obj: 要转换的对象
+        data: 天气数据列表，或列式数据 {字段: 数值序列}
+        fields: 需要的字段
         
     Returns:
-        转换后的Python原生类型对象
+        {字段: 数组}，仅包含数据中存在的字段
     """
-    if isinstance(obj, (np.integer, np.int64)):
-        return int(obj)
-    elif isinstance(obj, (np.floating, np.float64)):
-        return float(obj)
-    elif isinstance(obj, np.ndarray):
-        return obj.tolist()
-    elif isinstance(obj, dict):
-        return {key: convert_to_python_types(value) for key, value in obj.items()}
-    elif isinstance(obj, list):
-        return [convert_to_python_types(item) for item in obj]
-    return obj
+    if isinstance(data, dict):
+        return {
+            field: np.asarray(data[field], dtype=np.float64)
+            for field in fields if field in data
+        }
+    
+    present = set(data[0].keys()) if data else set()
+    return {
+        field: np.array([record.get(field) for record in data], dtype=np.float64)
+        for field in fields if field in present
+    }
+
+
+def _field_stats(values: np.ndarray, stats: Tuple[str, ...]) -> Dict[str, Any]:
+    """
+    计算单个字段的统计量
+    
+    Args:
+        values: 不含NaN的数组
+        stats: 需要的统计量
+        
+    Returns:
+        {统计量: 值}，浮点数保留两位小数
+    """
+    n = len(values)
+    total = float(values.sum())
+    std = None
+    if 'std' in stats and n > 1:
+        # 样本标准差，与 pandas 默认 ddof=1 一致
+        std = float(np.sqrt(np.square(values - total / n).sum() / (n - 1)))
+    
+    return _format_stats(
+        stats,
+        n=n,
+        total=total,
+        minimum=float(values.min()),
+        maximum=float(values.max()),
+        std=std,
+        positive=int(np.count_nonzero(values > 0)) if 'rainy_hours' in stats else 0
+    )
+
+
+def _running_stats_summary(running: RunningStats, stats: Tuple[str, ...]) -> Dict[str, Any]:
+    """
+    由可合并统计量计算单个字段的统计量
+    
+    Args:
+        running: 字段的累积统计量（count 须大于0）
+        stats: 需要的统计量
+        
+    Returns:
+        {统计量: 值}，浮点数保留两位小数
+    """
+    return _format_stats(
+        stats,
+        n=running.count,
+        total=running.total,
+        minimum=running.minimum,
+        maximum=running.maximum,
+        std=running.std,
+        positive=running.positive
+    )
+
+
+def _format_stats(
+    stats: Tuple[str, ...],
+    n: int,
+    total: float,
+    minimum: float,
+    maximum: float,
+    std: Optional[float],
+    positive: int
+) -> Dict[str, Any]:
+    """按统计规格组装结果，浮点数保留两位小数"""
+    computed = {
+        'avg': total / n,
+        'total': total,
+        'total_mj': total * WH_TO_MJ,
+        'total_kwh': total * WH_TO_KWH,
+        'max': maximum,
+        'min': minimum,
+        'std': std,
+        'rainy_hours': positive,
+    }
+    return {
+        stat: round(computed[stat], 2) if isinstance(computed[stat], float) else computed[stat]
+        for stat in stats
+    }
+
+
+def _code_summary(values: np.ndarray, counts: np.ndarray) -> Dict[str, Any]:
+    """
+    由代码计数组装分类字段的统计结果
+    
+    Args:
+        values: 升序的代码数组
+        counts: 对应的出现次数（至少一个非0）
+        
+    Returns:
+        {'most_frequent': 众数（并列时取最小值）, 'distribution': {代码: 次数}}
+    """
+    return {
+        'most_frequent': int(values[counts.argmax()]),
+        'distribution': code_distribution(values, counts),
+    }
+
+
+def _counts_summary(counts: Dict[int, int]) -> Dict[str, Any]:
+    """由 {代码: 次数} 字典组装分类字段的统计结果"""
+    codes = sorted(counts)
+    return _code_summary(
+        np.array(codes, dtype=np.int64),
+        np.array([counts[code] for code in codes], dtype=np.int64)
+    )
+
+
+def _stack_field(columns_list: List[Dict[str, np.ndarray]], field: str) -> np.ndarray:
+    """
+    将各城市同一字段堆叠为 城市 x 小时 的二维数组，长度不足处填充NaN
+    
+    Args:
+        columns_list: 各城市的列式数据
+        field: 字段名
+        
+    Returns:
+        二维 float64 数组
+    """
+    width = max((len(columns.get(field, ())) for columns in columns_list), default=0)
+    matrix = np.full((len(columns_list), width), np.nan)
+    for row, columns in enumerate(columns_list):
+        values = columns.get(field)
+        if values is not None:
+            matrix[row, :len(values)] = values
+    return matrix
+
+
+def _batched_field_stats(matrix: np.ndarray, stats: Tuple[str, ...]) -> List[Optional[Dict[str, Any]]]:
+    """
+    对 城市 x 小时 的二维数组按行一次性计算统计量
+    
+    Args:
+        matrix: 二维数组，缺失值为NaN
+        stats: 需要的统计量
+        
+    Returns:
+        各城市的统计结果，无有效值的城市为None
+    """
+    if stats == MODE_STATS:
+        # 每个城市为一组，一次 bincount 得到全部城市的代码分布
+        rows, cols = np.nonzero(~np.isnan(matrix))
+        values, counts = grouped_code_counts(matrix[rows, cols], rows, matrix.shape[0])
+        return [_code_summary(values, row) if row.any() else None for row in counts]
+    
+    valid = ~np.isnan(matrix)
+    counts = valid.sum(axis=1)
+    totals = np.where(valid, matrix, 0.0).sum(axis=1)
+    means = totals / np.maximum(counts, 1)
+    maxima = np.where(valid, matrix, -np.inf).max(axis=1, initial=-np.inf)
+    minima = np.where(valid, matrix, np.inf).min(axis=1, initial=np.inf)
+    m2 = np.square(np.where(valid, matrix - means[:, None], 0.0)).sum(axis=1)
+    positives = np.count_nonzero(matrix > 0, axis=1)
+    
+    results = []
+    for i, n in enumerate(counts.tolist()):
+        if n == 0:
+            results.append(None)
+            continue
+        results.append(_format_stats(
+            stats,
+            n=n,
+            total=float(totals[i]),
+            minimum=float(minima[i]),
+            maximum=float(maxima[i]),
+            std=float(np.sqrt(m2[i] / (n - 1))) if n > 1 else None,
+            positive=int(positives[i])
+        ))
+    return results
+
+
+def _compare_field(task: Tuple[str, np.ndarray, Tuple[str, ...]]) -> Tuple[str, List[Optional[Dict[str, Any]]]]:
+    """进程池任务：计算单个摘要项下所有城市的统计量"""
+    name, matrix, stats = task
+    return name, _batched_field_stats(matrix, stats)
+
+
+def moving_averages(
+    matrix: np.ndarray,
+    windows: List[int],
+    min_periods: int = 1
+) -> Dict[int, np.ndarray]:
+    """
+    由累积和一次计算多个字段、多个窗口的尾随移动平均
+    
+    与 pandas rolling(window, min_periods).mean() 语义一致（忽略NaN），
+    每个窗口的计算量与窗口大小无关
+    
+    Args:
+        matrix: 字段 x 时间 的二维数组，缺失值为NaN
+        windows: 窗口大小列表（小时）
+        min_periods: 窗口内最少有效值数量，不足时为NaN
+        
+    Returns:
+        {窗口: 与 matrix 同形状的移动平均数组}
+    """
+    matrix = np.atleast_2d(np.asarray(matrix, dtype=np.float64))
+    n = matrix.shape[1]
+    valid = ~np.isnan(matrix)
+    
+    # 减去各字段均值后再累积，降低长序列累积和的精度损失
+    counts_all = valid.sum(axis=1, keepdims=True)
+    center = np.where(valid, matrix, 0.0).sum(axis=1, keepdims=True) / np.maximum(counts_all, 1)
+    zeros = np.zeros((matrix.shape[0], 1))
+    csum = np.concatenate([zeros, np.cumsum(np.where(valid, matrix - center, 0.0), axis=1)], axis=1)
+    ccount = np.concatenate([zeros, np.cumsum(valid, axis=1)], axis=1)
+    
+    hi = np.arange(1, n + 1)
+    result = {}
+    for window in windows:
+        lo = np.maximum(hi - window, 0)
+        count = ccount[:, hi] - ccount[:, lo]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = (csum[:, hi] - csum[:, lo]) / count + center
+        result[window] = np.where(count >= max(min_periods, 1), mean, np.nan)
+    return result
+
+
+class SummaryAccumulator:
+    """
+    可分块累积、存储与合并的统计摘要
+    
+    按块（或按天）调用 update，多个分段可用 merge 合并，
+    summary() 的结果与对全部数据调用 calculate_summary 一致
+    """
+    
+    def __init__(self, fields: Optional[Iterable[str]] = None):
+        """
+        Args:
+            fields: 需要统计的字段，None表示统计规格中的全部字段
+        """
+        wanted = set(fields) if fields is not None else None
+        self.stats: Dict[str, Union[RunningStats, CodeHistogram]] = {
+            field: CodeHistogram() if stats == MODE_STATS else RunningStats()
+            for field, stats in SUMMARY_SPEC.values()
+            if wanted is None or field in wanted
+        }
+    
+    def update(self, columns: Dict[str, Any]) -> 'SummaryAccumulator':
+        """
+        累积一块列式数据
+        
+        Args:
+            columns: {字段: 数值序列}
+            
+        Returns:
+            自身
+        """
+        for field, accumulator in self.stats.items():
+            if field in columns:
+                accumulator.update(columns[field])
+        return self
+    
+    def update_rows(self, rows: List[tuple], columns: List[str]) -> 'SummaryAccumulator':
+        """
+        累积一块元组行数据（如数据库游标的结果）
+        
+        Args:
+            rows: 元组行列表
+            columns: 各列名称
+            
+        Returns:
+            自身
+        """
+        if rows:
+            self.update(dict(zip(columns, zip(*rows))))
+        return self
+    
+    def merge(self, other: 'SummaryAccumulator') -> 'SummaryAccumulator':
+        """合并另一分段（原地修改），仅合并双方共有的字段"""
+        for field, accumulator in self.stats.items():
+            if field in other.stats:
+                accumulator.merge(other.stats[field])
+        return self
+    
+    def summary(self) -> Dict[str, Any]:
+        """
+        计算统计摘要
+        
+        Returns:
+            与 calculate_summary 格式一致的统计摘要
+        """
+        result = {}
+        for name, (field, stats) in SUMMARY_SPEC.items():
+            accumulator = self.stats.get(field)
+            if accumulator is None or accumulator.count == 0:
+                continue
+            if stats == MODE_STATS:
+                result[name] = _counts_summary(accumulator.counts)
+            else:
+                result[name] = _running_stats_summary(accumulator, stats)
+        return result
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """序列化为可存储的字典"""
+        return {field: accumulator.to_dict() for field, accumulator in self.stats.items()}
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'SummaryAccumulator':
+        """由 to_dict 的结果恢复"""
+        accumulator = cls(data.keys())
+        for field in accumulator.stats:
+            restore = CodeHistogram if isinstance(accumulator.stats[field], CodeHistogram) else RunningStats
+            accumulator.stats[field] = restore.from_dict(data[field])
+        return accumulator
 
 
 class DataAnalyzer:
@@ -40,110 +374,155 @@ class DataAnalyzer:
     负责天气数据的统计和分析
     """
     
-    def __init__(self):
-        """初始化数据分析器"""
+    def __init__(self, db_manager=None):
+        """
+        初始化数据分析器
+        
+        Args:
+            db_manager: 数据库管理器（可选），提供时可在数据库中直接计算统计摘要
+        """
+        self.db_manager = db_manager
         logger.info("数据分析器初始化完成")
     
-    def calculate_summary(self, data: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def calculate_summary(self, data: Union[List[Dict[str, Any]], Dict[str, Any]]) -> Dict[str, Any]:
         """
         计算数据统计摘要
         
         Args:
-            data: 天气数据列表
+            data: 天气数据列表，或列式数据 {字段: 数值序列}
             
         Returns:
-            统计摘要字典
+            统计摘要字典（值均为Python原生类型）
         """
         if not data:
             return {}
         
         try:
-            df = pd.DataFrame(data)
+            columns = to_columns(data, SUMMARY_SOURCE_FIELDS)
             summary = {}
             
-            # 温度统计
-            if 'temperature_2m' in df.columns:
-                temp_data = df['temperature_2m'].dropna()
-                if len(temp_data) > 0:
-                    summary['temperature'] = {
-                        'avg': round(temp_data.mean(), 2),
-                        'max': round(temp_data.max(), 2),
-                        'min': round(temp_data.min(), 2),
-                        'std': round(temp_data.std(), 2)
-                    }
-            
-            # 降水统计
-            if 'precipitation' in df.columns:
-                precip_data = df['precipitation'].dropna()
-                if len(precip_data) > 0:
-                    summary['precipitation'] = {
-                        'total': round(precip_data.sum(), 2),
-                        'avg': round(precip_data.mean(), 2),
-                        'max': round(precip_data.max(), 2),
-                        'rainy_hours': int((precip_data > 0).sum())
-                    }
-            
-            # 风速统计
-            if 'wind_speed_10m' in df.columns:
-                wind_data = df['wind_speed_10m'].dropna()
-                if len(wind_data) > 0:
-                    summary['wind_speed'] = {
-                        'avg': round(wind_data.mean(), 2),
-                        'max': round(wind_data.max(), 2),
-                        'min': round(wind_data.min(), 2)
-                    }
-            
-            # 辐照度统计
-            if 'shortwave_radiation' in df.columns:
-                radiation_data = df['shortwave_radiation'].dropna()
-                if len(radiation_data) > 0:
-                    total_sum = radiation_data.sum()
-                    summary['solar_radiation'] = {
-                        'total': round(total_sum, 2),
-                        'total_mj': round(total_sum * 0.0036, 2),  # Wh/m² 转换为 MJ/m²
-                        'total_kwh': round(total_sum / 1000, 2),  # 转换为kWh/m²
-                        'avg': round(radiation_data.mean(), 2),
-                        'max': round(radiation_data.max(), 2)
-                    }
-            
-            # 湿度统计
-            if 'relative_humidity_2m' in df.columns:
-                humidity_data = df['relative_humidity_2m'].dropna()
-                if len(humidity_data) > 0:
-                    summary['humidity'] = {
-                        'avg': round(humidity_data.mean(), 2),
-                        'max': round(humidity_data.max(), 2),
-                        'min': round(humidity_data.min(), 2)
-                    }
-            
-            # 气压统计
-            if 'surface_pressure' in df.columns:
-                pressure_data = df['surface_pressure'].dropna()
-                if len(pressure_data) > 0:
-                    summary['pressure'] = {
-                        'avg': round(pressure_data.mean(), 2),
-                        'max': round(pressure_data.max(), 2),
-                        'min': round(pressure_data.min(), 2)
-                    }
-            
-            # 天气代码统计 (最频繁出现的天气)
-            if 'weather_code' in df.columns:
-                weather_data = df['weather_code'].dropna()
-                if len(weather_data) > 0:
-                    # 获取最频繁出现的值 (众数)
-                    mode_val = weather_data.mode()
-                    if not mode_val.empty:
-                        summary['weather'] = {
-                            'most_frequent': int(mode_val.iloc[0])
-                        }
-            
-            logger.debug(f"计算统计摘要成功: {len(data)} 条记录")
-            return convert_to_python_types(summary)
+            for name, (field, stats) in SUMMARY_SPEC.items():
+                if field not in columns:
+                    continue
+                values = columns[field]
+                values = values[~np.isnan(values)]
+                if len(values) == 0:
+                    continue
+                
+                if stats == MODE_STATS:
+                    # 天气代码统计 (最频繁出现的天气及代码分布)
+                    codes, counts = grouped_code_counts(values)
+                    summary[name] = _code_summary(codes, counts[0])
+                else:
+                    summary[name] = _field_stats(values, stats)
+            
+            logger.debug(f"计算统计摘要成功: {len(next(iter(columns.values()), []))} 条记录")
+            return summary
             
         except Exception as e:
             logger.error(f"计算统计摘要失败: {e}")
             return {}
     
+    def summarize_stored(
+        self,
+        filters: Dict[str, Any],
+        fields: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        在数据库中聚合计算本地数据的统计摘要，不读取小时记录
+        
+        结果与对相同数据调用 calculate_summary 一致
+        
+        Args:
+            filters: weather_data 过滤条件（city_id, start_date, end_date 等）
+            fields: 需要统计的字段，None表示全部
+            
+        Returns:
+            {'total_records': 记录数, 'summary': 统计摘要}
+        """
+        if self.db_manager is None:
+            raise ValueError("未配置数据库管理器，无法在数据库中计算统计摘要")
+        
+        source_fields = [
+            f for f in SUMMARY_SOURCE_FIELDS
+            if fields is None or f in fields
+        ]
+        moment_fields = [f for f, stats in SUMMARY_SPEC.values() if f in source_fields and stats != MODE_STATS]
+        
+        try:
+            aggregates = self.db_manager.aggregate_weather_fields(filters, moment_fields)
+            summary = {}
+            
+            for name, (field, stats) in SUMMARY_SPEC.items():
+                if field not in source_fields:
+                    continue
+                
+                if stats == MODE_STATS:
+                    counts = self.db_manager.count_weather_values(filters, field)
+                    if counts:
+                        summary[name] = _counts_summary(counts)
+                elif field in aggregates and aggregates[field]['count']:
+                    moments = aggregates[field]
+                    running = RunningStats.from_moments(
+                        moments['count'], moments['sum'], moments['sum_sq'],
+                        moments['min'], moments['max'], moments['positive']
+                    )
+                    summary[name] = _running_stats_summary(running, stats)
+            
+            logger.debug(f"数据库聚合统计摘要成功: {aggregates['total']} 条记录")
+            return {'total_records': aggregates['total'], 'summary': summary}
+            
+        except Exception as e:
+            logger.error(f"数据库聚合统计摘要失败: {e}")
+            return {'total_records': 0, 'summary': {}}
+    
+    def calculate_percentiles(
+        self,
+        city_ids: List[int],
+        field: str,
+        start_date: str,
+        end_date: str,
+        percentiles: Iterable[float] = DEFAULT_PERCENTILES,
+        include_histogram: bool = False
+    ) -> Dict[str, Any]:
+        """
+        由预计算的月直方图合并计算任意时间范围的近似分位数
+        
+        Args:
+            city_ids: 城市ID列表（多个城市合并为一个分布）
+            field: 字段名（须在 HISTOGRAM_BINS 中）
+            start_date: 开始日期 (YYYY-MM-DD)
+            end_date: 结束日期 (YYYY-MM-DD)
+            percentiles: 百分位数（0-100）
+            include_histogram: 是否返回非空箱
+            
+        Returns:
+            {'count', 'bin_width', 'percentiles': {百分位: 值}, 'histogram'?}
+        """
+        if self.db_manager is None:
+            raise ValueError("未配置数据库管理器，无法计算分位数")
+        if field not in HISTOGRAM_BINS:
+            raise ValueError(f"字段 {field} 不支持分位数统计")
+        
+        percentiles = list(percentiles)
+        histogram = FixedBinHistogram(*HISTOGRAM_BINS[field])
+        histogram.add_counts(*self.db_manager.get_histogram_counts(city_ids, field, start_date, end_date))
+        
+        values = histogram.quantiles(percentiles)
+        result = {
+            'count': histogram.count,
+            'bin_width': histogram.width,
+            'percentiles': {
+                f'p{p:g}': round(v, 3) if v is not None else None
+                for p, v in zip(percentiles, values)
+            }
+        }
+        if include_histogram:
+            result['histogram'] = histogram.nonzero_bins()
+        
+        logger.debug(f"计算分位数成功: {field}, {histogram.count} 个值")
+        return result
+    
     def calculate_daily_avg(self, hourly_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
         计算每日平均值
@@ -239,23 +618,28 @@ class DataAnalyzer:
     
     def compare_cities(
         self,
-        city_data_list: List[Dict[str, Any]]
+        city_data_list: List[Dict[str, Any]],
+        max_workers: Optional[int] = None
     ) -> Dict[str, Any]:
         """
         对比多个城市的数据
         
+        各字段按 城市 x 小时 堆叠为二维数组，一次向量化计算所有城市的统计量；
+        数据总量超过 PARALLEL_ANALYSIS_MIN_VALUES 时按字段分配到进程池
+        
         Args:
-            city_data_list: 城市数据列表，每个元素包含city_name和data
+            city_data_list: 城市数据列表，每个元素包含city_name和data（记录列表或列式数据）
+            max_workers: 最大进程数，None 使用 ANALYSIS_MAX_WORKERS
             
         Returns:
-            对比结果字典
+            对比结果字典 {城市名: 统计摘要}
         """
         if not city_data_list:
             return {}
         
         try:
-            comparison = {}
-            
+            names = []
+            columns_list = []
             for city_data in city_data_list:
                 city_name = city_data.get('city_name')
                 data = city_data.get('data', [])
@@ -263,9 +647,37 @@ class DataAnalyzer:
                 if not city_name or not data:
                     continue
                 
-                # 计算该城市的统计摘要
-                summary = self.calculate_summary(data)
-                comparison[city_name] = summary
+                names.append(city_name)
+                columns_list.append(to_columns(data, SUMMARY_SOURCE_FIELDS))
+            
+            tasks = [
+                (name, _stack_field(columns_list, field), stats)
+                for name, (field, stats) in SUMMARY_SPEC.items()
+                if any(field in columns for columns in columns_list)
+            ]
+            
+            workers = ANALYSIS_MAX_WORKERS if max_workers is None else max_workers
+            total_values = sum(matrix.size for _, matrix, _ in tasks)
+            results = None
+            if workers > 1 and len(tasks) > 1 and total_values >= PARALLEL_ANALYSIS_MIN_VALUES:
+                try:
+                    with ProcessPoolExecutor(
+                        max_workers=min(workers, len(tasks)),
+                        mp_context=multiprocessing.get_context(PROCESS_START_METHOD)
+                    ) as executor:
+                        results = dict(executor.map(_compare_field, tasks))
+                except Exception as e:
+                    logger.warning(f"并行对比失败，改为顺序计算: {e}")
+            if results is None:
+                results = dict(_compare_field(task) for task in tasks)
+            
+            comparison = {}
+            for i, city_name in enumerate(names):
+                comparison[city_name] = {
+                    name: results[name][i]
+                    for name in SUMMARY_SPEC
+                    if name in results and results[name][i] is not None
+                }
             
             logger.debug(f"对比 {len(comparison)} 个城市的数据")
             return comparison
@@ -274,6 +686,44 @@ class DataAnalyzer:
             logger.error(f"对比城市数据失败: {e}")
             return {}
     
+    def calculate_multi_trends(
+        self,
+        columns: Dict[str, Any],
+        fields: List[str],
+        windows: List[int]
+    ) -> Dict[str, Any]:
+        """
+        计算多个字段、多个窗口的移动平均趋势，返回列式数组
+        
+        Args:
+            columns: 列式数据 {'datetime': [...], 字段: [...]}
+            fields: 要计算趋势的字段
+            windows: 移动平均窗口大小列表（小时）
+            
+        Returns:
+            列式数据 {'datetime': [...], 字段: 原始值, '字段_trend_窗口': 移动平均}
+        """
+        fields = [f for f in fields if f in columns]
+        result = {'datetime': list(columns.get('datetime', []))}
+        if not fields or not result['datetime']:
+            return result
+        
+        try:
+            matrix = np.array([columns[f] for f in fields], dtype=np.float64)
+            trends = moving_averages(matrix, windows)
+            
+            for row, field in enumerate(fields):
+                result[field] = matrix[row]
+                for window in windows:
+                    result[f'{field}_trend_{window}'] = np.round(trends[window][row], 3)
+            
+            logger.debug(f"计算趋势成功: {len(fields)} 个字段, 窗口: {windows}")
+            return result
+            
+        except Exception as e:
+            logger.error(f"计算趋势失败: {e}")
+            return {'datetime': result['datetime']}
+    
     def calculate_trends(
         self,
         data: List[Dict[str, Any]],
@@ -4,15 +4,76 @@
 遵循单一职责原则和接口隔离原则
 """
 import logging
+import tempfile
+from datetime import date
+import numpy as np
 import pandas as pd
 from io import BytesIO
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator, Optional, IO, Tuple
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, PatternFill, Alignment
-from openpyxl.utils.dataframe import dataframe_to_rows
+from openpyxl.utils import get_column_letter
+from backend.services.weather_codes import weather_code_labels, grouped_modes
+from backend.services.columnar_format import (
+    COLUMNAR_FORMATS, require_pyarrow, weather_schema, rows_to_batch, open_writer
+)
+from backend.config import EXPORT_SPOOL_MAX_SIZE, EXPORT_WIDTH_SAMPLE_ROWS, EXPORT_WRITE_CHUNK_ROWS
 
 logger = logging.getLogger(__name__)
 
+MAX_COLUMN_WIDTH = 50
+DAILY_COLUMN_WIDTH = 15
+
+# Excel 单个工作表的最大行数（含表头）
+EXCEL_MAX_ROWS = 1048576
+
+# 导出字段的固定顺序，不在其中的数据库字段（如已弃用的 80m 风速）不导出
+EXPORT_FIELD_ORDER = [
+    'temperature_2m', 'relative_humidity_2m', 'dew_point_2m',
+    'precipitation', 'rain', 'snowfall', 'surface_pressure', 'cloud_cover',
+    'wind_speed_10m', 'wind_direction_10m', 'wind_gusts_10m',
+    'wind_speed_100m', 'wind_direction_100m',
+    'shortwave_radiation', 'direct_radiation', 'diffuse_radiation', 'direct_normal_irradiance',
+    'evapotranspiration', 'soil_temperature_0_to_7cm', 'soil_moisture_0_to_7cm',
+    'weather_code'
+]
+
+# 每日汇总中按总和（而非均值）汇总的列
+DAILY_SUM_COLUMNS = (
+    '降水量(mm)', '降雨量(mm)', '蒸发蒸腾量(mm)',
+    '短波辐射(W/m²)', '直接辐射(W/m²)', '散射辐射(W/m²)', '直接法向辐照度(W/m²)'
+)
+
+# 导出列名（英文到中文）
+COLUMN_NAMES = {
+    'city': '城市',
+    'date': '日期',
+    'time': '时间',
+    'datetime': '日期时间',
+    'temperature_2m': '温度(°C)',
+    'relative_humidity_2m': '相对湿度(%)',
+    'dew_point_2m': '露点温度(°C)',
+    'precipitation': '降水量(mm)',
+    'rain': '降雨量(mm)',
+    'snowfall': '降雪量(cm)',
+    'surface_pressure': '地面气压(hPa)',
+    'cloud_cover': '云量(%)',
+    'wind_speed_10m': '10米风速(km/h)',
+    'wind_direction_10m': '10米风向(°)',
+    'wind_gusts_10m': '10米阵风(km/h)',
+    'wind_speed_100m': '100米风速(km/h)',
+    'wind_direction_100m': '100米风向(°)',
+    'shortwave_radiation': '短波辐射(W/m²)',
+    'direct_radiation': '直接辐射(W/m²)',
+    'diffuse_radiation': '散射辐射(W/m²)',
+    'direct_normal_irradiance': '直接法向辐照度(W/m²)',
+    'evapotranspiration': '蒸发蒸腾量(mm)',
+    'soil_temperature_0_to_7cm': '土壤温度(°C)',
+    'soil_moisture_0_to_7cm': '土壤湿度(m³/m³)',
+    'weather_code': '天气代码',
+}
+
 
 class DataExporter:
     """
@@ -42,64 +103,149 @@ class DataExporter:
             include_summary: 是否包含汇总表
             
         Returns:
-            Excel文件的字节流
+            Excel文件的字节流（大数据量请使用 write_excel 直接获取临时文件）
         """
-        try:
-            # 转换为DataFrame
-            df = self._format_data(data, fields, city_name)
-            
-            # 创建Excel工作簿
-            wb = Workbook()
-            
-            # 删除默认的工作表
-            if 'Sheet' in wb.sheetnames:
-                wb.remove(wb['Sheet'])
-            
-            # 添加数据表
-            ws_data = wb.create_sheet('天气数据')
-            
-            # 写入数据
-            for r in dataframe_to_rows(df, index=False, header=True):
-                ws_data.append(r)
+        with self.write_excel([data], filename, fields, include_summary, city_name) as output:
+            return output.read()
+    
+    def write_excel(
+        self,
+        chunks: Iterable[List[Dict[str, Any]]],
+        filename: str,
+        fields: List[str] = None,
+        include_summary: bool = True,
+        city_name: str = None
+    ) -> IO[bytes]:
+        """
+        以只写模式流式导出Excel
+        
+        每块数据格式化后逐行写入，不在内存中保留单元格对象；列宽按表头与首块的
+        抽样行估算；超过单表行数上限时续写到新工作表；
+        文件超过 EXPORT_SPOOL_MAX_SIZE 后转存到临时文件
+        
+        Args:
+            chunks: 数据块的可迭代对象（如每个城市一块），同一城市同一天的数据须在同一块内
+            filename: 文件名
+            fields: 要导出的字段列表，None表示导出所有字段
+            include_summary: 是否包含每日汇总表
+            city_name: 城市名称
             
-            # 设置表头样式
-            header_fill = PatternFill(start_color='1F4E78', end_color='1F4E78', fill_type='solid')
-            header_font = Font(color='FFFFFF', bold=True)
+        Returns:
+            定位在开头的临时文件对象，由调用方负责关闭
+        """
+        output = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_SIZE)
+        try:
+            wb = Workbook(write_only=True)
+            ws_data = None
+            columns = None
+            daily_frames = []
+            total = 0
             
-            for cell in ws_data[1]:
-                cell.fill = header_fill
-                cell.font = header_font
-                cell.alignment = Alignment(horizontal='center', vertical='center')
+            for chunk in chunks:
+                df = self._format_data(chunk, fields, city_name)
+                if df.empty:
+                    continue
+                
+                if ws_data is None:
+                    columns = df.columns.tolist()
+                    ws_data = _PagedSheet(wb, '天气数据', columns, self._column_widths(df), '1F4E78')
+                else:
+                    df = df.reindex(columns=columns)
+                
+                ws_data.append(df)
+                total += len(df)
+                
+                # 每日汇总只保留按天聚合后的结果
+                if include_summary and '日期' in df.columns:
+                    daily_df = self._daily_summary(df)
+                    if daily_df is not None:
+                        daily_frames.append(daily_df)
             
-            # 自动调整列宽
-            for column in ws_data.columns:
-                max_length = 0
-                column_letter = column[0].column_letter
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                adjusted_width = min(max_length + 2, 50)
-                ws_data.column_dimensions[column_letter].width = adjusted_width
+            if ws_data is None:
+                wb.create_sheet('天气数据')
             
-            # 添加汇总表
-            if include_summary and len(df) > 0:
-                self._add_summary_sheet(wb, df)
+            if daily_frames:
+                daily_df = pd.concat(daily_frames, ignore_index=True)
+                daily_columns = daily_df.columns.tolist()
+                widths = {column: DAILY_COLUMN_WIDTH for column in daily_columns}
+                _PagedSheet(wb, '每日汇总', daily_columns, widths, '70AD47').append(daily_df)
             
-            # 保存到字节流
-            output = BytesIO()
             wb.save(output)
             output.seek(0)
             
-            logger.info(f"导出Excel成功: {filename}, 共 {len(df)} 条记录")
-            return output.getvalue()
+            logger.info(f"导出Excel成功: {filename}, 共 {total} 条记录")
+            return output
             
         except Exception as e:
+            output.close()
             logger.error(f"导出Excel失败: {e}")
             raise
     
+    @staticmethod
+    def _create_sheet(
+        workbook: Workbook,
+        title: str,
+        columns: List[str],
+        widths: Dict[str, float],
+        header_color: str
+    ):
+        """
+        在只写工作簿中创建工作表，设置列宽并写入带样式的表头
+        
+        Args:
+            workbook: 只写模式的工作簿
+            title: 工作表名称
+            columns: 列名
+            widths: {列名: 列宽}
+            header_color: 表头背景色
+            
+        Returns:
+            工作表对象
+        """
+        ws = workbook.create_sheet(title)
+        for i, column in enumerate(columns, start=1):
+            ws.column_dimensions[get_column_letter(i)].width = widths.get(column, DAILY_COLUMN_WIDTH)
+        
+        header_fill = PatternFill(start_color=header_color, end_color=header_color, fill_type='solid')
+        header_font = Font(color='FFFFFF', bold=True)
+        header_alignment = Alignment(horizontal='center', vertical='center')
+        header = []
+        for column in columns:
+            cell = WriteOnlyCell(ws, value=column)
+            cell.fill = header_fill
+            cell.font = header_font
+            cell.alignment = header_alignment
+            header.append(cell)
+        ws.append(header)
+        return ws
+    
+    @staticmethod
+    def _append_rows(ws, df: pd.DataFrame):
+        """分批将DataFrame转换为行并写入工作表，NaN写为空单元格"""
+        for start in range(0, len(df), EXPORT_WRITE_CHUNK_ROWS):
+            block = df.iloc[start:start + EXPORT_WRITE_CHUNK_ROWS]
+            for row in block.astype(object).where(block.notna(), None).values.tolist():
+                ws.append(row)
+    
+    @staticmethod
+    def _column_widths(df: pd.DataFrame) -> Dict[str, float]:
+        """
+        按表头与抽样行估算列宽
+        
+        Args:
+            df: 已格式化的数据
+            
+        Returns:
+            {列名: 列宽}，最大 MAX_COLUMN_WIDTH
+        """
+        sample = df.head(EXPORT_WIDTH_SAMPLE_ROWS)
+        widths = {}
+        for column in df.columns:
+            values = sample[column].dropna().astype(str)
+            longest = max(len(str(column)), int(values.str.len().max()) if len(values) else 0)
+            widths[column] = min(longest + 2, MAX_COLUMN_WIDTH)
+        return widths
+    
     def export_to_csv(
         self,
         data: List[Dict[str, Any]],
@@ -134,6 +280,121 @@ class DataExporter:
             logger.error(f"导出CSV失败: {e}")
             raise
     
+    def iter_csv(
+        self,
+        row_chunks: Iterable[List[tuple]],
+        columns: List[str],
+        fields: List[str] = None,
+        city_names: Optional[Dict[int, str]] = None,
+        city_name: str = None
+    ) -> Iterator[bytes]:
+        """
+        逐块生成CSV内容（与 export_to_csv 的列与格式一致）
+        
+        数据块通常来自 DatabaseManager.iter_weather_rows 的游标，
+        每块单独格式化并编码，内存占用与导出总行数无关
+        
+        Args:
+            row_chunks: 元组行块的可迭代对象
+            columns: 元组各位置的列名（datetime、字段，可选 city_id 或 city）
+            fields: 要导出的字段列表，None表示导出所有字段
+            city_names: {city_id: 城市名}，行中含 city_id 时用于生成城市列
+            city_name: 所有行共用的城市名称
+            
+        Yields:
+            UTF-8 编码的CSV片段，首块带BOM与表头（便于Excel打开中文）
+        """
+        has_city = 'city' in columns or 'city_id' in columns or city_name is not None
+        export_fields = [
+            c for c in EXPORT_FIELD_ORDER
+            if c in columns and (fields is None or c in fields)
+        ]
+        output_columns = (['city'] if has_city else []) + ['date', 'time'] + export_fields
+        header = pd.DataFrame(columns=[COLUMN_NAMES.get(c, c) for c in output_columns]).to_csv(index=False)
+        yield ('\ufeff' + header).encode('utf-8')
+        
+        total = 0
+        for rows in row_chunks:
+            if not rows:
+                continue
+            df = pd.DataFrame.from_records(rows, columns=columns)
+            out = {}
+            if 'city' in df.columns:
+                out['city'] = df['city']
+            elif 'city_id' in df.columns:
+                out['city'] = df['city_id'].map(city_names or {})
+            elif city_name is not None:
+                out['city'] = city_name
+            out['date'] = df['datetime'].str.slice(0, 10)
+            out['time'] = df['datetime'].str.slice(11, 16)
+            for field in export_fields:
+                out[field] = df[field]
+            if 'weather_code' in out:
+                out['weather_code'] = weather_code_labels(df['weather_code'].to_numpy(dtype=np.float64, na_value=np.nan))
+            
+            yield pd.DataFrame(out, columns=output_columns).to_csv(index=False, header=False).encode('utf-8')
+            total += len(df)
+        
+        logger.info(f"流式导出CSV完成，共 {total} 条记录")
+    
+    def write_columnar(
+        self,
+        row_groups: Iterable[Tuple[int, List[tuple]]],
+        fields: List[str],
+        city_names: Dict[int, str],
+        file_format: str,
+        filename: str
+    ) -> IO[bytes]:
+        """
+        导出为 Parquet 或 Arrow IPC 文件
+        
+        数值字段为 float32，城市名称字典编码；每个输入块（通常为一个城市一年）
+        写为一个行组/批次，便于按城市、年份选择性读取
+        
+        Args:
+            row_groups: (city_id, 元组行) 的可迭代对象，行为 (datetime, 字段1, ...)
+            fields: 数值字段列表（与元组中字段的顺序一致）
+            city_names: {city_id: 城市名}
+            file_format: parquet 或 arrow
+            filename: 文件名
+            
+        Returns:
+            定位在开头的临时文件对象，由调用方负责关闭
+        """
+        if file_format not in COLUMNAR_FORMATS:
+            raise ValueError(f"不支持的列式格式: {file_format}")
+        require_pyarrow()
+        
+        names = sorted(set(city_names.values()))
+        city_index = {city_id: names.index(name) for city_id, name in city_names.items()}
+        schema = weather_schema(fields)
+        
+        output = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_SIZE)
+        writer = None
+        try:
+            writer = open_writer(output, schema, file_format)
+            total = 0
+            for city_id, rows in row_groups:
+                if rows:
+                    writer.write_batch(rows_to_batch(schema, rows, city_id, city_index[city_id], names))
+                    total += len(rows)
+            writer.close()
+            output.seek(0)
+            
+            logger.info(f"导出{file_format}成功: {filename}, 共 {total} 条记录")
+            return output
+            
+        except Exception as e:
+            # 先关闭写入器，避免其析构时向已关闭的临时文件写入文件尾
+            if writer is not None:
+                try:
+                    writer.close()
+                except Exception:
+                    pass
+            output.close()
+            logger.error(f"导出{file_format}失败: {e}")
+            raise
+    
     def _format_data(
         self,
         data: List[Dict[str, Any]],
@@ -162,174 +423,155 @@ class DataExporter:
         
         # 拆分日期和时间
         if 'datetime' in df.columns:
-            df['datetime_dt'] = pd.to_datetime(df['datetime'])
-            df['date'] = df['datetime_dt'].dt.date
-            df['time'] = df['datetime_dt'].dt.strftime('%H:%M')
+            df['date'], df['time'] = self._split_datetime(df['datetime'])
         
         # 天气代码转换 (Item 17)
         if 'weather_code' in df.columns:
-            weather_map = {
-                0: '晴朗', 1: '晴到多云', 2: '多云', 3: '阴天', 45: '雾', 
-                48: '沉积雾', 51: '小毛毛雨', 53: '毛毛雨', 55: '大毛毛雨',
-                61: '小雨', 63: '中雨', 65: '大雨', 71: '小雪', 73: '中雪', 
-                75: '大雪', 80: '阵雨', 81: '中阵雨', 82: '大阵雨', 95: '雷阵雨'
-            }
-            df['weather_code'] = df['weather_code'].map(lambda x: f"{int(x)} ({weather_map.get(int(x), '未知')})" if pd.notnull(x) else x)
+            df['weather_code'] = weather_code_labels(pd.to_numeric(df['weather_code'], errors='coerce'))
         
         # 如果指定了字段，确保包含我们新增的辅助字段
         # 按照固定顺序排列核心字段，增加导出的整齐度 (Item 2 改进)
         helper_cols = ['city', 'date', 'time']
-        core_order = [
-            'temperature_2m', 'relative_humidity_2m', 'dew_point_2m',
-            'precipitation', 'rain', 'snowfall', 'surface_pressure', 'cloud_cover',
-            'wind_speed_10m', 'wind_direction_10m', 'wind_gusts_10m',
-            'wind_speed_100m', 'wind_direction_100m',
-            'shortwave_radiation', 'direct_radiation', 'diffuse_radiation', 'direct_normal_irradiance',
-            'evapotranspiration', 'soil_temperature_0_to_7cm', 'soil_moisture_0_to_7cm',
-            'weather_code'
-        ]
-        
         final_cols = [c for c in helper_cols if c in df.columns]
-        for c in core_order:
+        for c in EXPORT_FIELD_ORDER:
             if c in df.columns:
                 if fields is None or c in fields:
                     final_cols.append(c)
         
-        # 严格限制字段：只导出 core_order 中定义的或明确请求的字段 (Item 2 & 13)
+        # 严格限制字段：只导出 EXPORT_FIELD_ORDER 中定义的或明确请求的字段 (Item 2 & 13)
         # 不再通过循环 df.columns 来添加数据库中多余的空闲字段（如已弃用的 80m 风速等）
         
         df = df[final_cols]
         
         # 重命名列为中文
-        column_mapping = self._get_column_mapping()
-        df = df.rename(columns=column_mapping)
+        return df.rename(columns=COLUMN_NAMES)
+    
+    @staticmethod
+    def _split_datetime(values: pd.Series) -> Tuple[np.ndarray, pd.Series]:
+        """
+        将 YYYY-MM-DDTHH:MM 日期时间拆分为日期与 HH:MM 时间
         
-        # 删除临时的辅助列
-        if 'datetime_dt' in df.columns:
-            df = df.drop(columns=['datetime_dt'])
+        按字符串切片拆分；日期只对去重后的值转换一次为 date 对象
+        （每24行共用一个），非字符串的值先统一格式化
         
-        return df
-    def _get_column_mapping(self) -> Dict[str, str]:
+        Args:
+            values: 日期时间列
+            
+        Returns:
+            (date 对象数组, 时间字符串列)
         """
-        获取列名映射（英文到中文）
+        if len(values) and not isinstance(values.iloc[0], str):
+            values = pd.to_datetime(values).dt.strftime('%Y-%m-%dT%H:%M')
         
+        codes, days = pd.factorize(values.str.slice(0, 10))
+        dates = np.array([date.fromisoformat(day) for day in days], dtype=object)
+        return dates[codes], values.str.slice(11, 16)
+    
+    @staticmethod
+    def _daily_main_weather(labels: pd.Series, groups: np.ndarray, n_groups: int) -> np.ndarray:
+        """
+        按分组计算主要天气（众数，并列取最小代码）
+        
+        天气代码列已格式化为 "61 (小雨)"，只对去重后的标签解析一次整数代码，
+        再用 bincount 一次性计算所有分组的众数
+        
+        Args:
+            labels: 已格式化的天气代码列
+            groups: 每行的分组编号
+            n_groups: 分组数量
+            
         Returns:
-            列名映射字典
+            各分组的主要天气标签数组
         """
-        return {
-            'city': '城市',
-            'date': '日期',
-            'time': '时间',
-            'datetime': '日期时间',
-            'temperature_2m': '温度(°C)',
-            'relative_humidity_2m': '相对湿度(%)',
-            'dew_point_2m': '露点温度(°C)',
-            'precipitation': '降水量(mm)',
-            'rain': '降雨量(mm)',
-            'snowfall': '降雪量(cm)',
-            'surface_pressure': '地面气压(hPa)',
-            'cloud_cover': '云量(%)',
-            'wind_speed_10m': '10米风速(km/h)',
-            'wind_direction_10m': '10米风向(°)',
-            'wind_gusts_10m': '10米阵风(km/h)',
-            'wind_speed_100m': '100米风速(km/h)',
-            'wind_direction_100m': '100米风向(°)',
-            'shortwave_radiation': '短波辐射(W/m²)',
-            'direct_radiation': '直接辐射(W/m²)',
-            'diffuse_radiation': '散射辐射(W/m²)',
-            'direct_normal_irradiance': '直接法向辐照度(W/m²)',
-            'evapotranspiration': '蒸发蒸腾量(mm)',
-            'soil_temperature_0_to_7cm': '土壤温度(°C)',
-            'soil_moisture_0_to_7cm': '土壤湿度(m³/m³)',
-            'weather_code': '天气代码',
-        }
+        codes, uniques = pd.factorize(labels)
+        label_codes = np.array([float(str(u).split(' ', 1)[0]) for u in uniques] + [np.nan])
+        
+        # factorize 用 -1 表示缺失，正好取到末尾的NaN
+        modes, has_values = grouped_modes(label_codes[codes], groups, n_groups)
+        result = weather_code_labels(modes)
+        result[~has_values] = None
+        return result
     
-    def _add_summary_sheet(self, workbook: Workbook, df: pd.DataFrame):
+    def _daily_summary(self, df: pd.DataFrame) -> Optional[pd.DataFrame]:
         """
-        添加汇总表到Excel工作簿
+        计算每日汇总
+        
+        均值与总和在同一次分组聚合中计算，主要天气复用该分组的编号用 bincount 计算，
+        不再为每个求和列重复分组
         
         Args:
-            workbook: Excel工作簿对象
-            df: 数据DataFrame
-        """
-        try:
-            # 按照用户需求，取消整体数据汇总，仅保留每日汇总
-            if '日期' in df.columns:
-                self._add_daily_summary_sheet(workbook, df)
-            
-            logger.debug("添加每日汇总表成功")
-            
-        except Exception as e:
-            logger.error(f"添加汇总表失败: {e}")
+            df: 已格式化的数据
             
-    def _add_daily_summary_sheet(self, workbook: Workbook, df: pd.DataFrame):
-        """添加每日汇总表"""
+        Returns:
+            每日汇总DataFrame，失败时返回None
+        """
         try:
-            ws_daily = workbook.create_sheet('每日汇总')
-            
             # 基础分组字段
             group_cols = ['日期']
             if '城市' in df.columns:
                 group_cols.append('城市')
             
-            # 数值列（排除日期和城市）
+            # 数值列一次聚合：降水、辐射和蒸发量为总和，其余为均值
             numeric_cols = df.select_dtypes(include=['float64', 'int64']).columns.tolist()
+            grouper = df.groupby(group_cols, sort=True)
+            daily_df = grouper.agg({
+                col: 'sum' if col in DAILY_SUM_COLUMNS else 'mean' for col in numeric_cols
+            }) if numeric_cols else grouper.size().to_frame()[[]]
+            daily_df = daily_df.reset_index()
             
-            # 按日基础汇总（均值）
-            daily_df = df.groupby(group_cols)[numeric_cols].mean().reset_index()
-            
-            # 特殊处理：降水量、辐射和蒸发量应该是总和
-            sum_cols = [
-                '降水量(mm)', '降雨量(mm)', '蒸发蒸腾量(mm)',
-                '短波辐射(W/m²)', '直接辐射(W/m²)', '散射辐射(W/m²)', 
-                '直接法向辐照度(W/m²)'
-            ]
-            for col in sum_cols:
-                if col in daily_df.columns:
-                    daily_sum = df.groupby(group_cols)[col].sum().reset_index()
-                    daily_df[col] = daily_sum[col]
-
-            # 增强功能：增加计算项 (主要天气, 日辐照量, 日平均风速)
-            
-            # 1. 主要天气 (取当日常见天气)
+            # 主要天气 (取当日常见天气)，复用同一分组的编号
             if '天气代码' in df.columns:
-                def get_mode_weather(x):
-                    modes = x.mode()
-                    return modes.iloc[0] if not modes.empty else None
-                
-                weather_mode = df.groupby(group_cols)['天气代码'].agg(get_mode_weather).reset_index()
-                daily_df['主要天气'] = weather_mode['天气代码']
+                groups = grouper.ngroup().to_numpy()
+                daily_df['主要天气'] = self._daily_main_weather(df['天气代码'], groups, len(daily_df))
             
-            # 2. 日辐照量 (MJ/m²) = Sum(W/m²) * 3600 / 1,000,000
-            if '短波辐射(W/m²)' in df.columns:
+            # 日辐照量 (MJ/m²) = Sum(W/m²) * 3600 / 1,000,000
+            if '短波辐射(W/m²)' in daily_df.columns:
                 daily_df['日辐照量(MJ/m²)'] = (daily_df['短波辐射(W/m²)'] * 0.0036).round(2)
                 
-            # 3. 日平均风速 (m/s) = mean(km/h) / 3.6
-            if '10米风速(km/h)' in df.columns:
-                # 注意：此时 daily_df['10米风速(km/h)'] 已经是均值了
+            # 日平均风速 (m/s) = mean(km/h) / 3.6
+            if '10米风速(km/h)' in daily_df.columns:
                 daily_df['日平均风速(m/s)'] = (daily_df['10米风速(km/h)'] / 3.6).round(2)
             
             # 调整列顺序，将重要字段提前
             cols = daily_df.columns.tolist()
             priority_cols = ['日期', '城市', '主要天气', '日辐照量(MJ/m²)', '日平均风速(m/s)']
             new_order = [c for c in priority_cols if c in cols] + [c for c in cols if c not in priority_cols]
-            daily_df = daily_df[new_order]
-            
-            # 写入数据
-            for r in dataframe_to_rows(daily_df, index=False, header=True):
-                ws_daily.append(r)
-                
-            # 设置样式
-            header_fill = PatternFill(start_color='70AD47', end_color='70AD47', fill_type='solid')
-            header_font = Font(color='FFFFFF', bold=True)
-            for cell in ws_daily[1]:
-                cell.fill = header_fill
-                cell.font = header_font
-                cell.alignment = Alignment(horizontal='center', vertical='center')
-                
-            # 自动列宽
-            for column in ws_daily.columns:
-                ws_daily.column_dimensions[column[0].column_letter].width = 15
+            return daily_df[new_order]
 
         except Exception as e:
-            logger.error(f"添加每日汇总表失败: {e}")
+            logger.error(f"计算每日汇总失败: {e}")
+            return None
+
+
+class _PagedSheet:
+    """
+    只写工作表的分页写入
+    数据行达到 EXCEL_MAX_ROWS 上限时续写到新工作表（名称追加序号，如 天气数据2）
+    """
+    
+    def __init__(self, workbook: Workbook, title: str, columns: List[str], widths: Dict[str, float], header_color: str):
+        self.workbook = workbook
+        self.title = title
+        self.columns = columns
+        self.widths = widths
+        self.header_color = header_color
+        self.max_rows = EXCEL_MAX_ROWS - 1  # 扣除表头
+        self.sheets = 0
+        self.rows = 0
+        self.ws = self._next_sheet()
+    
+    def _next_sheet(self):
+        self.sheets += 1
+        self.rows = 0
+        title = self.title if self.sheets == 1 else f"{self.title}{self.sheets}"
+        return DataExporter._create_sheet(self.workbook, title, self.columns, self.widths, self.header_color)
+    
+    def append(self, df: pd.DataFrame):
+        offset = 0
+        while offset < len(df):
+            if self.rows >= self.max_rows:
+                self.ws = self._next_sheet()
+            part = df.iloc[offset:offset + self.max_rows - self.rows]
+            DataExporter._append_rows(self.ws, part)
+            self.rows += len(part)
+            offset += len(part)
@@ -0,0 +1,247 @@
+"""
+数据导入服务
+负责将 CSV、Parquet、Arrow IPC 文件分块读取、映射列名后批量写入 weather_data
+遵循单一职责原则
+"""
+import logging
+from typing import Dict, Any, IO, Union, Optional, Iterator, List, Callable
+
+import numpy as np
+import pandas as pd
+
+from backend.config import IMPORT_BATCH_ROWS, TIMEZONE
+from backend.models.database import DatabaseManager
+from backend.services.columnar_format import COLUMNAR_FORMATS, iter_batches, require_pyarrow
+from backend.services.data_exporter import COLUMN_NAMES
+
+logger = logging.getLogger(__name__)
+
+# 支持导入的文件格式
+IMPORT_FORMATS = ('csv',) + tuple(COLUMNAR_FORMATS)
+
+# 导出文件的中文表头 -> 标准列名，使导出的CSV可以直接导回
+COLUMN_ALIASES = {name: column for column, name in COLUMN_NAMES.items()}
+
+# 天气代码列可能是 "61 (小雨)" 形式的标签，取开头的数字
+LEADING_NUMBER = r'^\s*([-+]?\d+(?:\.\d+)?)'
+
+
+class DataImporter:
+    """
+    数据导入器类
+    逐块读取文件并在单个事务中写入数据库，内存占用与文件大小无关
+    """
+
+    def __init__(self, db_manager: DatabaseManager):
+        """
+        初始化数据导入器
+
+        Args:
+            db_manager: 数据库管理器实例
+        """
+        self.db_manager = db_manager
+        logger.info("数据导入器初始化完成")
+
+    def import_file(
+        self,
+        source: Union[str, IO[bytes]],
+        file_format: str,
+        column_map: Optional[Dict[str, str]] = None,
+        city_id: Optional[int] = None,
+        batch_size: int = IMPORT_BATCH_ROWS,
+        defer_indexes: bool = False,
+        progress: Optional[Callable[[int], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        导入 CSV、Parquet 或 Arrow IPC 文件
+
+        列名先按 column_map 重命名，再识别导出文件的中文表头；时间取 datetime 列，
+        或 date 与 time 两列拼接；城市取 city_id 列、city（城市名称）列，
+        文件中都没有时使用参数 city_id。数值列按名称匹配 weather_data 字段，未知列被忽略，
+        时间或城市为空的行被跳过。整个文件在一个事务中写入，失败时不留下部分数据；
+        已存在的 (city_id, datetime) 记录只更新文件中包含的字段
+
+        Args:
+            source: 文件路径或二进制文件对象
+            file_format: csv、parquet 或 arrow
+            column_map: 文件列名 -> weather_data 列名
+            city_id: 文件中没有城市列时所有行使用的城市ID
+            batch_size: 每批读取并写入的行数
+            defer_indexes: 是否在写入期间删除 (city_id, datetime) 查询索引并在结束后重建
+            progress: 每批写入后的回调，参数为累计写入行数
+
+        Returns:
+            {'rows': 写入行数, 'skipped': 跳过行数, 'cities': 涉及的城市ID列表, 'fields': 导入的字段}
+        """
+        if file_format not in IMPORT_FORMATS:
+            raise ValueError(f"不支持的导入格式: {file_format}")
+        if file_format in COLUMNAR_FORMATS:
+            require_pyarrow()
+
+        city_ids = {
+            row['city_name']: row['id']
+            for row in self.db_manager.execute_query("SELECT id, city_name FROM city_config")
+        }
+        if city_id is not None and city_id not in city_ids.values():
+            raise ValueError(f"未知的城市: {city_id}")
+        state = {'fields': None, 'skipped': 0, 'cities': set()}
+
+        def row_batches() -> Iterator[List[tuple]]:
+            for frame in self._iter_frames(source, file_format, batch_size):
+                columns = self._frame_to_columns(frame, column_map, city_id, city_ids)
+                fields = [f for f in columns if f not in ('city_id', 'datetime')]
+                if state['fields'] is None:
+                    state['fields'] = fields
+                elif fields != state['fields']:
+                    raise ValueError("导入文件各批次的列不一致")
+
+                state['skipped'] += len(frame) - len(columns['datetime'])
+                state['cities'].update(np.unique(columns['city_id']).tolist())
+                yield self._to_rows(columns, fields)
+
+        batches = row_batches()
+        first = next(batches, None)
+        if first is None:
+            logger.info(f"导入{file_format}完成: 文件中没有数据")
+            return {'rows': 0, 'skipped': state['skipped'], 'cities': [], 'fields': state['fields'] or []}
+
+        def all_batches() -> Iterator[List[tuple]]:
+            yield first
+            yield from batches
+
+        total = self.db_manager.bulk_upsert_weather_rows(
+            ['city_id', 'datetime'] + state['fields'], all_batches(),
+            defer_indexes=defer_indexes, progress=progress
+        )
+
+        cities = sorted(state['cities'])
+        logger.info(f"导入{file_format}完成: {total} 条记录, 跳过 {state['skipped']} 行, 城市: {cities}")
+        return {'rows': total, 'skipped': state['skipped'], 'cities': cities, 'fields': state['fields']}
+
+    def import_columnar(
+        self,
+        source: Union[str, IO[bytes]],
+        file_format: str,
+        batch_size: int = IMPORT_BATCH_ROWS
+    ) -> Dict[str, Any]:
+        """
+        导入 Parquet 或 Arrow IPC 文件（列结构与 DataExporter.write_columnar 一致）
+
+        Args:
+            source: 文件路径或二进制文件对象
+            file_format: parquet 或 arrow
+            batch_size: 每批的最大行数
+
+        Returns:
+            同 import_file
+        """
+        if file_format not in COLUMNAR_FORMATS:
+            raise ValueError(f"不支持的导入格式: {file_format}")
+        return self.import_file(source, file_format, batch_size=batch_size)
+
+    @staticmethod
+    def _iter_frames(source: Union[str, IO[bytes]], file_format: str, batch_size: int) -> Iterator[pd.DataFrame]:
+        """逐块读取文件为 DataFrame"""
+        if file_format == 'csv':
+            yield from pd.read_csv(source, chunksize=batch_size, encoding='utf-8-sig', skipinitialspace=True)
+            return
+
+        for batch in iter_batches(source, file_format, batch_size):
+            frame = batch.to_pandas()
+            # float32 按最短十进制表示还原（如 20.1 而不是 20.100000381）
+            for column in frame.columns:
+                if frame[column].dtype == np.float32:
+                    frame[column] = frame[column].to_numpy().astype(str).astype(np.float64)
+            yield frame
+
+    def _frame_to_columns(
+        self,
+        frame: pd.DataFrame,
+        column_map: Optional[Dict[str, str]],
+        city_id: Optional[int],
+        city_ids: Dict[str, int]
+    ) -> Dict[str, np.ndarray]:
+        """
+        将一块数据映射为 weather_data 的列
+
+        Args:
+            frame: 原始数据块
+            column_map: 文件列名 -> weather_data 列名
+            city_id: 文件中没有城市列时使用的城市ID
+            city_ids: {城市名称: 城市ID}
+
+        Returns:
+            {'city_id': int64数组, 'datetime': YYYY-MM-DDTHH:MM 字符串数组, 字段: float64数组}
+        """
+        if column_map:
+            frame = frame.rename(columns=column_map)
+        frame = frame.rename(columns={c: COLUMN_ALIASES[c] for c in frame.columns if c in COLUMN_ALIASES})
+        frame = frame.loc[:, ~frame.columns.duplicated()]
+
+        # 时间
+        if 'datetime' in frame.columns:
+            times = frame['datetime']
+        elif 'date' in frame.columns and 'time' in frame.columns:
+            times = frame['date'].astype('string') + 'T' + frame['time'].astype('string')
+        else:
+            raise ValueError("导入文件缺少 datetime 列（或 date 与 time 列）")
+        times = self._parse_datetimes(times)
+
+        # 城市
+        if 'city_id' in frame.columns:
+            cities = pd.to_numeric(frame['city_id'], errors='coerce')
+            unknown = sorted(set(cities.dropna()) - set(city_ids.values()))
+            if unknown:
+                raise ValueError(f"未知的城市: {', '.join(f'{c:g}' for c in unknown[:10])}")
+        elif 'city' in frame.columns:
+            names = frame['city'].astype('string').str.strip()
+            unknown = sorted(set(names.dropna()) - set(city_ids))
+            if unknown:
+                raise ValueError(f"未知的城市: {', '.join(unknown[:10])}")
+            cities = names.map(city_ids).astype('float64')
+        elif city_id is not None:
+            cities = pd.Series(float(city_id), index=frame.index)
+        else:
+            raise ValueError("导入文件缺少 city_id 或城市名称列，且未指定城市")
+
+        keep = times.notna().to_numpy() & cities.notna().to_numpy()
+        fields = self.db_manager.valid_weather_fields(list(frame.columns))
+        if not fields:
+            raise ValueError("导入文件中没有可识别的天气数据字段")
+
+        columns = {
+            'city_id': cities.to_numpy(dtype=np.float64)[keep].astype(np.int64),
+            'datetime': times.to_numpy(dtype='datetime64[ns]')[keep].astype('datetime64[m]').astype(str),
+        }
+        for field in fields:
+            values = frame[field]
+            if values.dtype == object or pd.api.types.is_string_dtype(values):
+                values = values.astype('string').str.extract(LEADING_NUMBER, expand=False)
+            columns[field] = pd.to_numeric(values, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)[keep]
+        return columns
+
+    @staticmethod
+    def _parse_datetimes(values: pd.Series) -> pd.Series:
+        """解析时间列；带时区的时间转换为本地时间（TIMEZONE）"""
+        if not pd.api.types.is_datetime64_any_dtype(values):
+            # 依次尝试：ISO 8601、不同时区偏移的 ISO 8601、其他常见格式
+            attempts = ({'format': 'ISO8601'}, {'format': 'ISO8601', 'utc': True}, {'format': 'mixed'})
+            for i, options in enumerate(attempts):
+                try:
+                    values = pd.to_datetime(values, **options)
+                    break
+                except (ValueError, TypeError) as e:
+                    if i == len(attempts) - 1:
+                        raise ValueError(f"无法解析时间列: {e}")
+        if getattr(values.dt, 'tz', None) is not None:
+            values = values.dt.tz_convert(TIMEZONE).dt.tz_localize(None)
+        return values
+
+    @staticmethod
+    def _to_rows(columns: Dict[str, np.ndarray], fields: List[str]) -> List[tuple]:
+        """将列转换为写入用的元组行（NaN 写为 NULL）"""
+        values = []
+        for field in fields:
+            nulls = np.isnan(columns[field])
+            values.append(np.where(nulls, None, columns[field]).tolist() if nulls.any() else columns[field].tolist())
+        return list(zip(columns['city_id'].tolist(), columns['datetime'].tolist(), *values))
@@ -0,0 +1,315 @@
+"""
+新能源资源分析服务
+基于列式小时数据向量化计算太阳能辐照量、峰值日照时数、风功率密度与容量系数
+遵循单一职责原则
+"""
+import logging
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+
+import numpy as np
+
+from backend.services.anomaly_detector import parse_hours
+
+logger = logging.getLogger(__name__)
+
+# 统计周期
+ENERGY_PERIODS = ('day', 'month')
+
+KMH_TO_MS = 1 / 3.6  # Open-Meteo 风速单位为 km/h
+WH_TO_MJ = 0.0036
+STANDARD_IRRADIANCE = 1000.0  # W/m²，峰值日照时数与组件额定功率的参考辐照度
+STANDARD_AIR_DENSITY = 1.225  # kg/m³，缺少气温/气压时使用
+DRY_AIR_GAS_CONSTANT = 287.05  # J/(kg·K)
+
+# 默认风机功率曲线（通用 2MW 级机组，风速 m/s -> 功率 kW）
+DEFAULT_POWER_CURVE = {
+    'speeds': [0, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 25, 25.01],
+    'power_kw': [0, 0, 66, 154, 282, 460, 696, 996, 1341, 1661, 2000, 2000, 0],
+}
+
+# 默认光伏组件参数（按每 kWp 计算）
+DEFAULT_PANEL = {
+    'performance_ratio': 0.8,  # 系统效率
+    'temp_coefficient': -0.004,  # 功率温度系数 /°C
+    'noct': 45.0,  # 标称工作温度 °C
+}
+
+# 可用于风能分析的风速字段（轮毂高度）
+WIND_SPEED_FIELDS = ('wind_speed_10m', 'wind_speed_80m', 'wind_speed_100m', 'wind_speed_120m', 'wind_speed_180m')
+
+SOLAR_FIELDS = ['shortwave_radiation', 'direct_normal_irradiance', 'diffuse_radiation', 'temperature_2m']
+
+
+def period_keys(datetimes: Sequence[str], period: str) -> Tuple[np.ndarray, List[str]]:
+    """
+    计算每个时刻所属的统计周期
+
+    Args:
+        datetimes: ISO 时间字符串序列
+        period: day 或 month
+
+    Returns:
+        (周期编号数组, 周期标签列表)
+    """
+    if period not in ENERGY_PERIODS:
+        raise ValueError(f"不支持的统计周期: {period}")
+
+    unit = 'D' if period == 'day' else 'M'
+    stamps = parse_hours(datetimes).astype(f'datetime64[{unit}]')
+    labels, keys = np.unique(stamps, return_inverse=True)
+    return keys, [str(label) for label in labels]
+
+
+def period_sums(values: np.ndarray, keys: np.ndarray, n_periods: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    按周期求和（忽略NaN）
+
+    Returns:
+        (各周期之和, 各周期有效值数量)
+    """
+    valid = ~np.isnan(values)
+    sums = np.bincount(keys[valid], weights=values[valid], minlength=n_periods)
+    counts = np.bincount(keys[valid], minlength=n_periods)
+    return sums, counts
+
+
+def air_density(pressure_hpa: Optional[np.ndarray], temperature_c: Optional[np.ndarray], n: int) -> np.ndarray:
+    """
+    由地面气压和气温计算空气密度，缺失处使用标准空气密度
+
+    Args:
+        pressure_hpa: 地面气压 (hPa)
+        temperature_c: 气温 (°C)
+        n: 数据长度
+
+    Returns:
+        空气密度数组 (kg/m³)
+    """
+    if pressure_hpa is None or temperature_c is None:
+        return np.full(n, STANDARD_AIR_DENSITY)
+    with np.errstate(invalid='ignore'):
+        density = pressure_hpa * 100 / (DRY_AIR_GAS_CONSTANT * (temperature_c + 273.15))
+    return np.where(np.isnan(density), STANDARD_AIR_DENSITY, density)
+
+
+def wind_power_density(speed_ms: np.ndarray, density: np.ndarray) -> np.ndarray:
+    """风功率密度 0.5·ρ·v³ (W/m²)"""
+    return 0.5 * density * speed_ms ** 3
+
+
+def turbine_power(speed_ms: np.ndarray, curve: Dict[str, List[float]]) -> np.ndarray:
+    """
+    按功率曲线插值计算风机出力
+
+    Args:
+        speed_ms: 轮毂高度风速 (m/s)
+        curve: {'speeds': [...], 'power_kw': [...]}，风速须升序
+
+    Returns:
+        出力数组 (kW)，超出曲线最大风速处为0
+    """
+    speeds = np.asarray(curve['speeds'], dtype=np.float64)
+    power = np.asarray(curve['power_kw'], dtype=np.float64)
+    output = np.interp(speed_ms, speeds, power, left=0.0, right=0.0)
+    return np.where(np.isnan(speed_ms), np.nan, output)
+
+
+def pv_power(ghi: np.ndarray, temperature_c: Optional[np.ndarray], panel: Dict[str, float]) -> np.ndarray:
+    """
+    估算每 kWp 光伏出力
+
+    P = (GHI / 1000) · PR · (1 + γ·(T电池 - 25))，T电池 = T气温 + (NOCT - 20) / 800 · GHI
+
+    Args:
+        ghi: 水平面总辐照度 (W/m²)
+        temperature_c: 气温 (°C)，缺失时不做温度修正
+        panel: 组件参数
+
+    Returns:
+        出力数组 (kW/kWp)
+    """
+    output = ghi / STANDARD_IRRADIANCE * panel['performance_ratio']
+    if temperature_c is not None:
+        cell_temperature = temperature_c + (panel['noct'] - 20) / 800 * ghi
+        correction = 1 + panel['temp_coefficient'] * (cell_temperature - 25)
+        output = np.where(np.isnan(correction), output, output * correction)
+    return np.maximum(output, 0.0)
+
+
+def _column(columns: Dict[str, Sequence[Any]], field: str) -> Optional[np.ndarray]:
+    """取出字段为 float64 数组，字段不存在或全部为空时返回None"""
+    if field not in columns:
+        return None
+    values = np.asarray(columns[field], dtype=np.float64)
+    return None if np.isnan(values).all() else values
+
+
+def _round(values: np.ndarray, digits: int = 3) -> List[Optional[float]]:
+    """保留小数并将NaN转为None"""
+    return [None if np.isnan(v) else v for v in np.round(values, digits).tolist()]
+
+
+def solar_resource(
+    columns: Dict[str, Sequence[Any]],
+    period: str = 'day',
+    panel: Optional[Dict[str, float]] = None
+) -> Dict[str, Any]:
+    """
+    太阳能资源分析
+
+    Args:
+        columns: 列式小时数据，需包含 datetime 与 shortwave_radiation，
+                 可选 direct_normal_irradiance、diffuse_radiation、temperature_2m
+        period: 统计周期 day 或 month
+        panel: 光伏组件参数，None 使用 DEFAULT_PANEL
+
+    Returns:
+        {'periods': [...], 'series': {指标: [...]}, 'summary': {...}}
+    """
+    panel = {**DEFAULT_PANEL, **(panel or {})}
+    ghi = _column(columns, 'shortwave_radiation')
+    if ghi is None or not len(columns['datetime']):
+        return {'periods': [], 'series': {}, 'summary': {}}
+
+    keys, labels = period_keys(columns['datetime'], period)
+    n_periods = len(labels)
+    temperature = _column(columns, 'temperature_2m')
+
+    # 小时平均辐照度 (W/m²) 累加即为 Wh/m²
+    ghi_wh, hours = period_sums(ghi, keys, n_periods)
+    days = np.bincount(keys, minlength=n_periods) / 24 if period == 'month' else np.ones(n_periods)
+    pv_kwh, _ = period_sums(pv_power(ghi, temperature, panel), keys, n_periods)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        series = {
+            'irradiation_kwh_m2': ghi_wh / 1000,
+            'irradiation_mj_m2': ghi_wh * WH_TO_MJ,
+            'peak_sun_hours': ghi_wh / STANDARD_IRRADIANCE / days,
+            'pv_yield_kwh_per_kwp': pv_kwh,
+            'pv_capacity_factor': pv_kwh / np.where(hours > 0, hours, np.nan),
+        }
+    for field, name in (('direct_normal_irradiance', 'dni_kwh_m2'), ('diffuse_radiation', 'diffuse_kwh_m2')):
+        values = _column(columns, field)
+        if values is not None:
+            series[name] = period_sums(values, keys, n_periods)[0] / 1000
+
+    total_hours = int(hours.sum())
+    total_days = total_hours / 24
+    summary = {
+        'hours': total_hours,
+        'irradiation_kwh_m2': round(float(ghi_wh.sum()) / 1000, 3),
+        'irradiation_mj_m2': round(float(ghi_wh.sum()) * WH_TO_MJ, 3),
+        'avg_peak_sun_hours': round(float(ghi_wh.sum()) / STANDARD_IRRADIANCE / total_days, 3) if total_days else None,
+        'pv_yield_kwh_per_kwp': round(float(pv_kwh.sum()), 3),
+        'pv_capacity_factor': round(float(pv_kwh.sum()) / total_hours, 4) if total_hours else None,
+    }
+
+    return {
+        'periods': labels,
+        'series': {name: _round(values) for name, values in series.items()},
+        'summary': summary
+    }
+
+
+def wind_resource(
+    columns: Dict[str, Sequence[Any]],
+    period: str = 'day',
+    speed_field: str = 'wind_speed_100m',
+    power_curve: Optional[Dict[str, List[float]]] = None
+) -> Dict[str, Any]:
+    """
+    风能资源分析
+
+    Args:
+        columns: 列式小时数据，需包含 datetime 与风速字段，
+                 可选 surface_pressure、temperature_2m 用于空气密度修正
+        period: 统计周期 day 或 month
+        speed_field: 轮毂高度风速字段
+        power_curve: 风机功率曲线，None 使用 DEFAULT_POWER_CURVE
+
+    Returns:
+        {'periods': [...], 'series': {指标: [...]}, 'summary': {...}}
+    """
+    curve = power_curve or DEFAULT_POWER_CURVE
+    speed_kmh = _column(columns, speed_field)
+    if speed_kmh is None or not len(columns['datetime']):
+        return {'periods': [], 'series': {}, 'summary': {}}
+
+    keys, labels = period_keys(columns['datetime'], period)
+    n_periods = len(labels)
+    speed = speed_kmh * KMH_TO_MS
+    density = air_density(_column(columns, 'surface_pressure'), _column(columns, 'temperature_2m'), len(speed))
+    rated_kw = float(max(curve['power_kw']))
+
+    speed_sum, hours = period_sums(speed, keys, n_periods)
+    density_sum, _ = period_sums(wind_power_density(speed, density), keys, n_periods)
+    energy_kwh, _ = period_sums(turbine_power(speed, curve), keys, n_periods)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        valid_hours = np.where(hours > 0, hours, np.nan)
+        series = {
+            'mean_speed_ms': speed_sum / valid_hours,
+            'power_density_w_m2': density_sum / valid_hours,
+            'energy_mwh': energy_kwh / 1000,
+            'capacity_factor': energy_kwh / (rated_kw * valid_hours),
+        }
+
+    total_hours = int(hours.sum())
+    summary = {
+        'hours': total_hours,
+        'speed_field': speed_field,
+        'rated_kw': rated_kw,
+        'mean_speed_ms': round(float(speed_sum.sum()) / total_hours, 3) if total_hours else None,
+        'power_density_w_m2': round(float(density_sum.sum()) / total_hours, 3) if total_hours else None,
+        'energy_mwh': round(float(energy_kwh.sum()) / 1000, 3),
+        'capacity_factor': round(float(energy_kwh.sum()) / (rated_kw * total_hours), 4) if total_hours else None,
+    }
+
+    return {
+        'periods': labels,
+        'series': {name: _round(values) for name, values in series.items()},
+        'summary': summary
+    }
+
+
+def validate_power_curve(curve: Any) -> Optional[str]:
+    """
+    校验自定义功率曲线
+
+    Returns:
+        错误信息，合法时返回None
+    """
+    if not isinstance(curve, dict):
+        return 'power_curve 须为 {"speeds": [...], "power_kw": [...]}'
+    speeds, power = curve.get('speeds'), curve.get('power_kw')
+    if not isinstance(speeds, list) or not isinstance(power, list) or len(speeds) != len(power) or len(speeds) < 2:
+        return 'power_curve 的 speeds 与 power_kw 须为等长列表（至少2个点）'
+    if not all(isinstance(v, (int, float)) for v in speeds + power):
+        return 'power_curve 的值须为数字'
+    if any(b < a for a, b in zip(speeds, speeds[1:])) or max(power) <= 0:
+        return 'power_curve 的风速须升序且额定功率须为正'
+    return None
+
+
+def screen_site(
+    columns: Dict[str, Sequence[Any]],
+    speed_field: str = 'wind_speed_100m',
+    power_curve: Optional[Dict[str, List[float]]] = None,
+    panel: Optional[Dict[str, float]] = None
+) -> Dict[str, Any]:
+    """
+    站点选址初筛：汇总整段时间的太阳能与风能资源指标
+
+    Args:
+        columns: 列式小时数据（字段见 SOLAR_FIELDS、surface_pressure 与风速字段）
+        speed_field: 轮毂高度风速字段
+        power_curve: 风机功率曲线
+        panel: 光伏组件参数
+
+    Returns:
+        {'solar': 太阳能汇总, 'wind': 风能汇总}
+    """
+    return {
+        'solar': solar_resource(columns, 'month', panel)['summary'],
+        'wind': wind_resource(columns, 'month', speed_field, power_curve)['summary'],
+    }
@@ -0,0 +1,156 @@
+"""
+导出文件缓存
+以导出参数和所涉数据版本的哈希为键保存生成的导出文件，数据未变化时直接复用
+遵循单一职责原则
+"""
+import os
+import json
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+from typing import Dict, Any, Optional, IO
+
+logger = logging.getLogger(__name__)
+
+# 缓存文件格式版本，导出文件的内容或格式发生变化时递增，使旧缓存失效
+CACHE_FORMAT_VERSION = 1
+
+
+class ExportCache:
+    """
+    导出文件缓存类
+    键由导出参数与数据版本计算，数据写入或删除后版本变化，旧文件不再命中，
+    按最近使用时间淘汰以控制目录总大小
+    """
+
+    def __init__(self, cache_dir: str, max_size: int):
+        """
+        初始化导出文件缓存
+
+        Args:
+            cache_dir: 缓存目录
+            max_size: 缓存目录的最大字节数
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        logger.info(f"导出缓存初始化完成: {cache_dir}")
+
+    @staticmethod
+    def make_key(params: Dict[str, Any]) -> str:
+        """
+        计算缓存键
+
+        Args:
+            params: 导出参数与数据版本（须可JSON序列化）
+
+        Returns:
+            十六进制哈希
+        """
+        payload = json.dumps(
+            {'format_version': CACHE_FORMAT_VERSION, **params},
+            sort_keys=True, ensure_ascii=False, default=str
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str, extension: str) -> str:
+        """缓存文件路径"""
+        return os.path.join(self.cache_dir, key + extension)
+
+    def get(self, key: str, extension: str) -> Optional[IO[bytes]]:
+        """
+        查找缓存文件，命中时更新其访问时间
+
+        返回已打开的文件对象而不是路径：之后并发的淘汰删除该文件时，
+        已打开的文件仍可完整读取
+
+        Args:
+            key: 缓存键
+            extension: 文件扩展名
+
+        Returns:
+            以二进制只读方式打开的缓存文件（由调用方关闭），未命中时返回None
+        """
+        path = self._path(key, extension)
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        logger.info(f"导出缓存命中: {key[:12]}{extension}")
+        return f
+
+    def put(self, key: str, extension: str, source: IO[bytes]) -> str:
+        """
+        保存导出文件到缓存（写入临时文件后原子重命名）
+
+        Args:
+            key: 缓存键
+            extension: 文件扩展名
+            source: 定位在开头的导出文件对象（不会被关闭）
+
+        Returns:
+            缓存文件路径
+        """
+        path = self._path(key, extension)
+        with tempfile.NamedTemporaryFile(dir=self.cache_dir, suffix='.part', delete=False) as f:
+            try:
+                shutil.copyfileobj(source, f)
+            except Exception:
+                f.close()
+                os.remove(f.name)
+                raise
+        os.replace(f.name, path)
+        logger.info(f"导出缓存写入: {key[:12]}{extension}")
+
+        self.evict(keep=path)
+        return path
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        """
+        按最近使用时间淘汰缓存文件，直到总大小不超过上限
+
+        Args:
+            keep: 不淘汰的文件路径（刚写入的文件）
+
+        Returns:
+            删除的文件数
+        """
+        with self.lock:
+            entries = []
+            for entry in os.scandir(self.cache_dir):
+                if entry.is_file() and not entry.name.endswith('.part'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+            total = sum(size for _, size, _ in entries)
+            removed = 0
+            for _, size, path in sorted(entries):
+                if total <= self.max_size:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    logger.warning(f"删除导出缓存失败: {path}, {e}")
+                    continue
+                total -= size
+                removed += 1
+
+        if removed:
+            logger.info(f"导出缓存淘汰 {removed} 个文件")
+        return removed
+
+    def clear(self):
+        """清空缓存目录"""
+        with self.lock:
+            for entry in os.scandir(self.cache_dir):
+                if entry.is_file():
+                    os.remove(entry.path)
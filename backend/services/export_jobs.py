@@ -0,0 +1,243 @@
+"""
+异步导出任务
+在后台线程中生成导出文件并保存到导出目录，供客户端轮询进度后下载
+遵循单一职责原则
+"""
+import os
+import re
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, Callable, Iterable, IO, Union
+
+logger = logging.getLogger(__name__)
+
+# 任务状态
+JOB_PENDING = 'pending'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+JOB_CANCELLED = 'cancelled'
+
+# 写入导出文件时每次复制的字节数
+COPY_BUFFER_SIZE = 1024 * 1024
+
+# 结果文件名：任务ID（uuid4 十六进制），写入中的文件带 .part 后缀
+JOB_FILE_PATTERN = re.compile(r'^[0-9a-f]{32}(\.part)?$')
+
+# 生成函数: (进度回调) -> 文件对象或字节块迭代器；进度回调参数为 (已完成数, 总数)
+ExportProducer = Callable[[Callable[[int, int], None]], Union[IO[bytes], Iterable[bytes]]]
+
+
+class ExportCancelled(Exception):
+    """任务已被取消"""
+
+
+class ExportJobManager:
+    """
+    导出任务管理器
+    任务状态保存在内存中，结果文件保存在导出目录，过期后删除
+    """
+
+    def __init__(self, export_dir: str, max_workers: int = 2, expire_hours: float = 24):
+        """
+        初始化导出任务管理器
+
+        服务重启后内存中的任务记录丢失，启动时删除导出目录中超过保留时长的遗留结果文件；
+        只处理按任务ID命名的文件，目录中的其他文件保持不变
+
+        Args:
+            export_dir: 导出文件目录
+            max_workers: 同时执行的导出任务数
+            expire_hours: 结果文件保留时长（小时）
+        """
+        self.export_dir = export_dir
+        self.expire_seconds = expire_hours * 3600
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='export')
+
+        os.makedirs(export_dir, exist_ok=True)
+        deadline = time.time() - self.expire_seconds
+        for name in os.listdir(export_dir):
+            path = os.path.join(export_dir, name)
+            try:
+                stale = JOB_FILE_PATTERN.match(name) and os.path.getmtime(path) < deadline
+            except OSError:
+                continue
+            if stale:
+                self._remove_file(path)
+        logger.info(f"导出任务管理器初始化完成: {export_dir}")
+
+    def submit(self, producer: ExportProducer, download_name: str, mimetype: str) -> Dict[str, Any]:
+        """
+        提交导出任务
+
+        Args:
+            producer: 生成函数，返回的文件对象或字节块会被写入结果文件
+            download_name: 下载文件名
+            mimetype: 文件MIME类型
+
+        Returns:
+            任务信息
+        """
+        self.cleanup_expired()
+
+        job_id = uuid.uuid4().hex
+        job = {
+            'job_id': job_id,
+            'status': JOB_PENDING,
+            'progress': 0.0,
+            'download_name': download_name,
+            'mimetype': mimetype,
+            'size': None,
+            'error': None,
+            'created_at': time.time(),
+            'finished_at': None,
+            'cancel_requested': False,
+            'path': os.path.join(self.export_dir, job_id),
+        }
+        with self.lock:
+            self.jobs[job_id] = job
+
+        self.executor.submit(self._run, job, producer)
+        logger.info(f"导出任务已提交: {job_id}, {download_name}")
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        获取任务信息（不含内部字段）
+
+        Args:
+            job_id: 任务ID
+
+        Returns:
+            任务信息，不存在或已过期时返回None
+        """
+        self.cleanup_expired()
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            return {k: v for k, v in job.items() if k not in ('path', 'cancel_requested')}
+
+    def result_path(self, job_id: str) -> Optional[str]:
+        """
+        获取已完成任务的结果文件路径
+
+        Args:
+            job_id: 任务ID
+
+        Returns:
+            文件路径，任务未完成或不存在时返回None
+        """
+        self.cleanup_expired()
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None or job['status'] != JOB_DONE:
+                return None
+            return job['path']
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        取消任务并删除结果文件
+
+        运行中的任务在下一次进度回调时停止
+
+        Args:
+            job_id: 任务ID
+
+        Returns:
+            任务是否存在
+        """
+        with self.lock:
+            job = self.jobs.pop(job_id, None)
+            if job is None:
+                return False
+            job['cancel_requested'] = True
+            if job['status'] in (JOB_PENDING, JOB_RUNNING):
+                job['status'] = JOB_CANCELLED
+
+        self._remove_file(job['path'])
+        logger.info(f"导出任务已删除: {job_id}")
+        return True
+
+    def cleanup_expired(self) -> int:
+        """
+        删除过期任务及其结果文件（提交、查询和下载任务时执行）
+
+        Returns:
+            删除的任务数
+        """
+        deadline = time.time() - self.expire_seconds
+        with self.lock:
+            expired = [
+                job_id for job_id, job in self.jobs.items()
+                if job['finished_at'] is not None and job['finished_at'] < deadline
+            ]
+        for job_id in expired:
+            self.cancel(job_id)
+        return len(expired)
+
+    def shutdown(self):
+        """停止接收新任务并等待运行中的任务结束"""
+        self.executor.shutdown(wait=True)
+
+    def _run(self, job: Dict[str, Any], producer: ExportProducer):
+        """在工作线程中执行任务，先写入 .part 文件，完成后原子重命名"""
+        def progress(done: int, total: int):
+            if job['cancel_requested']:
+                raise ExportCancelled()
+            job['progress'] = round(done / total, 4) if total else 0.0
+
+        part_path = job['path'] + '.part'
+        try:
+            if job['cancel_requested']:
+                raise ExportCancelled()
+            job['status'] = JOB_RUNNING
+
+            result = producer(progress)
+            with open(part_path, 'wb') as f:
+                if hasattr(result, 'read'):
+                    with result:
+                        while True:
+                            block = result.read(COPY_BUFFER_SIZE)
+                            if not block:
+                                break
+                            f.write(block)
+                else:
+                    for block in result:
+                        f.write(block)
+
+            # 取消检查与重命名在锁内完成：cancel 要么先于此处生效而不保留文件，
+            # 要么在重命名之后删除结果文件
+            with self.lock:
+                if job['cancel_requested']:
+                    raise ExportCancelled()
+                os.replace(part_path, job['path'])
+                job.update(
+                    status=JOB_DONE, progress=1.0,
+                    size=os.path.getsize(job['path']), finished_at=time.time()
+                )
+            logger.info(f"导出任务完成: {job['job_id']}, {job['size']} 字节")
+
+        except ExportCancelled:
+            job.update(status=JOB_CANCELLED, finished_at=time.time())
+            logger.info(f"导出任务已取消: {job['job_id']}")
+        except Exception as e:
+            job.update(status=JOB_FAILED, error=str(e), finished_at=time.time())
+            logger.error(f"导出任务失败: {job['job_id']}, {e}")
+        finally:
+            self._remove_file(part_path)
+
+    @staticmethod
+    def _remove_file(path: str):
+        """删除文件，不存在时忽略"""
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"删除导出文件失败: {path}, {e}")
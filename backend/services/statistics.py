@@ -0,0 +1,302 @@
+"""
+可合并的流式统计量
+按块或按天累积统计结果，可存储并与其他分段合并
+遵循单一职责原则
+"""
+import math
+from typing import Dict, Any, Optional, Iterable, List
+
+import numpy as np
+
+
+class RunningStats:
+    """
+    单个数值字段的可合并统计量
+
+    使用 Welford/Chan 算法累积均值与二阶中心矩（M2），
+    分块更新与合并的结果与一次性计算一致，且数值稳定
+    """
+
+    __slots__ = ('count', 'mean', 'm2', 'total', 'minimum', 'maximum', 'positive')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.total = 0.0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+        self.positive = 0
+
+    def update(self, values: Iterable[Optional[float]]) -> 'RunningStats':
+        """
+        累积一块数据，None/NaN 会被忽略
+
+        Args:
+            values: 数值序列
+
+        Returns:
+            自身，便于链式调用
+        """
+        arr = np.asarray(values, dtype=np.float64)
+        arr = arr[~np.isnan(arr)]
+        if len(arr) == 0:
+            return self
+
+        chunk = RunningStats()
+        chunk.count = len(arr)
+        chunk.total = float(arr.sum())
+        chunk.mean = chunk.total / chunk.count
+        chunk.m2 = float(np.square(arr - chunk.mean).sum())
+        chunk.minimum = float(arr.min())
+        chunk.maximum = float(arr.max())
+        chunk.positive = int(np.count_nonzero(arr > 0))
+        return self.merge(chunk)
+
+    def merge(self, other: 'RunningStats') -> 'RunningStats':
+        """
+        合并另一分段的统计量（原地修改）
+
+        Args:
+            other: 另一分段
+
+        Returns:
+            自身
+        """
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            for name in self.__slots__:
+                setattr(self, name, getattr(other, name))
+            return self
+
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.total += other.total
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        self.positive += other.positive
+        return self
+
+    def __add__(self, other: 'RunningStats') -> 'RunningStats':
+        return RunningStats().merge(self).merge(other)
+
+    @property
+    def variance(self) -> Optional[float]:
+        """样本方差（ddof=1），少于两个值时为None"""
+        return self.m2 / (self.count - 1) if self.count > 1 else None
+
+    @property
+    def std(self) -> Optional[float]:
+        """样本标准差（ddof=1），少于两个值时为None"""
+        variance = self.variance
+        return math.sqrt(variance) if variance is not None else None
+
+    @classmethod
+    def from_moments(
+        cls,
+        count: int,
+        total: float,
+        sum_sq: float,
+        minimum: float,
+        maximum: float,
+        positive: int = 0
+    ) -> 'RunningStats':
+        """
+        由数据库聚合的矩（COUNT/SUM/SUM(x*x)/MIN/MAX）构造
+
+        Returns:
+            统计量对象
+        """
+        stats = cls()
+        if not count:
+            return stats
+        stats.count = int(count)
+        stats.total = float(total)
+        stats.mean = stats.total / stats.count
+        stats.m2 = max(float(sum_sq) - stats.total * stats.total / stats.count, 0.0)
+        stats.minimum = float(minimum)
+        stats.maximum = float(maximum)
+        stats.positive = int(positive or 0)
+        return stats
+
+    def to_dict(self) -> Dict[str, Any]:
+        """序列化为可存储的字典"""
+        return {name: getattr(self, name) for name in self.__slots__} if self.count else {'count': 0}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'RunningStats':
+        """由 to_dict 的结果恢复"""
+        stats = cls()
+        if data.get('count'):
+            for name in cls.__slots__:
+                setattr(stats, name, data[name])
+        return stats
+
+
+class CodeHistogram:
+    """
+    分类数值（如天气代码）的可合并频数直方图，用于计算众数
+    """
+
+    __slots__ = ('counts',)
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+
+    def update(self, values: Iterable[Optional[float]]) -> 'CodeHistogram':
+        """
+        累积一块数据，None/NaN 会被忽略
+
+        Args:
+            values: 数值序列
+
+        Returns:
+            自身
+        """
+        arr = np.asarray(values, dtype=np.float64)
+        arr = arr[~np.isnan(arr)].astype(np.int64)
+        if len(arr) == 0:
+            return self
+
+        codes, counts = np.unique(arr, return_counts=True)
+        for code, count in zip(codes.tolist(), counts.tolist()):
+            self.counts[code] = self.counts.get(code, 0) + count
+        return self
+
+    def merge(self, other: 'CodeHistogram') -> 'CodeHistogram':
+        """合并另一分段的直方图（原地修改）"""
+        for code, count in other.counts.items():
+            self.counts[code] = self.counts.get(code, 0) + count
+        return self
+
+    def __add__(self, other: 'CodeHistogram') -> 'CodeHistogram':
+        return CodeHistogram().merge(self).merge(other)
+
+    @property
+    def count(self) -> int:
+        """累计值数量"""
+        return sum(self.counts.values())
+
+    @property
+    def mode(self) -> Optional[int]:
+        """众数（并列时取最小值），无数据时为None"""
+        if not self.counts:
+            return None
+        return min(self.counts, key=lambda code: (-self.counts[code], code))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """序列化为可存储的字典（键为字符串以兼容JSON）"""
+        return {'counts': {str(code): count for code, count in self.counts.items()}}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'CodeHistogram':
+        """由 to_dict 的结果恢复"""
+        histogram = cls()
+        histogram.counts = {int(code): count for code, count in data.get('counts', {}).items()}
+        return histogram
+
+
+class FixedBinHistogram:
+    """
+    固定分箱的可合并直方图，用于近似分位数
+
+    箱边界由 (下界, 箱宽, 箱数) 决定，不同时间段/城市的直方图可直接相加，
+    分位数在箱内线性插值，误差不超过一个箱宽
+    """
+
+    __slots__ = ('lower', 'width', 'counts')
+
+    def __init__(self, lower: float, width: float, n_bins: int):
+        self.lower = lower
+        self.width = width
+        self.counts = np.zeros(n_bins, dtype=np.int64)
+
+    def add_counts(self, bins: Iterable[int], counts: Iterable[int]) -> 'FixedBinHistogram':
+        """
+        按箱号累加计数（同一箱号可重复出现）
+
+        Args:
+            bins: 箱号序列
+            counts: 对应的计数
+
+        Returns:
+            自身
+        """
+        bins = np.asarray(bins, dtype=np.int64)
+        if len(bins):
+            self.counts += np.bincount(
+                bins, weights=np.asarray(counts, dtype=np.float64), minlength=len(self.counts)
+            ).astype(np.int64)
+        return self
+
+    def update(self, values: Iterable[Optional[float]]) -> 'FixedBinHistogram':
+        """
+        累积原始数值，None/NaN 会被忽略，超出范围的值计入首/末箱
+
+        Args:
+            values: 数值序列
+
+        Returns:
+            自身
+        """
+        arr = np.asarray(values, dtype=np.float64)
+        arr = arr[~np.isnan(arr)]
+        bins = np.clip(((arr - self.lower) / self.width).astype(np.int64), 0, len(self.counts) - 1)
+        self.counts += np.bincount(bins, minlength=len(self.counts))
+        return self
+
+    def merge(self, other: 'FixedBinHistogram') -> 'FixedBinHistogram':
+        """合并分箱相同的另一直方图（原地修改）"""
+        if (other.lower, other.width, len(other.counts)) != (self.lower, self.width, len(self.counts)):
+            raise ValueError("直方图分箱不一致，无法合并")
+        self.counts += other.counts
+        return self
+
+    @property
+    def count(self) -> int:
+        """累计值数量"""
+        return int(self.counts.sum())
+
+    def quantiles(self, percentiles: Iterable[float]) -> List[Optional[float]]:
+        """
+        计算近似分位数
+
+        Args:
+            percentiles: 百分位数（0-100）
+
+        Returns:
+            各百分位对应的值，无数据时为None
+        """
+        total = self.count
+        if total == 0:
+            return [None for _ in percentiles]
+
+        cumulative = np.cumsum(self.counts)
+        result = []
+        for p in percentiles:
+            # 下限取极小正数，使 P0 落在第一个非空箱
+            rank = max(p / 100 * total, 1e-9)
+            index = int(np.searchsorted(cumulative, rank, side='left'))
+            index = min(index, len(self.counts) - 1)
+            before = cumulative[index - 1] if index > 0 else 0
+            in_bin = self.counts[index]
+            fraction = (rank - before) / in_bin if in_bin else 0.0
+            result.append(float(self.lower + (index + fraction) * self.width))
+        return result
+
+    def nonzero_bins(self) -> Dict[str, List[float]]:
+        """
+        非空箱的下边界与计数
+
+        Returns:
+            {'edges': [...], 'counts': [...]}
+        """
+        indices = np.flatnonzero(self.counts)
+        return {
+            'edges': (self.lower + indices * self.width).round(6).tolist(),
+            'counts': self.counts[indices].tolist(),
+        }
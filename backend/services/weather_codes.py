@@ -0,0 +1,133 @@
+"""
+天气代码统计
+WMO 天气代码的名称映射与标签查找表，以及基于 np.bincount 的分组众数与代码分布计算
+遵循单一职责原则
+"""
+from typing import Dict, Optional, Tuple, Any
+
+import numpy as np
+
+# WMO 天气代码 -> 中文名称
+WEATHER_CODE_MAP = {
+    0: '晴朗', 1: '晴到多云', 2: '多云', 3: '阴天', 45: '雾',
+    48: '沉积雾', 51: '小毛毛雨', 53: '毛毛雨', 55: '大毛毛雨',
+    61: '小雨', 63: '中雨', 65: '大雨', 71: '小雪',
+    73: '中雪', 75: '大雪', 80: '阵雨', 81: '中阵雨',
+    82: '大阵雨', 95: '雷阵雨'
+}
+
+
+def weather_code_label(code: Any) -> Optional[str]:
+    """
+    格式化天气代码，如 61 -> "61 (小雨)"
+
+    Args:
+        code: 天气代码，None/NaN 原样返回None
+
+    Returns:
+        带名称的代码字符串
+    """
+    if code is None or code != code:
+        return None
+    code = int(code)
+    return f"{code} ({WEATHER_CODE_MAP.get(code, '未知')})"
+
+
+# 代码 0-99（WMO 4677 的取值范围）的标签查找表，下标即代码
+WEATHER_CODE_LABELS = np.array([weather_code_label(code) for code in range(100)], dtype=object)
+
+
+def weather_code_labels(codes: Any) -> np.ndarray:
+    """
+    批量格式化天气代码（weather_code_label 的向量化版本）
+
+    Args:
+        codes: 天气代码数组，缺失值为NaN
+
+    Returns:
+        标签数组（object），缺失值为None
+    """
+    codes = np.asarray(codes, dtype=np.float64)
+    labels = np.full(len(codes), None, dtype=object)
+    valid = ~np.isnan(codes)
+    values = codes[valid].astype(np.int64)
+
+    in_table = (values >= 0) & (values < len(WEATHER_CODE_LABELS))
+    valid_labels = np.empty(len(values), dtype=object)
+    valid_labels[in_table] = WEATHER_CODE_LABELS[values[in_table]]
+    if not in_table.all():
+        valid_labels[~in_table] = [weather_code_label(code) for code in values[~in_table].tolist()]
+    labels[valid] = valid_labels
+    return labels
+
+
+def grouped_code_counts(
+    codes: np.ndarray,
+    groups: Optional[np.ndarray] = None,
+    n_groups: Optional[int] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    按分组统计各天气代码出现次数
+
+    代码先压缩为连续编号，再以 分组 x 代码 的扁平下标做一次 bincount
+
+    Args:
+        codes: 天气代码数组，缺失值为NaN
+        groups: 每个值所属分组编号（0 起的整数），None 表示全部为一组
+        n_groups: 分组数量，默认 groups.max() + 1
+
+    Returns:
+        (升序的代码数组, 分组 x 代码 的计数矩阵)
+    """
+    codes = np.asarray(codes, dtype=np.float64)
+    if groups is None:
+        groups = np.zeros(len(codes), dtype=np.int64)
+    groups = np.asarray(groups, dtype=np.int64)
+    if n_groups is None:
+        n_groups = int(groups.max()) + 1 if len(groups) else 0
+
+    valid = ~np.isnan(codes)
+    values, index = np.unique(codes[valid].astype(np.int64), return_inverse=True)
+    width = len(values)
+    counts = np.bincount(
+        groups[valid] * width + index, minlength=n_groups * width
+    ).reshape(n_groups, width)
+    return values, counts
+
+
+def grouped_modes(
+    codes: np.ndarray,
+    groups: Optional[np.ndarray] = None,
+    n_groups: Optional[int] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    按分组计算天气代码众数（并列时取最小代码）
+
+    Args:
+        codes: 天气代码数组，缺失值为NaN
+        groups: 分组编号，None 表示全部为一组
+        n_groups: 分组数量
+
+    Returns:
+        (各组众数数组, 各组是否有有效值的布尔数组)，无有效值的组众数为0
+    """
+    values, counts = grouped_code_counts(codes, groups, n_groups)
+    has_values = counts.sum(axis=1) > 0
+    if len(values) == 0:
+        return np.zeros(len(counts), dtype=np.int64), has_values
+    return values[counts.argmax(axis=1)], has_values
+
+
+def code_distribution(values: np.ndarray, counts: np.ndarray) -> Dict[str, int]:
+    """
+    将一组计数转为 {代码: 次数} 字典（键为字符串以兼容JSON，省略0次）
+
+    Args:
+        values: grouped_code_counts 返回的代码数组
+        counts: 单个分组的计数行
+
+    Returns:
+        代码分布
+    """
+    nonzero = np.flatnonzero(counts)
+    return {str(code): count for code, count in zip(values[nonzero].tolist(), counts[nonzero].tolist())}
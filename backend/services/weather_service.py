@@ -7,6 +7,7 @@ import logging
 import requests
 from typing import Dict, Any, List, Optional
 from datetime import datetime
+from backend.services.weather_codes import WEATHER_CODE_MAP
 from backend.services.cache_manager import CacheManager
 from backend.models.city import CityManager
 from backend.models.database import DatabaseManager
@@ -100,13 +101,7 @@ class WeatherService:
         self.cache = cache_manager
         self.city_manager = city_manager
         self.db_manager = db_manager
-        self.weather_code_map = {
-            0: '晴朗', 1: '晴到多云', 2: '多云', 3: '阴天', 45: '雾', 
-            48: '沉积雾', 51: '小毛毛雨', 53: '毛毛雨', 55: '大毛毛雨', 
-            61: '小雨', 63: '中雨', 65: '大雨', 71: '小雪', 
-            73: '中雪', 75: '大雪', 80: '阵雨', 81: '中阵雨', 
-            82: '大阵雨', 95: '雷阵雨'
-        }
+        self.weather_code_map = WEATHER_CODE_MAP
         logger.info("天气服务初始化完成")
     
     def get_historical_weather(
@@ -147,9 +142,7 @@ class WeatherService:
                 
                 # 2. 检查本地数据是否完整
                 # 计算期望的小时数
-                d1 = datetime.strptime(start_date, '%Y-%m-%d')
-                d2 = datetime.strptime(end_date, '%Y-%m-%d')
-                expected_hours = (d2 - d1).days * 24 + 24
+                expected_hours = self._expected_hours(start_date, end_date)
                 
                 if len(db_data) >= expected_hours:
                     # 3. 检查请求的字段在本地数据中是否均有数值 (Item 3 & 44 改进)
@@ -257,6 +250,116 @@ class WeatherService:
             logger.error(f"处理天气数据失败: {e}")
             raise
     
+    def ensure_local_data(
+        self,
+        city_id: int,
+        start_date: str,
+        end_date: str,
+        fields: List[str]
+    ) -> bool:
+        """
+        确保本地数据库中存在完整的数据，缺失时自动下载
+        
+        完整性检查只在数据库中计数，不加载任何小时记录，
+        供流式/列式查询等直接读取 weather_data 的路径使用
+        
+        Args:
+            city_id: 城市ID
+            start_date: 开始日期 (YYYY-MM-DD)
+            end_date: 结束日期 (YYYY-MM-DD)
+            fields: 需要的数据字段列表
+            
+        Returns:
+            本地数据是否完整（为False时调用方应回退到 get_historical_weather）
+        """
+        return self.fetch_missing_data(city_id, start_date, end_date, fields) is None
+    
+    def fetch_missing_data(
+        self,
+        city_id: int,
+        start_date: str,
+        end_date: str,
+        fields: List[str]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        补齐本地数据库中缺失的数据，补齐后仍不完整时返回本次获取的数据
+        
+        与 ensure_local_data 相同，但本地数据仍不完整（如数据来自快照缓存而未写入数据库）时
+        直接返回 get_historical_weather 的结果，调用方无需再次获取；下载失败时抛出异常
+        
+        Args:
+            city_id: 城市ID
+            start_date: 开始日期 (YYYY-MM-DD)
+            end_date: 结束日期 (YYYY-MM-DD)
+            fields: 需要的数据字段列表
+            
+        Returns:
+            本地数据完整时为None，否则为 get_historical_weather 返回的天气数据字典
+        """
+        if self.is_local_complete(city_id, start_date, end_date, fields):
+            logger.info(f"本地数据库完整: 城市ID={city_id}, {start_date} 至 {end_date}")
+            return None
+        
+        city_info = self.city_manager.get_city_by_id(city_id)
+        if not city_info:
+            raise ValueError(f"城市ID {city_id} 不存在")
+        
+        logger.info(f"本地数据不完整，自动下载: 城市ID={city_id}, {start_date} 至 {end_date}")
+        weather_data = self.get_historical_weather(
+            longitude=city_info['longitude'],
+            latitude=city_info['latitude'],
+            start_date=start_date,
+            end_date=end_date,
+            fields=fields,
+            city_id=city_id
+        )
+        return None if self.is_local_complete(city_id, start_date, end_date, fields) else weather_data
+    
+    def is_local_complete(
+        self,
+        city_id: int,
+        start_date: str,
+        end_date: str,
+        fields: List[str]
+    ) -> bool:
+        """
+        检查本地数据库中该时间范围的数据是否完整（只计数，不加载记录）
+        
+        Args:
+            city_id: 城市ID
+            start_date: 开始日期 (YYYY-MM-DD)
+            end_date: 结束日期 (YYYY-MM-DD)
+            fields: 需要的数据字段列表
+            
+        Returns:
+            小时数足够且每个字段都有数值时为True
+        """
+        counts = self.db_manager.count_weather_fields({
+            'city_id': city_id,
+            'start_date': f"{start_date}T00:00",
+            'end_date': f"{end_date}T23:59"
+        }, fields)
+        if counts['total'] < self._expected_hours(start_date, end_date):
+            return False
+        # 与 get_historical_weather 一致：字段全部为空视为未下载
+        return all(counts[f] > 0 for f in counts if f != 'total')
+    
+    @staticmethod
+    def _expected_hours(start_date: str, end_date: str) -> int:
+        """
+        计算日期范围内期望的小时记录数
+        
+        Args:
+            start_date: 开始日期 (YYYY-MM-DD)
+            end_date: 结束日期 (YYYY-MM-DD)
+            
+        Returns:
+            小时数
+        """
+        d1 = datetime.strptime(start_date, '%Y-%m-%d')
+        d2 = datetime.strptime(end_date, '%Y-%m-%d')
+        return (d2 - d1).days * 24 + 24
+    
     def batch_query_cities(
         self,
         city_ids: List[int],
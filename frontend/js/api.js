@@ -90,7 +90,14 @@ class APIClient {
      * @returns {Promise} 天气数据
      */
     async queryWeather(params) {
-        return this.post('/weather/query', params);
+        // 使用 GET 请求，浏览器可凭 ETag 复用缓存的历史数据
+        const query = new URLSearchParams();
+        Object.entries(params).forEach(([key, value]) => {
+            if (value !== undefined && value !== null) {
+                query.set(key, Array.isArray(value) ? value.join(',') : value);
+            }
+        });
+        return this.get(`/weather/query?${query.toString()}`);
     }
 
     /**
@@ -137,6 +144,33 @@ class APIClient {
         });
     }
 
+    /**
+     * 从 Content-Disposition 中解析下载文件名，优先使用 RFC 5987 的 filename*
+     * @param {string|null} header - 响应头
+     * @param {string} fallback - 默认文件名
+     * @returns {string} 文件名
+     */
+    filenameFromDisposition(header, fallback) {
+        if (!header) {
+            return fallback;
+        }
+        const encoded = /filename\*=UTF-8''([^;\n]+)/i.exec(header);
+        if (encoded) {
+            return decodeURIComponent(encoded[1]);
+        }
+        const plain = /filename=(["']?)([^;\n]*)\1/.exec(header);
+        return plain && plain[2] ? plain[2] : fallback;
+    }
+
+    /**
+     * 导出格式对应的文件扩展名
+     * @param {string} format - excel/csv/parquet/arrow
+     * @returns {string} 扩展名
+     */
+    exportExtension(format) {
+        return { csv: 'csv', parquet: 'parquet', arrow: 'arrow' }[format] || 'xlsx';
+    }
+
     /**
      * 批量导出完整数据
      */
@@ -157,15 +191,10 @@ class APIClient {
             }
 
             // 获取文件名
-            const contentDisposition = response.headers.get('Content-Disposition');
-            let filename = `天气数据.${format === 'csv' ? 'csv' : 'xlsx'}`;
-
-            if (contentDisposition) {
-                const matches = /filename[^;=\n]*=((['"]).*?\2|[^;\n]*)/.exec(contentDisposition);
-                if (matches != null && matches[1]) {
-                    filename = matches[1].replace(/['"]/g, '');
-                }
-            }
+            const filename = this.filenameFromDisposition(
+                response.headers.get('Content-Disposition'),
+                `天气数据.${this.exportExtension(format)}`
+            );
 
             // 下载文件
             const blob = await response.blob();
@@ -187,8 +216,8 @@ class APIClient {
 
     /**
      * 批量导出天气数据
-     * @param {object} params - 导出参数
-     * @param {string} format - 导出格式 (excel/csv)
+     * @param {object} params - 导出参数，bundle 为 city/city_year 时按城市（或城市-年）分文件打包为ZIP
+     * @param {string} format - 导出格式 (excel/csv/parquet/arrow)
      */
     async bulkExport(params, format = 'excel') {
         const url = `${this.baseUrl}/data/export-bulk`;
@@ -208,15 +237,10 @@ class APIClient {
             }
 
             // 获取文件名
-            const contentDisposition = response.headers.get('Content-Disposition');
-            let filename = `批量天气数据.${format === 'csv' ? 'csv' : 'xlsx'}`;
-
-            if (contentDisposition) {
-                const matches = /filename[^;=\n]*=((['"]).*?\2|[^;\n]*)/.exec(contentDisposition);
-                if (matches != null && matches[1]) {
-                    filename = matches[1].replace(/['"]/g, '');
-                }
-            }
+            const filename = this.filenameFromDisposition(
+                response.headers.get('Content-Disposition'),
+                `批量天气数据.${params.bundle ? 'zip' : this.exportExtension(format)}`
+            );
 
             const blob = await response.blob();
             const downloadUrl = window.URL.createObjectURL(blob);
@@ -235,6 +259,47 @@ class APIClient {
         }
     }
 
+    /**
+     * 创建异步导出任务（大批量导出不占用请求连接，浏览器断开也不会中断）
+     * @param {object} params - {city_id 或 city_ids, start_date, end_date, fields}
+     * @param {string} format - 导出格式 (excel/csv/parquet/arrow)
+     * @returns {Promise} 任务信息
+     */
+    async createExportJob(params, format = 'excel') {
+        return this.post('/export/jobs', { ...params, format });
+    }
+
+    /**
+     * 轮询导出任务直到结束，完成后由浏览器直接下载结果文件
+     * @param {object} job - createExportJob 返回的任务信息
+     * @param {function} onProgress - 进度回调，参数为 0-1
+     * @param {number} interval - 轮询间隔（毫秒）
+     * @returns {Promise<object>} 完成的任务信息
+     */
+    async waitForExportJob(job, onProgress = null, interval = 1000) {
+        while (job.status === 'pending' || job.status === 'running') {
+            if (onProgress) {
+                onProgress(job.progress);
+            }
+            await new Promise((resolve) => setTimeout(resolve, interval));
+            job = (await this.request(job.status_url.replace(/^\/api/, ''))).data;
+        }
+        if (job.status !== 'done') {
+            throw new Error(job.error || '导出任务未完成');
+        }
+        if (onProgress) {
+            onProgress(1);
+        }
+
+        const a = document.createElement('a');
+        a.href = job.download_url;
+        a.download = job.download_name;
+        document.body.appendChild(a);
+        a.click();
+        document.body.removeChild(a);
+        return job;
+    }
+
     /**
      * 对比多个城市
      * @param {object} params - 对比参数
@@ -0,0 +1,85 @@
+"""
+异常检测服务单元测试
+测试滑动窗口与季节基线 z-score 的计算
+"""
+import unittest
+import sys
+import os
+
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.services.anomaly_detector import (
+    rolling_zscores, seasonal_keys, parse_hours, find_anomalies
+)
+
+
+def make_columns(days=120, seed=0):
+    """生成带日变化的模拟温度数据"""
+    rng = np.random.default_rng(seed)
+    index = pd.date_range('2023-01-01', periods=days * 24, freq='h')
+    diurnal = 8 * np.sin((index.hour.values - 9) / 24 * 2 * np.pi)
+    temperature = 20 + diurnal + rng.normal(0, 0.5, len(index))
+    return {
+        'datetime': index.strftime('%Y-%m-%dT%H:%M').tolist(),
+        'temperature_2m': temperature.tolist(),
+        'wind_speed_10m': rng.uniform(0, 5, len(index)).tolist(),
+    }
+
+
+class TestAnomalyDetector(unittest.TestCase):
+    """异常检测测试类"""
+
+    def test_rolling_matches_brute_force(self):
+        """测试累积和滑动窗口与逐点计算一致"""
+        rng = np.random.default_rng(1)
+        values = rng.normal(0, 1, 500)
+        values[[10, 200]] = np.nan
+        z = rolling_zscores(values, window=24)[0]
+
+        for i in (3, 30, 250, 499):
+            window = np.concatenate([values[max(0, i - 12):i], values[i + 1:i + 13]])
+            window = window[~np.isnan(window)]
+            expected = (values[i] - window.mean()) / window.std(ddof=1)
+            self.assertAlmostEqual(z[i], expected, places=9)
+        self.assertTrue(np.isnan(z[10]))
+
+    def test_seasonal_keys(self):
+        """测试季节分组编号"""
+        hours = parse_hours(['2024-01-01T05:00', '2024-03-01T23:00', '2024-12-31T00:00'])
+        self.assertEqual(seasonal_keys(hours, 'hour').tolist(), [5, 23, 0])
+        self.assertEqual(seasonal_keys(hours, 'month_hour').tolist(), [5, 71, 264])
+        self.assertEqual(seasonal_keys(hours, 'day_of_year').tolist(), [0, 60, 365])
+
+    def test_seasonal_ignores_diurnal_cycle(self):
+        """测试季节基线不会把日变化当作异常，但能发现突变"""
+        columns = make_columns()
+        columns['temperature_2m'][1000] += 10
+
+        result = find_anomalies(columns, ['temperature_2m', 'wind_speed_10m'], method='seasonal', threshold=5)
+        self.assertEqual(result['temperature_2m']['indices'].tolist(), [1000])
+        self.assertEqual(result['temperature_2m']['datetime'], [columns['datetime'][1000]])
+        self.assertEqual(result['wind_speed_10m']['count'], 0)
+
+    def test_limit_keeps_largest(self):
+        """测试 limit 保留 |z| 最大的异常"""
+        columns = make_columns()
+        columns['temperature_2m'][500] += 6
+        columns['temperature_2m'][1500] -= 12
+
+        result = find_anomalies(columns, ['temperature_2m'], method='seasonal', threshold=5, limit=1)
+        self.assertEqual(result['temperature_2m']['count'], 2)
+        self.assertEqual(result['temperature_2m']['indices'].tolist(), [1500])
+        self.assertLess(result['temperature_2m']['zscores'][0], 0)
+
+    def test_invalid_method(self):
+        """测试不支持的检测方法"""
+        with self.assertRaises(ValueError):
+            find_anomalies(make_columns(days=2), ['temperature_2m'], method='global')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,6 +6,8 @@ import unittest
 import sys
 import os
 import json
+import tempfile
+from unittest import mock
 
 # 添加项目根目录到路径
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -19,16 +21,56 @@ class TestAPI(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
         """测试类初始化"""
-        # 确保数据库已初始化（API使用config中的DATABASE_PATH）
+        # 数据库、导出目录和导出缓存都放在临时目录，不触及 data/ 下的真实文件
         from backend.models.database import DatabaseManager
-        from backend.config import DATABASE_PATH
-        db_manager = DatabaseManager(DATABASE_PATH)
+        cls.temp_dir = tempfile.TemporaryDirectory()
+        database_path = os.path.join(cls.temp_dir.name, 'weather.db')
+        cls.paths_patcher = mock.patch.multiple(
+            'backend.app',
+            DATABASE_PATH=database_path,
+            EXPORT_DIR=os.path.join(cls.temp_dir.name, 'exports'),
+            EXPORT_CACHE_DIR=os.path.join(cls.temp_dir.name, 'export_cache')
+        )
+        cls.paths_patcher.start()
+        db_manager = DatabaseManager(database_path)
         db_manager.init_database()
         
         # 创建测试应用
         cls.app = create_app()
         cls.client = cls.app.test_client()
         cls.app.config['TESTING'] = True
+        
+        # 写入一段远离真实查询范围的本地数据，供离线测试使用
+        cls.db_manager = db_manager
+        cls.db_manager.bulk_insert('weather_data', [
+            {
+                'city_id': 1,
+                'datetime': f"1990-01-01T{h:02d}:00",
+                'temperature_2m': 10.0 + h,
+                'precipitation': 0.5 if h < 3 else 0.0,
+                'shortwave_radiation': 500.0 if 6 <= h < 18 else 0.0,
+                'wind_speed_100m': 36.0,
+            }
+            for h in range(24)
+        ])
+    
+    @classmethod
+    def tearDownClass(cls):
+        """测试类清理"""
+        from backend.routes import api
+        api.export_jobs.shutdown()
+        cls.paths_patcher.stop()
+        cls.temp_dir.cleanup()
+    
+    @staticmethod
+    def _is_cached(key, extension):
+        """导出缓存中是否存在该键的文件"""
+        from backend.routes import api
+        cached = api.export_cache.get(key, extension)
+        if cached is None:
+            return False
+        cached.close()
+        return True
     
     def test_index_route(self):
         """测试首页路由"""
@@ -108,6 +150,631 @@ class TestAPI(unittest.TestCase):
             self.assertEqual(data['code'], 200)
             self.assertIn('data', data)
 
+    
+    def test_query_weather_columnar(self):
+        """测试列式返回格式"""
+        response = self.client.post(
+            '/api/weather/query',
+            data=json.dumps({
+                'city_id': 1,
+                'start_date': '1990-01-01',
+                'end_date': '1990-01-01',
+                'fields': ['temperature_2m', 'precipitation'],
+                'format': 'columnar'
+            }),
+            content_type='application/json'
+        )
+        
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)['data']
+        self.assertEqual(data['total_records'], 24)
+        self.assertEqual(data['fields'], ['temperature_2m', 'precipitation'])
+        self.assertEqual(data['columns']['temperature_2m'][:2], [10.0, 11.0])
+        self.assertEqual(data['summary']['precipitation']['rainy_hours'], 3)
+    
+    def test_query_weather_backfill_fetched_once(self):
+        """测试本地数据不完整时只获取一次：失败直接报错，成功但未入库时使用已获取的数据"""
+        from backend.routes import api
+        params = {
+            'city_id': 1,
+            'start_date': '1990-01-02',
+            'end_date': '1990-01-02',
+            'fields': ['temperature_2m'],
+            'format': 'columnar'
+        }
+        
+        with mock.patch.object(api.weather_service, 'get_historical_weather',
+                               side_effect=RuntimeError('offline')) as fetch:
+            response = self.client.post('/api/weather/query', json=params)
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(fetch.call_count, 1)
+        
+        fetched = {'hourly_data': [{'datetime': '1990-01-02T00:00', 'temperature_2m': 5.0}]}
+        with mock.patch.object(api.weather_service, 'get_historical_weather', return_value=fetched) as fetch:
+            response = self.client.post('/api/weather/query', json=params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(fetch.call_count, 1)
+        self.assertEqual(json.loads(response.data)['data']['columns']['temperature_2m'], [5.0])
+    
+    def test_query_weather_ndjson(self):
+        """测试NDJSON流式返回格式"""
+        response = self.client.post(
+            '/api/weather/query',
+            data=json.dumps({
+                'city_id': 1,
+                'start_date': '1990-01-01',
+                'end_date': '1990-01-01',
+                'fields': ['temperature_2m', 'precipitation'],
+                'format': 'ndjson'
+            }),
+            content_type='application/json'
+        )
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        lines = [json.loads(line) for line in response.data.decode('utf-8').splitlines()]
+        self.assertEqual(lines[0]['type'], 'meta')
+        self.assertEqual(lines[0]['columns'], ['datetime', 'temperature_2m', 'precipitation'])
+        self.assertEqual(lines[1], ['1990-01-01T00:00', 10.0, 0.5])
+        self.assertEqual(lines[-1]['type'], 'end')
+        self.assertEqual(lines[-1]['total_records'], 24)
+        self.assertEqual(lines[-1]['summary']['temperature']['max'], 33.0)
+        self.assertEqual(lines[-1]['summary']['precipitation']['rainy_hours'], 3)
+    
+    def test_query_weather_max_points(self):
+        """测试服务端降采样"""
+        response = self.client.post(
+            '/api/weather/query',
+            data=json.dumps({
+                'city_id': 1,
+                'start_date': '1990-01-01',
+                'end_date': '1990-01-01',
+                'fields': ['temperature_2m', 'precipitation'],
+                'max_points': 10
+            }),
+            content_type='application/json'
+        )
+        
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)['data']
+        self.assertLessEqual(len(data['records']), 10)
+        self.assertEqual(data['total_records'], 24)
+        self.assertEqual(data['downsampled']['original_records'], 24)
+        # 统计摘要基于完整数据
+        self.assertEqual(data['summary']['temperature']['max'], 33.0)
+    
+    def test_query_weather_summary_only(self):
+        """测试仅返回统计摘要的查询"""
+        response = self.client.get(
+            '/api/weather/query?city_id=1&start_date=1990-01-01&end_date=1990-01-01'
+            '&fields=temperature_2m,precipitation&summary_only=true'
+        )
+        self.assertEqual(response.status_code, 200)
+        
+        data = json.loads(response.data)['data']
+        self.assertEqual(data['total_records'], 24)
+        self.assertNotIn('records', data)
+        self.assertEqual(data['summary']['temperature']['max'], 33.0)
+        self.assertEqual(data['summary']['precipitation']['rainy_hours'], 3)
+    
+    def test_compare_summary_only(self):
+        """测试仅返回摘要的城市对比"""
+        response = self.client.post('/api/weather/compare', json={
+            'city_ids': [1],
+            'start_date': '1990-01-01',
+            'end_date': '1990-01-01',
+            'fields': ['temperature_2m', 'precipitation'],
+            'summary_only': True
+        })
+        self.assertEqual(response.status_code, 200)
+        
+        data = json.loads(response.data)['data']
+        self.assertEqual(len(data['details']), 1)
+        self.assertEqual(data['details'][0]['total_records'], 24)
+        self.assertNotIn('hourly_data', data['details'][0])
+        self.assertAlmostEqual(data['comparison'][data['cities'][0]]['temperature']['avg'], 21.5)
+    
+    def test_weather_anomalies(self):
+        """测试异常检测接口"""
+        response = self.client.get(
+            '/api/weather/anomalies?city_id=1&start_date=1990-01-01&end_date=1990-01-01'
+            '&fields=temperature_2m,precipitation&method=rolling&window=6&threshold=1.5'
+        )
+        self.assertEqual(response.status_code, 200)
+        
+        data = json.loads(response.data)['data']
+        self.assertEqual(data['total_records'], 24)
+        self.assertEqual(set(data['anomalies'].keys()), {'temperature_2m', 'precipitation'})
+        result = data['anomalies']['precipitation']
+        self.assertEqual(len(result['indices']), len(result['zscores']))
+        
+        response = self.client.get('/api/weather/anomalies?city_id=1&start_date=1990-01-01'
+                                   '&end_date=1990-01-01&method=global')
+        self.assertEqual(response.status_code, 400)
+        
+        response = self.client.post('/api/weather/anomalies', json={
+            'city_id': 1, 'start_date': '1990-01-01', 'end_date': '1990-01-01', 'fields': ['datetime']
+        })
+        self.assertEqual(response.status_code, 400)
+    
+    def test_weather_trends(self):
+        """测试多字段多窗口趋势接口"""
+        response = self.client.get(
+            '/api/weather/trends?city_id=1&start_date=1990-01-01&end_date=1990-01-01'
+            '&fields=temperature_2m,precipitation&windows=2,4'
+        )
+        self.assertEqual(response.status_code, 200)
+        
+        data = json.loads(response.data)['data']
+        columns = data['columns']
+        self.assertEqual(data['windows'], [2, 4])
+        self.assertEqual(len(columns['datetime']), 24)
+        self.assertEqual(columns['temperature_2m_trend_2'][:3], [10.0, 10.5, 11.5])
+        self.assertEqual(columns['temperature_2m_trend_4'][5], 13.5)
+        
+        response = self.client.get('/api/weather/trends?city_id=1&start_date=1990-01-01'
+                                   '&end_date=1990-01-01&windows=0')
+        self.assertEqual(response.status_code, 400)
+        
+        response = self.client.get('/api/weather/trends?city_id=1&start_date=1990-01-01'
+                                   '&end_date=1990-01-01&fields=datetime')
+        self.assertEqual(response.status_code, 400)
+    
+    def test_climatology_invalid_params(self):
+        """测试气候基线接口参数校验"""
+        response = self.client.get('/api/climatology?period=month')
+        self.assertEqual(response.status_code, 400)
+        
+        response = self.client.get('/api/weather/departures?city_id=1&start_date=1990-01-01'
+                                   '&end_date=1990-01-01&field=unknown')
+        self.assertEqual(response.status_code, 400)
+    
+    def test_weather_percentiles(self):
+        """测试分位数分布接口"""
+        response = self.client.get(
+            '/api/weather/percentiles?city_id=1&start_date=1990-01-01&end_date=1990-01-01'
+            '&fields=temperature_2m&percentiles=0,50,100&include_histogram=true'
+        )
+        self.assertEqual(response.status_code, 200)
+        
+        result = json.loads(response.data)['data']['distributions']['temperature_2m']
+        self.assertEqual(result['count'], 24)
+        self.assertAlmostEqual(result['percentiles']['p0'], 10.0, delta=0.11)
+        self.assertAlmostEqual(result['percentiles']['p50'], 21.5, delta=0.6)
+        self.assertAlmostEqual(result['percentiles']['p100'], 33.0, delta=0.11)
+        self.assertEqual(sum(result['histogram']['counts']), 24)
+        
+        response = self.client.get('/api/weather/percentiles?city_id=1&start_date=1990-01-01'
+                                   '&end_date=1990-01-01&fields=weather_code')
+        self.assertEqual(response.status_code, 400)
+    
+    def test_energy_screening(self):
+        """测试新能源选址初筛与参数校验"""
+        response = self.client.post('/api/energy/screening', json={
+            'city_ids': [1],
+            'start_date': '1990-01-01',
+            'end_date': '1990-01-01'
+        })
+        self.assertEqual(response.status_code, 200)
+        
+        site = json.loads(response.data)['data']['sites'][0]
+        self.assertEqual(site['city_id'], 1)
+        self.assertEqual(site['solar']['irradiation_kwh_m2'], 6.0)
+        self.assertEqual(site['solar']['avg_peak_sun_hours'], 6.0)
+        self.assertEqual(site['wind']['capacity_factor'], 0.6705)
+        
+        response = self.client.get('/api/energy/wind?city_id=1&start_date=1990-01-01'
+                                   '&end_date=1990-01-01&speed_field=wind_speed_10m_max')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/energy/wind', json={
+            'city_id': 1, 'start_date': '1990-01-01', 'end_date': '1990-01-01',
+            'power_curve': {'speeds': [0, 5], 'power_kw': [0]}
+        })
+        self.assertEqual(response.status_code, 400)
+    
+    def test_export_excel(self):
+        """测试Excel导出（只写模式临时文件）"""
+        response = self.client.post('/api/weather/export', json={
+            'city_id': 1,
+            'start_date': '1990-01-01',
+            'end_date': '1990-01-01',
+            'fields': ['temperature_2m']
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data.startswith(b'PK'))
+        self.assertIn('.xlsx', response.headers['Content-Disposition'])
+        response.close()
+    
+    def test_export_excel_cached(self):
+        """测试Excel导出缓存：数据未变化时复用，写入所涉年份后重新生成"""
+        from backend.routes import api
+        params = {
+            'city_id': 1,
+            'start_date': '1990-01-01',
+            'end_date': '1990-01-01',
+            'fields': ['temperature_2m', 'precipitation']
+        }
+        city_info = {'id': 1, 'city_name': api.city_manager.get_city_by_id(1)['city_name']}
+        
+        def cache_key():
+            return api._export_cache_key(
+                [city_info], '1990-01-01', '1990-01-01', params['fields'], 'excel', 'single'
+            )
+        
+        first = self.client.post('/api/weather/export', json=params)
+        self.assertEqual(first.status_code, 200)
+        content = first.data
+        first.close()
+        key = cache_key()
+        self.assertTrue(self._is_cached(key, '.xlsx'))
+        
+        second = self.client.post('/api/weather/export', json=params)
+        self.assertEqual(second.data, content)
+        second.close()
+        
+        self.db_manager.bulk_insert('weather_data', [
+            {'city_id': 1, 'datetime': '1990-01-01T00:00', 'temperature_2m': 10.0, 'precipitation': 0.5,
+             'shortwave_radiation': 0.0, 'wind_speed_100m': 36.0}
+        ])
+        self.assertNotEqual(cache_key(), key)
+    
+    def test_export_fails_when_backfill_fails(self):
+        """测试补齐数据失败时导出返回500且不写入缓存，不输出只含部分数据的文件"""
+        from backend.routes import api
+        from backend.services.columnar_format import pyarrow_available
+        if not pyarrow_available():
+            self.skipTest("需要 pyarrow")
+        
+        params = {
+            'city_id': 1,
+            'start_date': '1990-01-01',
+            'end_date': '1990-01-01',
+            'format': 'parquet',
+            'fields': ['temperature_2m', 'wind_speed_100m']
+        }
+        city_info = {'id': 1, 'city_name': api.city_manager.get_city_by_id(1)['city_name']}
+        key = api._export_cache_key(
+            [city_info], '1990-01-01', '1990-01-01', params['fields'], 'parquet', None
+        )
+        
+        with mock.patch.object(api.weather_service, 'ensure_local_data', side_effect=RuntimeError('offline')):
+            response = self.client.post('/api/weather/export', json=params)
+            self.assertEqual(response.status_code, 500)
+            self.assertFalse(self._is_cached(key, '.parquet'))
+            
+            # 批量CSV在输出第一个字节前补齐，失败时同样返回500
+            response = self.client.post('/api/data/export-bulk', json={
+                'city_ids': [1], 'start_date': '1990-01-01', 'end_date': '1990-01-01', 'format': 'csv'
+            })
+            self.assertEqual(response.status_code, 500)
+            self.assertEqual(json.loads(response.data)['code'], 500)
+        
+        response = self.client.post('/api/weather/export', json=params)
+        self.assertEqual(response.status_code, 200)
+        response.close()
+        self.assertTrue(self._is_cached(key, '.parquet'))
+    
+    def test_export_csv_streaming(self):
+        """测试CSV从数据库游标流式导出，中文文件名使用 filename*"""
+        response = self.client.post('/api/weather/export', json={
+            'city_id': 1,
+            'start_date': '1990-01-01',
+            'end_date': '1990-01-01',
+            'format': 'csv',
+            'fields': ['temperature_2m']
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_streamed)
+        self.assertIn("filename*=UTF-8''", response.headers['Content-Disposition'])
+        
+        lines = response.get_data().decode('utf-8-sig').splitlines()
+        self.assertEqual(lines[0], '城市,日期,时间,温度(°C)')
+        self.assertEqual(len(lines), 1 + 24)
+        self.assertTrue(lines[1].endswith(',1990-01-01,00:00,10.0'))
+    
+    def test_export_import_parquet(self):
+        """测试 Parquet 导出后通过上传接口导入"""
+        from io import BytesIO
+        from backend.services.columnar_format import pyarrow_available
+        if not pyarrow_available():
+            self.skipTest("需要 pyarrow")
+        
+        response = self.client.post('/api/weather/export', json={
+            'city_id': 1,
+            'start_date': '1990-01-01',
+            'end_date': '1990-01-01',
+            'format': 'parquet',
+            'fields': ['temperature_2m']
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data.startswith(b'PAR1'))
+        self.assertIn('.parquet', response.headers['Content-Disposition'])
+        content = response.data
+        response.close()
+        
+        response = self.client.post('/api/data/import', data={
+            'file': (BytesIO(content), 'export.parquet')
+        }, content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)['data']
+        self.assertEqual(data['rows'], 24)
+        self.assertEqual(data['cities'], [1])
+        self.assertEqual(data['fields'], ['temperature_2m'])
+        
+        response = self.client.post('/api/data/import', data={
+            'file': (BytesIO(content), 'export.txt')
+        }, content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 400)
+    
+    def test_data_feed(self):
+        """测试数据订阅：令牌校验、NDJSON 全量与增量、Arrow IPC 流"""
+        from unittest.mock import patch
+        from backend.routes import api as api_module
+        params = {'city_ids': '1', 'start_date': '1990-01-01', 'end_date': '1990-01-01', 'fields': 'temperature_2m'}
+        headers = {'Authorization': 'Bearer secret'}
+        
+        with patch.object(api_module, 'FEED_TOKENS', []):
+            self.assertEqual(self.client.get('/api/data/feed', query_string=params, headers=headers).status_code, 503)
+        
+        with patch.object(api_module, 'FEED_TOKENS', ['secret']):
+            response = self.client.get('/api/data/feed', query_string=params, headers={'Authorization': 'Bearer x'})
+            self.assertEqual(response.status_code, 401)
+            response = self.client.get('/api/data/feed', query_string={**params, 'since': 'yesterday'}, headers=headers)
+            self.assertEqual(response.status_code, 400)
+            
+            response = self.client.get('/api/data/feed', query_string=params, headers=headers)
+            self.assertEqual(response.status_code, 200)
+            lines = [json.loads(line) for line in response.data.decode('utf-8').splitlines()]
+            response.close()
+            cursor = response.headers['X-Feed-Cursor']
+            self.assertTrue(cursor)
+            self.assertEqual(lines[0]['columns'], ['city_id', 'datetime', 'temperature_2m'])
+            self.assertEqual(lines[0]['cursor'], cursor)
+            self.assertEqual(lines[1], [1, '1990-01-01T00:00', 10.0])
+            self.assertEqual(lines[-1], {'type': 'end', 'total_records': 24, 'cursor': cursor})
+            
+            # 增量：只返回游标之后更新的行
+            response = self.client.get('/api/data/feed', query_string={**params, 'since': cursor}, headers=headers)
+            lines = response.data.decode('utf-8').splitlines()
+            response.close()
+            self.assertEqual(len(lines), 2)
+            
+            self.db_manager.upsert_weather_data([
+                {'city_id': 1, 'datetime': '1990-01-01T05:00', 'temperature_2m': 15.0}
+            ])
+            response = self.client.get('/api/data/feed', query_string={**params, 'since': cursor}, headers=headers)
+            lines = [json.loads(line) for line in response.data.decode('utf-8').splitlines()]
+            response.close()
+            self.assertEqual(lines[1:-1], [[1, '1990-01-01T05:00', 15.0]])
+            self.assertGreater(response.headers['X-Feed-Cursor'], cursor)
+            
+            from backend.services.columnar_format import pyarrow_available
+            if pyarrow_available():
+                import pyarrow as pa
+                response = self.client.get('/api/data/feed', query_string={**params, 'format': 'arrow'}, headers=headers)
+                self.assertEqual(response.status_code, 200)
+                table = pa.ipc.open_stream(response.data).read_all()
+                response.close()
+                self.assertEqual(table.num_rows, 24)
+                self.assertEqual(table.column('city').to_pylist()[0], '南宁')
+                self.assertEqual(table.schema.metadata[b'cursor'].decode('utf-8'), response.headers['X-Feed-Cursor'])
+    
+    def test_import_csv(self):
+        """测试上传 CSV：列名映射、指定城市与错误提示"""
+        from io import BytesIO
+        content = 'time,temp\n' + ''.join(f"1990-01-01 {h:02d}:00,{10.0 + h}\n" for h in range(24))
+        
+        response = self.client.post('/api/data/import', data={
+            'file': (BytesIO(content.encode('utf-8')), 'station.csv'),
+            'city_id': '1',
+            'column_map': json.dumps({'time': 'datetime', 'temp': 'temperature_2m'})
+        }, content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)['data']
+        self.assertEqual((data['rows'], data['cities'], data['fields']), (24, [1], ['temperature_2m']))
+        
+        response = self.client.post('/api/data/import', data={
+            'file': (BytesIO(content.encode('utf-8')), 'station.csv'),
+            'column_map': json.dumps({'time': 'datetime', 'temp': 'temperature_2m'})
+        }, content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 400)
+        
+        response = self.client.post('/api/data/import', data={
+            'file': (BytesIO(content.encode('utf-8')), 'station.csv'),
+            'column_map': '[1]'
+        }, content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 400)
+        
+        response = self.client.post('/api/data/import', data={
+            'file': (BytesIO(content.encode('utf-8')), 'station.csv'),
+            'city_id': '99',
+            'column_map': json.dumps({'time': 'datetime', 'temp': 'temperature_2m'})
+        }, content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('未知的城市', json.loads(response.data)['message'])
+    
+    def test_export_job(self):
+        """测试异步导出任务：提交、轮询进度、分段下载"""
+        import time
+        response = self.client.post('/api/export/jobs', json={
+            'city_id': 1,
+            'start_date': '1990-01-01',
+            'end_date': '1990-01-01',
+            'format': 'csv',
+            'fields': ['temperature_2m']
+        })
+        self.assertEqual(response.status_code, 202)
+        job = json.loads(response.data)['data']
+        
+        deadline = time.time() + 10
+        while job['status'] in ('pending', 'running') and time.time() < deadline:
+            time.sleep(0.02)
+            job = json.loads(self.client.get(job['status_url']).data)['data']
+        self.assertEqual(job['status'], 'done')
+        self.assertEqual(job['progress'], 1.0)
+        
+        response = self.client.get(job['download_url'])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("filename*=UTF-8''", response.headers['Content-Disposition'])
+        content = response.data
+        response.close()
+        self.assertEqual(len(content.decode('utf-8-sig').splitlines()), 1 + 24)
+        self.assertEqual(len(content), job['size'])
+        
+        response = self.client.get(job['download_url'], headers={'Range': 'bytes=3-'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.data, content[3:])
+        response.close()
+        
+        # 结果文件在下载前被删除时返回404而不是500
+        from backend.routes import api
+        os.remove(api.export_jobs.jobs[job['job_id']]['path'])
+        self.assertEqual(self.client.get(job['download_url']).status_code, 404)
+        
+        self.assertEqual(self.client.delete(job['status_url']).status_code, 200)
+        self.assertEqual(self.client.get(job['download_url']).status_code, 404)
+    
+    def test_export_job_validation(self):
+        """测试异步导出任务的参数校验"""
+        response = self.client.post('/api/export/jobs', json={'city_id': 1, 'start_date': '1990-01-01'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/export/jobs', json={
+            'city_id': 1, 'start_date': '1990-01-01', 'end_date': '1990-01-01', 'format': 'pdf'
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get('/api/export/jobs/missing').status_code, 404)
+    
+    def test_export_bulk_bundle(self):
+        """测试分文件打包导出以ZIP流式返回"""
+        import zipfile
+        from io import BytesIO
+        response = self.client.post('/api/data/export-bulk', json={
+            'city_ids': [1],
+            'start_date': '1990-01-01',
+            'end_date': '1990-01-01',
+            'format': 'csv',
+            'bundle': 'city_year'
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_streamed)
+        self.assertEqual(response.mimetype, 'application/zip')
+        archive = zipfile.ZipFile(BytesIO(response.get_data()))
+        names = archive.namelist()
+        self.assertEqual(len(names), 1)
+        self.assertTrue(names[0].endswith('_天气数据_1990.csv'))
+        self.assertEqual(len(archive.read(names[0]).decode('utf-8-sig').splitlines()), 1 + 24)
+        
+        response = self.client.post('/api/data/export-bulk', json={
+            'city_ids': [1], 'start_date': '1990-01-01', 'end_date': '1990-01-01', 'bundle': 'month'
+        })
+        self.assertEqual(response.status_code, 400)
+    
+    def test_query_weather_etag(self):
+        """测试基于数据版本的 ETag 条件请求"""
+        url = '/api/weather/query?city_id=1&start_date=1990-01-01&end_date=1990-01-01&fields=temperature_2m'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response.headers.get('ETag')
+        self.assertIsNotNone(etag)
+        
+        # 数据未变化时返回304
+        response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        
+        # 数据写入后 ETag 失效（即使写入相同的值）
+        self.db_manager.bulk_insert('weather_data', [
+            {'city_id': 1, 'datetime': '1990-01-01T00:00', 'temperature_2m': 10.0, 'precipitation': 0.5}
+        ])
+        response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers.get('ETag'), etag)
+        etag = response.headers.get('ETag')
+        
+        # 非 GET 请求命中 If-None-Match 时返回412
+        response = self.client.post('/api/weather/query', json={
+            'city_id': 1,
+            'start_date': '1990-01-01',
+            'end_date': '1990-01-01',
+            'fields': ['temperature_2m']
+        }, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 412)
+    
+    def test_query_weather_etag_incomplete_range(self):
+        """测试本地数据不完整（补齐未入库）时响应不带 ETag，也不返回304"""
+        from backend.routes import api
+        url = '/api/weather/query?city_id=1&start_date=1990-01-02&end_date=1990-01-02&fields=temperature_2m&format=columnar'
+        
+        fetched = {'hourly_data': [{'datetime': '1990-01-02T00:00', 'temperature_2m': 5.0}]}
+        with mock.patch.object(api.weather_service, 'get_historical_weather', return_value=fetched):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertIsNone(response.headers.get('ETag'))
+            
+            with self.app.test_request_context(url):
+                etag = api._data_etag(api._request_params())
+            response = self.client.get(url, headers={'If-None-Match': etag})
+            self.assertEqual(response.status_code, 200)
+            self.assertIsNone(response.headers.get('ETag'))
+    
+    def test_response_compression(self):
+        """测试按 Accept-Encoding 压缩响应"""
+        import gzip
+        
+        url = '/api/weather/query?city_id=1&start_date=1990-01-01&end_date=1990-01-01&fields=temperature_2m'
+        response = self.client.get(url, headers={'Accept-Encoding': 'gzip'})
+        
+        self.assertEqual(response.headers.get('Content-Encoding'), 'gzip')
+        self.assertIn('Accept-Encoding', response.headers.get('Vary', ''))
+        data = json.loads(gzip.decompress(response.data))
+        self.assertEqual(data['data']['total_records'], 24)
+        
+        # 压缩表示的 ETag 同样支持条件请求
+        etag = response.headers.get('ETag')
+        self.assertTrue(etag.endswith('-gzip"'))
+        response = self.client.get(url, headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers.get('ETag'), etag)
+    
+    def test_file_download_not_compressed(self):
+        """测试 send_file 文件下载不被压缩，Range 请求返回原始字节"""
+        import io
+        from flask import Flask, send_file
+        from backend.middleware import init_compression
+        
+        app = Flask(__name__)
+        init_compression(app)
+        content = b'datetime,temperature_2m\n' + b'1990-01-01T00:00,10.0\n' * 200
+        
+        @app.route('/file')
+        def download():
+            return send_file(io.BytesIO(content), mimetype='text/csv', conditional=True)
+        
+        client = app.test_client()
+        response = client.get('/file', headers={'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertEqual(response.data, content)
+        response.close()
+        
+        response = client.get('/file', headers={'Accept-Encoding': 'gzip', 'Range': 'bytes=100-'})
+        self.assertEqual(response.status_code, 206)
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertEqual(response.data, content[100:])
+        response.close()
+    
+    def test_query_weather_invalid_format(self):
+        """测试不支持的返回格式"""
+        response = self.client.post(
+            '/api/weather/query',
+            data=json.dumps({
+                'city_id': 1,
+                'start_date': '1990-01-01',
+                'end_date': '1990-01-01',
+                'format': 'xml'
+            }),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,94 @@
+"""
+分文件打包导出单元测试
+测试按城市/城市-年拆分文件，以及顺序与进程池生成的ZIP内容
+"""
+import unittest
+import sys
+import os
+import zipfile
+from io import BytesIO
+
+from openpyxl import load_workbook
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.models.database import DatabaseManager
+from backend.services.bundle_exporter import bundle_parts, iter_bundle
+
+CITIES = [{'id': 1, 'city_name': '南宁'}, {'id': 2, 'city_name': '柳州'}]
+
+
+class TestBundleExporter(unittest.TestCase):
+    """分文件打包导出测试类"""
+
+    @classmethod
+    def setUpClass(cls):
+        """测试类初始化"""
+        cls.test_db_path = 'data/test_bundle.db'
+        cls.db_manager = DatabaseManager(cls.test_db_path)
+        cls.db_manager.init_database()
+        cls.db_manager.bulk_insert('weather_data', [
+            {'city_id': city_id, 'datetime': f"{year}-06-01T{h:02d}:00", 'temperature_2m': 20.0 + h}
+            for city_id in (1, 2) for year in (2020, 2021) for h in range(24)
+        ])
+
+    @classmethod
+    def tearDownClass(cls):
+        """测试类清理"""
+        if os.path.exists(cls.test_db_path):
+            os.remove(cls.test_db_path)
+
+    def test_bundle_parts(self):
+        """测试按城市-年拆分并截取首尾年份"""
+        groups = bundle_parts(CITIES, '2020-03-01', '2021-02-28', 'city_year')
+        self.assertEqual(len(groups), 2)
+        self.assertEqual(
+            [(p['start_date'], p['end_date'], p['name']) for p in groups[0]],
+            [('2020-03-01', '2020-12-31', '南宁_天气数据_2020'), ('2021-01-01', '2021-02-28', '南宁_天气数据_2021')]
+        )
+        self.assertEqual(len(bundle_parts(CITIES, '2020-01-01', '2021-12-31', 'city')[1]), 1)
+        with self.assertRaises(ValueError):
+            bundle_parts(CITIES, '2020-01-01', '2020-12-31', 'month')
+
+    def _bundle(self, export_format, mode, max_workers):
+        """生成ZIP并返回 (ZipFile, 准备调用, 进度)"""
+        prepared, progress = [], []
+        data = b''.join(iter_bundle(
+            bundle_parts(CITIES, '2020-01-01', '2022-12-31', mode),
+            ['temperature_2m'],
+            export_format,
+            self.test_db_path,
+            prepare=lambda *args: prepared.append(args),
+            progress=lambda done, total: progress.append((done, total)),
+            max_workers=max_workers
+        ))
+        return zipfile.ZipFile(BytesIO(data)), prepared, progress
+
+    def test_city_year_csv(self):
+        """测试每城市每年一个CSV，无数据的年份不写入"""
+        for max_workers in (1, 2):
+            archive, prepared, progress = self._bundle('csv', 'city_year', max_workers)
+            self.assertEqual(sorted(archive.namelist()), [
+                '南宁_天气数据_2020.csv', '南宁_天气数据_2021.csv',
+                '柳州_天气数据_2020.csv', '柳州_天气数据_2021.csv',
+            ])
+            lines = archive.read('柳州_天气数据_2021.csv').decode('utf-8-sig').splitlines()
+            self.assertEqual(len(lines), 1 + 24)
+            self.assertTrue(lines[1].startswith('柳州,2021-06-01,00:00,20.0'))
+            self.assertEqual(prepared, [(1, '2020-01-01', '2022-12-31'), (2, '2020-01-01', '2022-12-31')])
+            self.assertEqual(progress[-1], (6, 6))
+
+    def test_city_excel(self):
+        """测试每城市一个Excel文件"""
+        archive, _, _ = self._bundle('excel', 'city', 2)
+        self.assertEqual(sorted(archive.namelist()), [
+            '南宁_天气数据_2020-01-01_2022-12-31.xlsx', '柳州_天气数据_2020-01-01_2022-12-31.xlsx'
+        ])
+        wb = load_workbook(BytesIO(archive.read('南宁_天气数据_2020-01-01_2022-12-31.xlsx')))
+        self.assertEqual(wb['天气数据'].max_row, 1 + 48)
+        self.assertEqual(wb['每日汇总'].max_row, 1 + 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+"""
+城市管理器单元测试
+测试CityManager类的坐标检索功能
+"""
+import unittest
+import sys
+import os
+import random
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.models.database import DatabaseManager
+from backend.models.city import CityManager, haversine_km
+from backend.config import GUANGXI_CITIES
+
+
+class TestCityManager(unittest.TestCase):
+    """城市管理器测试类"""
+
+    @classmethod
+    def setUpClass(cls):
+        """测试类初始化"""
+        # 使用测试数据库
+        cls.test_db_path = 'data/test_city.db'
+        cls.db_manager = DatabaseManager(cls.test_db_path)
+
+        # 初始化数据库表结构
+        cls.db_manager.init_database()
+
+        cls.city_manager = CityManager(cls.db_manager)
+        cls.city_manager.init_cities(GUANGXI_CITIES)
+
+    @classmethod
+    def tearDownClass(cls):
+        """测试类清理"""
+        # 删除测试数据库
+        if os.path.exists(cls.test_db_path):
+            os.remove(cls.test_db_path)
+
+    def test_haversine(self):
+        """测试大圆距离计算"""
+        # 南宁到桂林约 336km
+        distance = haversine_km(22.8172, 108.3661, 25.2736, 110.2993)
+        self.assertAlmostEqual(distance, 337, delta=15)
+        self.assertEqual(haversine_km(22.8, 108.3, 22.8, 108.3), 0)
+
+    def test_find_nearest_matches_full_scan(self):
+        """测试最近城市检索结果与全表计算一致"""
+        rng = random.Random(42)
+        cities = self.city_manager.get_all_cities()
+
+        for _ in range(20):
+            lat = rng.uniform(18, 42)
+            lon = rng.uniform(100, 125)
+            expected = sorted(
+                cities,
+                key=lambda c: (haversine_km(lat, lon, c['latitude'], c['longitude']), c['id'])
+            )[:3]
+
+            result = self.city_manager.find_nearest(lat, lon, k=3)
+            self.assertEqual([c['id'] for c in result], [c['id'] for c in expected])
+
+    def test_find_nearest_city_itself(self):
+        """测试城市自身坐标的最近城市为其本身"""
+        result = self.city_manager.find_nearest(22.8172, 108.3661)
+        self.assertEqual(len(result), 1)
+        self.assertEqual(result[0]['city_name'], '南宁')
+        self.assertAlmostEqual(result[0]['distance_km'], 0, places=3)
+
+    def test_find_nearest_far_away(self):
+        """测试远离所有城市的坐标仍能返回结果"""
+        result = self.city_manager.find_nearest(-45.0, -70.0, k=2)
+        self.assertEqual(len(result), 2)
+
+    def test_find_in_bbox(self):
+        """测试矩形范围检索"""
+        result = self.city_manager.find_in_bbox(21.0, 106.0, 26.0, 112.0)
+        names = {c['city_name'] for c in result}
+
+        self.assertIn('南宁', names)
+        self.assertIn('桂林', names)
+        self.assertNotIn('北京', names)
+
+    def test_spatial_index_follows_updates(self):
+        """测试新增城市后空间索引同步更新"""
+        city_id = self.city_manager.add_city('测试站', 135.0, -30.0, '测试')
+        result = self.city_manager.find_nearest(-30.1, 135.1)
+        self.assertEqual(result[0]['id'], city_id)
+
+        self.city_manager.update_city_status(city_id, False)
+        result = self.city_manager.find_nearest(-30.1, 135.1)
+        self.assertNotEqual(result[0]['id'], city_id)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+"""
+气候基线服务单元测试
+测试基线构建、增量刷新与距平查询
+"""
+import unittest
+import sys
+import os
+
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.models.database import DatabaseManager
+from backend.services.climatology import ClimatologyService, group_statistics
+
+
+def make_year_records(city_id, year, offset=0.0):
+    """生成一年带日变化的模拟小时温度"""
+    index = pd.date_range(f'{year}-01-01', f'{year}-12-31 23:00', freq='h')
+    temperature = 20 + offset + 5 * np.sin(index.hour.values / 24 * 2 * np.pi) + index.month.values * 0.1
+    return [
+        {'city_id': city_id, 'datetime': dt, 'temperature_2m': float(t)}
+        for dt, t in zip(index.strftime('%Y-%m-%dT%H:%M'), temperature)
+    ]
+
+
+class TestClimatologyService(unittest.TestCase):
+    """气候基线服务测试类"""
+
+    @classmethod
+    def setUpClass(cls):
+        """测试类初始化"""
+        cls.test_db_path = 'data/test_climatology.db'
+        cls.db_manager = DatabaseManager(cls.test_db_path)
+        cls.db_manager.init_database()
+
+        for year, offset in ((2001, -1.0), (2002, 0.0), (2003, 1.0)):
+            cls.db_manager.bulk_insert('weather_data', make_year_records(1, year, offset))
+
+        cls.service = ClimatologyService(cls.db_manager, 2001, 2003)
+
+    @classmethod
+    def tearDownClass(cls):
+        """测试类清理"""
+        if os.path.exists(cls.test_db_path):
+            os.remove(cls.test_db_path)
+
+    def test_group_statistics_matches_numpy(self):
+        """测试分组统计与numpy逐组计算一致"""
+        rng = np.random.default_rng(0)
+        keys = rng.integers(0, 6, 300)
+        values = rng.normal(0, 1, 300)
+
+        for key, n, mean, std, p10, p50, p90 in group_statistics(keys, values):
+            group = values[keys == key]
+            self.assertEqual(n, len(group))
+            self.assertAlmostEqual(mean, group.mean())
+            self.assertAlmostEqual(std, group.std(ddof=1))
+            np.testing.assert_allclose([p10, p50, p90], np.percentile(group, [10, 50, 90]))
+
+    def test_build_and_departures(self):
+        """测试构建基线并通过连接查询距平"""
+        rebuilt = self.service.refresh([1], ['temperature_2m'], force=True)
+        self.assertEqual(rebuilt, {1: {'temperature_2m': 3}})
+
+        hourly = self.db_manager.get_climatology(1, 'temperature_2m', 'hour')
+        self.assertEqual(len(hourly), 24)
+        self.assertEqual(hourly[0]['n'], 365 * 3)
+        self.assertEqual(len(self.db_manager.get_climatology(1, 'temperature_2m', 'doy')), 365)
+
+        # 2003年偏暖1度，相对三年平均的距平为+1
+        result = self.service.departures(1, '2003-03-01', '2003-03-31', 'temperature_2m', 'doy')
+        self.assertEqual(len(result['columns']['datetime']), 31 * 24)
+        self.assertAlmostEqual(result['summary']['mean_departure'], 1.0, places=6)
+
+    def test_incremental_refresh(self):
+        """测试仅参考期内的数据变化会使基线失效"""
+        self.service.refresh([1], ['temperature_2m'], force=True)
+        self.assertEqual(self.service.stale_entries([1], ['temperature_2m']), {})
+
+        # 参考期外写入不影响基线
+        self.db_manager.bulk_insert('weather_data', make_year_records(1, 2010)[:24])
+        self.assertEqual(self.service.stale_entries([1], ['temperature_2m']), {})
+
+        # 参考期内写入使基线失效，刷新后恢复
+        self.db_manager.bulk_insert('weather_data', make_year_records(1, 2002)[:24])
+        self.assertEqual(self.service.stale_entries([1], ['temperature_2m']), {1: ['temperature_2m']})
+        self.assertEqual(self.service.refresh([1], ['temperature_2m']), {1: {'temperature_2m': 3}})
+        self.assertEqual(self.service.refresh([1], ['temperature_2m']), {})
+
+    def test_empty_reference_period_recorded(self):
+        """测试参考期内无数据或字段全为空时写入 n_years=0 的构建记录，不再每次重建"""
+        self.service.refresh([1, 2], ['temperature_2m', 'precipitation'])
+        self.assertEqual(self.service.stale_entries([1, 2], ['temperature_2m', 'precipitation']), {})
+
+        meta = {(m['city_id'], m['field']): m['n_years'] for m in self.db_manager.get_climatology_meta()}
+        self.assertEqual(meta[(1, 'precipitation')], 0)
+        self.assertEqual(meta[(2, 'temperature_2m')], 0)
+
+        # 之后写入参考期数据时基线失效并重建
+        self.db_manager.bulk_insert('weather_data', make_year_records(2, 2002))
+        self.assertEqual(self.service.stale_entries([2], ['temperature_2m']), {2: ['temperature_2m']})
+        self.assertEqual(self.service.refresh([2], ['temperature_2m']), {2: {'temperature_2m': 1}})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+"""
+数据分析器单元测试
+测试DataAnalyzer类的统计摘要功能
+"""
+import unittest
+import sys
+import os
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.services import data_analyzer
+from backend.services.data_analyzer import DataAnalyzer
+from backend.models.database import DatabaseManager
+
+
+def make_records(n=500, seed=0):
+    """生成带缺失值的模拟小时数据"""
+    rng = np.random.default_rng(seed)
+    records = []
+    for i in range(n):
+        records.append({
+            'datetime': f"2024-01-01T{i % 24:02d}:00",
+            'temperature_2m': None if i % 17 == 0 else float(rng.normal(20, 5)),
+            'precipitation': float(max(rng.normal(0, 1), 0)),
+            'wind_speed_10m': float(rng.uniform(0, 10)),
+            'shortwave_radiation': float(rng.uniform(0, 800)),
+            'weather_code': int(rng.choice([0, 1, 3, 61])),
+        })
+    return records
+
+
+class TestDataAnalyzer(unittest.TestCase):
+    """数据分析器测试类"""
+
+    def setUp(self):
+        self.analyzer = DataAnalyzer()
+        self.records = make_records()
+
+    def test_summary_matches_pandas(self):
+        """测试统计摘要与pandas计算结果一致"""
+        summary = self.analyzer.calculate_summary(self.records)
+        df = pd.DataFrame(self.records)
+        temp = df['temperature_2m'].dropna()
+        precip = df['precipitation']
+        radiation = df['shortwave_radiation']
+
+        self.assertAlmostEqual(summary['temperature']['avg'], round(temp.mean(), 2))
+        self.assertAlmostEqual(summary['temperature']['std'], round(temp.std(), 2))
+        self.assertAlmostEqual(summary['temperature']['min'], round(temp.min(), 2))
+        self.assertAlmostEqual(summary['precipitation']['total'], round(precip.sum(), 2))
+        self.assertEqual(summary['precipitation']['rainy_hours'], int((precip > 0).sum()))
+        self.assertAlmostEqual(summary['solar_radiation']['total_mj'], round(radiation.sum() * 0.0036, 2))
+        self.assertEqual(summary['weather']['most_frequent'], int(df['weather_code'].mode().iloc[0]))
+        self.assertEqual(
+            summary['weather']['distribution'],
+            {str(int(k)): v for k, v in df['weather_code'].value_counts().sort_index().items()}
+        )
+        self.assertNotIn('humidity', summary)
+
+    def test_summary_plain_python_types(self):
+        """测试统计结果为Python原生类型"""
+        summary = self.analyzer.calculate_summary(self.records)
+        for stats in summary.values():
+            for value in stats.values():
+                if isinstance(value, dict):
+                    # 天气代码分布 {代码: 次数}
+                    self.assertTrue(all(type(v) is int for v in value.values()))
+                else:
+                    self.assertIn(type(value), (int, float))
+
+    def test_summary_from_columns(self):
+        """测试列式输入与记录列表输入结果一致"""
+        columns = {
+            field: [record[field] for record in self.records]
+            for field in self.records[0]
+        }
+        self.assertEqual(
+            self.analyzer.calculate_summary(columns),
+            self.analyzer.calculate_summary(self.records)
+        )
+
+    def test_summary_single_value(self):
+        """测试单条记录时标准差为空"""
+        summary = self.analyzer.calculate_summary([{'temperature_2m': 12.5}])
+        self.assertEqual(summary['temperature'], {'avg': 12.5, 'max': 12.5, 'min': 12.5, 'std': None})
+
+    def test_compare_cities_matches_per_city_summary(self):
+        """测试批量对比与逐城市计算结果一致"""
+        cities = [
+            {'city_name': '南宁', 'data': make_records(300, seed=1)},
+            {'city_name': '桂林', 'data': make_records(200, seed=2)},
+            {'city_name': '空数据', 'data': []},
+        ]
+        cities[1]['data'][0]['weather_code'] = None
+        expected = {c['city_name']: self.analyzer.calculate_summary(c['data']) for c in cities[:2]}
+        
+        self.assertEqual(self.analyzer.compare_cities(cities, max_workers=1), expected)
+        
+        # 降低阈值以走进程池路径
+        with mock.patch.object(data_analyzer, 'PARALLEL_ANALYSIS_MIN_VALUES', 0):
+            self.assertEqual(self.analyzer.compare_cities(cities, max_workers=2), expected)
+    
+    def test_multi_trends_match_pandas_rolling(self):
+        """测试累积和移动平均与pandas rolling结果一致"""
+        columns = {
+            field: [record[field] for record in self.records]
+            for field in ('datetime', 'temperature_2m', 'wind_speed_10m')
+        }
+        trends = self.analyzer.calculate_multi_trends(columns, ['temperature_2m', 'wind_speed_10m'], [24, 168])
+        
+        for field in ('temperature_2m', 'wind_speed_10m'):
+            for window in (24, 168):
+                expected = pd.Series(columns[field], dtype=float).rolling(window, min_periods=1).mean()
+                np.testing.assert_allclose(trends[f'{field}_trend_{window}'], expected.round(3), atol=1e-3)
+        self.assertEqual(len(trends['datetime']), len(self.records))
+    
+    def test_summarize_stored_matches_calculate_summary(self):
+        """测试数据库聚合摘要与内存计算结果一致"""
+        db_path = 'data/test_data_analyzer.db'
+        db_manager = DatabaseManager(db_path)
+        db_manager.init_database()
+        try:
+            records = [
+                {**record, 'city_id': 1, 'datetime': f"2024-01-{i // 24 + 1:02d}T{i % 24:02d}:00"}
+                for i, record in enumerate(self.records[:240])
+            ]
+            db_manager.bulk_insert('weather_data', records)
+            
+            analyzer = DataAnalyzer(db_manager)
+            result = analyzer.summarize_stored({'city_id': 1})
+            
+            self.assertEqual(result['total_records'], 240)
+            self.assertEqual(result['summary'], analyzer.calculate_summary(records))
+        finally:
+            if os.path.exists(db_path):
+                os.remove(db_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+"""
+数据导出服务单元测试
+测试只写模式的流式Excel导出与游标流式CSV导出
+"""
+import unittest
+import sys
+import os
+from io import BytesIO
+from unittest.mock import patch
+
+import pandas as pd
+from openpyxl import load_workbook
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.services.data_exporter import DataExporter
+
+
+def make_records(city, days=2):
+    """生成两天的模拟小时记录"""
+    index = pd.date_range('2024-01-01', periods=days * 24, freq='h')
+    return [
+        {
+            'datetime': stamp,
+            'temperature_2m': float(i),
+            'shortwave_radiation': 100.0,
+            'wind_speed_10m': None if i == 0 else 3.6,
+            'weather_code': 61.0 if i % 3 else 3.0,
+            'city': city,
+        }
+        for i, stamp in enumerate(index.strftime('%Y-%m-%dT%H:%M'))
+    ]
+
+
+class TestDataExporter(unittest.TestCase):
+    """数据导出测试类"""
+
+    def setUp(self):
+        self.exporter = DataExporter()
+
+    def test_write_excel_streams_chunks(self):
+        """测试逐块写入数据表与每日汇总表"""
+        output = self.exporter.write_excel(
+            (make_records(city) for city in ['南宁', '柳州']), 'test'
+        )
+        wb = load_workbook(BytesIO(output.read()))
+        output.close()
+
+        self.assertEqual(wb.sheetnames, ['天气数据', '每日汇总'])
+        data = list(wb['天气数据'].iter_rows(values_only=True))
+        self.assertEqual(data[0][:4], ('城市', '日期', '时间', '温度(°C)'))
+        self.assertEqual(len(data), 1 + 2 * 48)
+        self.assertEqual(data[49][0], '柳州')
+        # 缺失值写为空单元格
+        self.assertIsNone(data[1][data[0].index('10米风速(km/h)')])
+        self.assertEqual(wb['天气数据'].column_dimensions['C'].width, 7)
+        self.assertEqual(wb['天气数据']['A1'].font.bold, True)
+
+        daily = list(wb['每日汇总'].iter_rows(values_only=True))
+        self.assertEqual(daily[0][:4], ('日期', '城市', '主要天气', '日辐照量(MJ/m²)'))
+        self.assertEqual(len(daily), 1 + 4)
+        self.assertEqual(daily[1][2:4], ('61 (小雨)', 8.64))
+
+    def test_write_excel_sheet_rollover(self):
+        """测试超过单表行数上限时续写到新工作表"""
+        with patch('backend.services.data_exporter.EXCEL_MAX_ROWS', 31):
+            output = self.exporter.write_excel(
+                (make_records(city) for city in ['南宁', '柳州']), 'test', include_summary=False
+            )
+        wb = load_workbook(BytesIO(output.read()))
+        output.close()
+
+        self.assertEqual(wb.sheetnames, ['天气数据', '天气数据2', '天气数据3', '天气数据4'])
+        rows = [list(wb[name].iter_rows(values_only=True)) for name in wb.sheetnames]
+        self.assertEqual([len(r) - 1 for r in rows], [30, 30, 30, 6])
+        self.assertTrue(all(r[0] == rows[0][0] for r in rows))
+        self.assertEqual(rows[3][-1][3], 47.0)
+
+    def test_daily_summary_aggregates(self):
+        """测试每日汇总：均值、总和、主要天气与派生列，全缺失的日期均值为空"""
+        records = make_records('南宁')
+        for r in records[24:]:
+            r['temperature_2m'] = None
+        daily = self.exporter._daily_summary(self.exporter._format_data(records))
+
+        self.assertEqual(daily['温度(°C)'].tolist()[0], 11.5)
+        self.assertTrue(pd.isna(daily['温度(°C)'].tolist()[1]))
+        self.assertEqual(daily['短波辐射(W/m²)'].tolist(), [2400.0, 2400.0])
+        self.assertEqual(daily['日辐照量(MJ/m²)'].tolist(), [8.64, 8.64])
+        self.assertEqual(daily['日平均风速(m/s)'].tolist(), [1.0, 1.0])
+        self.assertEqual(daily['主要天气'].tolist(), ['61 (小雨)', '61 (小雨)'])
+        self.assertEqual(daily.columns.tolist()[:5], ['日期', '城市', '主要天气', '日辐照量(MJ/m²)', '日平均风速(m/s)'])
+
+    def test_export_to_excel_bytes(self):
+        """测试兼容接口返回字节流，空数据仍生成有效工作簿"""
+        content = self.exporter.export_to_excel(make_records('南宁'), 'test', include_summary=False)
+        self.assertEqual(load_workbook(BytesIO(content)).sheetnames, ['天气数据'])
+
+        content = self.exporter.export_to_excel([], 'empty')
+        self.assertEqual(load_workbook(BytesIO(content)).sheetnames, ['天气数据'])
+
+    def test_iter_csv_matches_export_to_csv(self):
+        """测试游标流式CSV与一次性导出的内容一致"""
+        records = make_records('南宁')
+        columns = ['datetime', 'temperature_2m', 'wind_speed_10m', 'shortwave_radiation', 'weather_code']
+        rows = [tuple(r[c] for c in columns) for r in records]
+
+        chunks = list(self.exporter.iter_csv([rows[:10], [], rows[10:]], columns, city_name='南宁'))
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(b''.join(chunks), self.exporter.export_to_csv(records, 'test'))
+
+    def test_format_data_splits_datetime(self):
+        """测试日期时间拆分与天气代码标签，非字符串日期时间同样支持"""
+        from datetime import date
+        records = [
+            {'datetime': '2024-01-01T23:00', 'weather_code': 61.0},
+            {'datetime': '2024-01-02T00:00', 'weather_code': None},
+        ]
+        df = self.exporter._format_data(records)
+        self.assertEqual(df['日期'].tolist(), [date(2024, 1, 1), date(2024, 1, 2)])
+        self.assertEqual(df['时间'].tolist(), ['23:00', '00:00'])
+        self.assertEqual(df['天气代码'].tolist()[0], '61 (小雨)')
+        self.assertTrue(pd.isna(df['天气代码'].tolist()[1]))
+
+        stamps = [dict(r, datetime=pd.Timestamp(r['datetime'])) for r in records]
+        pd.testing.assert_frame_equal(self.exporter._format_data(stamps), df)
+
+    def test_iter_csv_city_ids(self):
+        """测试按 city_id 映射城市名称并按请求字段过滤"""
+        rows = [(1, '2024-01-01T05:00', 1.5, 61.0), (2, '2024-01-01T06:00', None, None)]
+        content = b''.join(self.exporter.iter_csv(
+            [rows], ['city_id', 'datetime', 'temperature_2m', 'weather_code'],
+            fields=['weather_code'], city_names={1: '南宁', 2: '柳州'}
+        )).decode('utf-8-sig')
+        self.assertEqual(content.splitlines(), [
+            '城市,日期,时间,天气代码',
+            '南宁,2024-01-01,05:00,61 (小雨)',
+            '柳州,2024-01-01,06:00,',
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,219 @@
+"""
+数据导入器单元测试
+测试 CSV / Parquet / Arrow IPC 导出后再导入的往返一致性
+"""
+import unittest
+import sys
+import os
+from io import BytesIO
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.models.database import DatabaseManager
+from backend.services.data_exporter import DataExporter
+from backend.services.data_importer import DataImporter
+from backend.services.columnar_format import pyarrow_available
+
+
+FIELDS = ['temperature_2m', 'precipitation', 'wind_speed_10m']
+
+
+def make_rows(date, base_temp):
+    """生成一天的 (datetime, 字段...) 元组行，风速全部缺失"""
+    return [
+        (f"{date}T{h:02d}:00", round(base_temp + h * 0.1, 1), 1.0 if h % 6 == 0 else 0.0, None)
+        for h in range(24)
+    ]
+
+
+@unittest.skipUnless(pyarrow_available(), "需要 pyarrow")
+class TestDataImporter(unittest.TestCase):
+    """数据导入器测试类"""
+
+    @classmethod
+    def setUpClass(cls):
+        """测试类初始化"""
+        cls.test_db_path = 'data/test_importer.db'
+        cls.db_manager = DatabaseManager(cls.test_db_path)
+        cls.db_manager.init_database()
+        cls.db_manager.execute_update(
+            "INSERT OR IGNORE INTO city_config (id, city_name, longitude, latitude, region) "
+            "VALUES (1, '南宁', 108.37, 22.82, '广西'), (2, '柳州', 109.41, 24.33, '广西')"
+        )
+        cls.exporter = DataExporter()
+        cls.importer = DataImporter(cls.db_manager)
+
+    @classmethod
+    def tearDownClass(cls):
+        """测试类清理"""
+        if os.path.exists(cls.test_db_path):
+            os.remove(cls.test_db_path)
+
+    def setUp(self):
+        """每个测试前清空数据"""
+        for city_id in (1, 2):
+            self.db_manager.delete_weather_data({'city_id': city_id})
+        self.row_groups = [
+            (1, make_rows('2024-01-01', 20.1)),
+            (2, make_rows('2024-01-01', 10.3)),
+        ]
+
+    def _roundtrip(self, file_format):
+        """导出后导入，并与原始行比较"""
+        output = self.exporter.write_columnar(
+            self.row_groups, FIELDS, {1: '南宁', 2: '柳州'}, file_format, 'test'
+        )
+        with output:
+            result = self.importer.import_columnar(output, file_format, batch_size=10)
+
+        self.assertEqual(result['rows'], 48)
+        self.assertEqual(result['cities'], [1, 2])
+        self.assertEqual(result['fields'], FIELDS)
+
+        for city_id, rows in self.row_groups:
+            chunks = self.db_manager.iter_weather_rows({'city_id': city_id}, FIELDS)
+            self.assertEqual([row for chunk in chunks for row in chunk], rows)
+
+    def test_parquet_roundtrip(self):
+        """测试 Parquet 往返：float32 还原为原始十进制值，缺失值为NULL"""
+        self._roundtrip('parquet')
+
+    def test_arrow_roundtrip(self):
+        """测试 Arrow IPC 往返"""
+        self._roundtrip('arrow')
+
+    def test_partial_fields_keep_existing_values(self):
+        """测试只包含部分字段的文件不会清空其他字段"""
+        self.db_manager.bulk_insert('weather_data', [
+            {'city_id': 1, 'datetime': row[0], 'temperature_2m': 0.0, 'precipitation': 2.0}
+            for row in make_rows('2024-01-01', 0.0)
+        ])
+        rows = [(dt, temp) for dt, temp, _, _ in make_rows('2024-01-01', 20.1)]
+        output = self.exporter.write_columnar([(1, rows)], ['temperature_2m'], {1: '南宁'}, 'parquet', 'test')
+        with output:
+            self.importer.import_columnar(output, 'parquet')
+
+        chunks = self.db_manager.iter_weather_rows({'city_id': 1}, ['temperature_2m', 'precipitation'])
+        stored = [row for chunk in chunks for row in chunk]
+        self.assertEqual([row[:2] for row in stored], rows)
+        self.assertTrue(all(row[2] == 2.0 for row in stored))
+
+    def test_unknown_format(self):
+        """测试不支持的格式"""
+        with self.assertRaises(ValueError):
+            self.importer.import_columnar('missing.csv', 'csv')
+
+
+
+class TestCsvImport(unittest.TestCase):
+    """CSV 导入测试类"""
+
+    @classmethod
+    def setUpClass(cls):
+        """测试类初始化"""
+        cls.test_db_path = 'data/test_csv_importer.db'
+        cls.db_manager = DatabaseManager(cls.test_db_path)
+        cls.db_manager.init_database()
+        cls.db_manager.execute_update(
+            "INSERT OR IGNORE INTO city_config (id, city_name, longitude, latitude, region) VALUES (1, '南宁', 108.37, 22.82, '广西')"
+        )
+        cls.importer = DataImporter(cls.db_manager)
+
+    @classmethod
+    def tearDownClass(cls):
+        """测试类清理"""
+        if os.path.exists(cls.test_db_path):
+            os.remove(cls.test_db_path)
+
+    def setUp(self):
+        """每个测试前清空数据"""
+        self.db_manager.delete_weather_data({'city_id': 1})
+
+    def _stored(self, fields):
+        """读取城市1的全部数据"""
+        return [row for chunk in self.db_manager.iter_weather_rows({'city_id': 1}, fields) for row in chunk]
+
+    def _index_names(self):
+        """weather_data 上的全部索引名称"""
+        return {
+            row['name'] for row in self.db_manager.execute_query(
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'weather_data'"
+            )
+        }
+
+    def test_exported_csv_roundtrip(self):
+        """测试导出的中文表头CSV（城市名称、日期/时间分列、天气代码标签）可直接导回"""
+        rows = [(dt, temp, 61.0 if h % 2 else None, precip) for h, (dt, temp, precip, _) in enumerate(make_rows('2024-01-01', 20.1))]
+        columns = ['datetime', 'temperature_2m', 'weather_code', 'precipitation']
+        content = b''.join(DataExporter().iter_csv([rows], columns, city_name='南宁'))
+
+        result = self.importer.import_file(BytesIO(content), 'csv', batch_size=10)
+
+        self.assertEqual(result['rows'], 24)
+        self.assertEqual(result['cities'], [1])
+        self.assertEqual(sorted(result['fields']), sorted(columns[1:]))
+        self.assertEqual(self._stored(columns[1:]), rows)
+
+    def test_column_map_and_city(self):
+        """测试列名映射、指定城市、带时区的时间与缺失时间的行"""
+        content = (
+            "obs_time,temp,note\n"
+            "2024-01-01 08:00:00+08:00,20.5,a\n"
+            "2024-01-01T01:00Z,21.5,b\n"
+            ",22.5,c\n"
+        ).encode('utf-8')
+
+        result = self.importer.import_file(
+            BytesIO(content), 'csv', column_map={'obs_time': 'datetime', 'temp': 'temperature_2m'}, city_id=1
+        )
+
+        self.assertEqual((result['rows'], result['skipped'], result['fields']), (2, 1, ['temperature_2m']))
+        self.assertEqual(self._stored(['temperature_2m']), [('2024-01-01T08:00', 20.5), ('2024-01-01T09:00', 21.5)])
+
+        with self.assertRaises(ValueError):
+            self.importer.import_file(BytesIO(content), 'csv', column_map={'obs_time': 'datetime'}, city_id=1)
+
+    def test_unknown_city_id(self):
+        """测试 city_id 列或参数不在城市配置中时拒绝导入"""
+        content = "city_id,datetime,temperature_2m\n1,2024-01-01T00:00,20.5\n99,2024-01-01T00:00,21.5\n".encode('utf-8')
+        with self.assertRaisesRegex(ValueError, '未知的城市: 99'):
+            self.importer.import_file(BytesIO(content), 'csv')
+
+        content = "datetime,temperature_2m\n2024-01-01T00:00,20.5\n".encode('utf-8')
+        with self.assertRaisesRegex(ValueError, '未知的城市: 99'):
+            self.importer.import_file(BytesIO(content), 'csv', city_id=99)
+
+        self.assertEqual(self._stored(['temperature_2m']), [])
+
+    def test_failed_import_rolls_back(self):
+        """测试任一批次出错时整个文件不写入，且删除的索引被恢复"""
+        indexes = self._index_names()
+        lines = ["城市,日期时间,温度(°C)"] + [f"南宁,2024-01-01T{h:02d}:00,{h}" for h in range(24)] + ["柳州,2024-01-02T00:00,1"]
+
+        with self.assertRaises(ValueError):
+            self.importer.import_file(BytesIO('\n'.join(lines).encode('utf-8')), 'csv', batch_size=10, defer_indexes=True)
+
+        self.assertEqual(self._stored(['temperature_2m']), [])
+        self.assertEqual(self._index_names(), indexes)
+
+    def test_deferred_indexes_rebuilt(self):
+        """测试延迟索引的导入完成后索引齐全"""
+        indexes = self._index_names()
+        self.assertIn('idx_weather_city_datetime', indexes)
+        self.assertIn('idx_weather_updated_at', indexes)
+        lines = ["城市,日期时间,温度(°C)"] + [f"南宁,2024-01-01T{h:02d}:00,{h}" for h in range(24)]
+
+        result = self.importer.import_file(BytesIO('\n'.join(lines).encode('utf-8')), 'csv', batch_size=10, defer_indexes=True)
+
+        self.assertEqual(result['rows'], 24)
+        self.assertEqual(self._index_names(), indexes)
+
+    def test_unknown_format(self):
+        """测试不支持的格式"""
+        with self.assertRaises(ValueError):
+            self.importer.import_file('missing.xlsx', 'excel')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,204 @@
+"""
+数据库管理器单元测试
+测试DatabaseManager类的天气数据读取功能
+"""
+import unittest
+import sys
+import os
+import time
+from unittest import mock
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.models.database import DatabaseManager, SCHEMA_VERSION
+
+
+def make_hourly_records(city_id, date, hours=24, base_temp=20.0):
+    """生成一天的模拟小时数据"""
+    return [
+        {
+            'city_id': city_id,
+            'datetime': f"{date}T{h:02d}:00",
+            'temperature_2m': base_temp + h * 0.5,
+            'precipitation': 1.0 if h % 6 == 0 else 0.0,
+            'wind_speed_10m': None,
+        }
+        for h in range(hours)
+    ]
+
+
+class TestDatabaseManager(unittest.TestCase):
+    """数据库管理器测试类"""
+
+    @classmethod
+    def setUpClass(cls):
+        """测试类初始化"""
+        # 使用测试数据库
+        cls.test_db_path = 'data/test_database.db'
+        cls.db_manager = DatabaseManager(cls.test_db_path)
+
+        # 初始化数据库表结构
+        cls.db_manager.init_database()
+
+    @classmethod
+    def tearDownClass(cls):
+        """测试类清理"""
+        # 删除测试数据库
+        if os.path.exists(cls.test_db_path):
+            os.remove(cls.test_db_path)
+
+    def setUp(self):
+        """每个测试前写入数据"""
+        for city_id in (1, 2):
+            self.db_manager.delete_weather_data({'city_id': city_id})
+        self.db_manager.bulk_insert('weather_data', make_hourly_records(1, '2024-01-01'))
+        self.db_manager.bulk_insert('weather_data', make_hourly_records(1, '2024-01-02'))
+        self.db_manager.bulk_insert('weather_data', make_hourly_records(2, '2024-01-01', base_temp=10.0))
+
+    def test_iter_weather_rows_chunks(self):
+        """测试分块迭代读取"""
+        filters = {'city_id': 1, 'start_date': '2024-01-01T00:00', 'end_date': '2024-01-02T23:59'}
+        chunks = list(self.db_manager.iter_weather_rows(filters, ['temperature_2m'], chunk_size=10))
+
+        self.assertEqual(sum(len(c) for c in chunks), 48)
+        self.assertEqual(len(chunks[0]), 10)
+        self.assertEqual(chunks[0][0], ('2024-01-01T00:00', 20.0))
+
+    def test_iter_weather_rows_with_city(self):
+        """测试多城市读取时行首包含城市ID"""
+        filters = {'city_ids': [1, 2], 'start_date': '2024-01-01T00:00', 'end_date': '2024-01-01T23:59'}
+        rows = [row for chunk in self.db_manager.iter_weather_rows(filters, ['temperature_2m'], with_city=True)
+                for row in chunk]
+
+        self.assertEqual(len(rows), 48)
+        self.assertEqual(rows[0][0], 1)
+        self.assertEqual(rows[-1][0], 2)
+
+    def test_get_weather_columns(self):
+        """测试列式读取并忽略未知字段"""
+        filters = {'city_id': 2}
+        columns = self.db_manager.get_weather_columns(filters, ['temperature_2m', 'unknown; DROP TABLE x'])
+
+        self.assertEqual(list(columns.keys()), ['datetime', 'temperature_2m'])
+        self.assertEqual(len(columns['datetime']), 24)
+        self.assertEqual(columns['temperature_2m'][1], 10.5)
+
+    def test_count_weather_fields(self):
+        """测试字段非空计数"""
+        counts = self.db_manager.count_weather_fields(
+            {'city_id': 1}, ['temperature_2m', 'wind_speed_10m']
+        )
+
+        self.assertEqual(counts['total'], 48)
+        self.assertEqual(counts['temperature_2m'], 48)
+        self.assertEqual(counts['wind_speed_10m'], 0)
+
+    def test_aggregate_weather_fields(self):
+        """测试单条SQL聚合的矩统计量"""
+        result = self.db_manager.aggregate_weather_fields(
+            {'city_id': 1}, ['temperature_2m', 'precipitation', 'wind_speed_10m']
+        )
+        temps = [20.0 + h * 0.5 for h in range(24)] * 2
+
+        self.assertEqual(result['total'], 48)
+        self.assertEqual(result['temperature_2m']['count'], 48)
+        self.assertAlmostEqual(result['temperature_2m']['sum'], sum(temps))
+        self.assertAlmostEqual(result['temperature_2m']['sum_sq'], sum(t * t for t in temps))
+        self.assertEqual(result['temperature_2m']['max'], 31.5)
+        self.assertEqual(result['precipitation']['positive'], 8)
+        self.assertEqual(result['wind_speed_10m']['count'], 0)
+
+    def test_count_weather_values(self):
+        """测试分类字段取值计数"""
+        counts = self.db_manager.count_weather_values({'city_id': 1}, 'precipitation')
+        self.assertEqual(counts, {0: 40, 1: 8})
+        self.assertEqual(self.db_manager.count_weather_values({'city_id': 1}, 'wind_speed_10m'), {})
+
+    def test_histogram_maintained_on_write(self):
+        """测试月直方图随写入与删除同步更新"""
+        full_month = self.db_manager.get_histogram_counts([1], 'temperature_2m', '2024-01-01', '2024-01-31')
+        self.assertEqual(sum(full_month[1]), 48)
+        
+        # 不完整月份从原始数据即时分箱，结果与整月直方图口径一致
+        partial = self.db_manager.get_histogram_counts([1], 'temperature_2m', '2024-01-02', '2024-01-02')
+        self.assertEqual(sum(partial[1]), 24)
+        self.assertEqual(partial[0][0], 700)  # (20.0 - (-50)) / 0.1
+        
+        self.db_manager.delete_weather_data({'city_id': 1, 'start_date': '2024-01-02T00:00'})
+        full_month = self.db_manager.get_histogram_counts([1, 2], 'temperature_2m', '2024-01-01', '2024-01-31')
+        self.assertEqual(sum(full_month[1]), 48)
+
+    def test_histogram_backfill_runs_once(self):
+        """测试直方图回填以 user_version 标记，回填后直方图仍为空也不会每次启动重新扫描"""
+        self.db_manager.execute_update("DELETE FROM weather_histogram")
+        self.db_manager.execute_update("PRAGMA user_version = 0")
+
+        with mock.patch.object(DatabaseManager, '_refresh_histograms') as refresh:
+            self.db_manager.init_database()
+            self.assertEqual(refresh.call_count, 1)
+            self.db_manager.init_database()
+            self.assertEqual(refresh.call_count, 1)
+
+        self.assertEqual(self.db_manager.execute_query("PRAGMA user_version")[0]['user_version'], SCHEMA_VERSION)
+
+        # 未标记时真正回填，结果与写入时维护的直方图一致
+        self.db_manager.execute_update("PRAGMA user_version = 0")
+        self.db_manager.init_database()
+        full_month = self.db_manager.get_histogram_counts([1], 'temperature_2m', '2024-01-01', '2024-01-31')
+        self.assertEqual(sum(full_month[1]), 48)
+
+    def test_year_versions(self):
+        """测试按年份的数据版本只在写入或删除涉及的年份递增"""
+        before = self.db_manager.get_year_versions([1, 3], 2023, 2025)
+        self.assertEqual(before[3], [0, 0, 0])
+
+        self.db_manager.bulk_insert('weather_data', make_hourly_records(1, '2025-06-01', hours=1))
+        after = self.db_manager.get_year_versions([1], 2023, 2025)[1]
+        self.assertEqual(after[:2], before[1][:2])
+        self.assertEqual(after[2], before[1][2] + 1)
+
+        self.db_manager.delete_weather_data({'city_id': 1, 'start_date': '2024-01-02T00:00'})
+        deleted = self.db_manager.get_year_versions([1], 2023, 2025)[1]
+        self.assertEqual(deleted, [after[0], after[1] + 1, after[2] + 1])
+
+    def test_change_cursor(self):
+        """测试每次写入都更新 updated_at，游标单调递增且可按游标筛选变化的行"""
+        cursor = self.db_manager.get_change_cursor()
+        self.assertTrue(cursor.endswith('Z'))
+
+        self.db_manager.upsert_weather_data([{'city_id': 1, 'datetime': '2024-01-01T03:00', 'temperature_2m': 0.0}])
+        self.db_manager.insert_weather_data({'city_id': 2, 'datetime': '2024-01-01T04:00', 'temperature_2m': 0.0})
+        latest = self.db_manager.get_change_cursor()
+        self.assertGreater(latest, cursor)
+
+        rows = [
+            row for chunk in self.db_manager.iter_weather_rows(
+                {'changed_after': cursor, 'changed_until': latest}, ['temperature_2m'], with_city=True
+            )
+            for row in chunk
+        ]
+        self.assertEqual(rows, [(1, '2024-01-01T03:00', 0.0), (2, '2024-01-01T04:00', 0.0)])
+
+    def test_write_during_streaming_read(self):
+        """测试分块读取未结束（慢速客户端）时写入可以提交"""
+        chunks = self.db_manager.iter_weather_rows({'city_id': 1}, ['temperature_2m'], chunk_size=5)
+        first = next(chunks)
+        try:
+            started = time.time()
+            self.db_manager.upsert_weather_data([
+                {'city_id': 1, 'datetime': '2024-01-02T00:00', 'temperature_2m': 99.0}
+            ])
+            self.assertLess(time.time() - started, 1.0)
+            # 已开始的读取保持开始时的快照
+            rows = first + [row for chunk in chunks for row in chunk]
+            self.assertEqual(len(rows), 48)
+            self.assertEqual(rows[24], ('2024-01-02T00:00', 20.0))
+        finally:
+            chunks.close()
+
+        filters = {'city_id': 1, 'start_date': '2024-01-02T00:00', 'end_date': '2024-01-02T00:00'}
+        self.assertEqual(self.db_manager.get_weather_data(filters)[0]['temperature_2m'], 99.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+"""
+降采样服务单元测试
+测试LTTB与最小/最大值分桶算法
+"""
+import unittest
+import sys
+import os
+import numpy as np
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.services.downsampler import (
+    lttb_indices, minmax_indices, select_indices, downsample_columns
+)
+
+
+class TestDownsampler(unittest.TestCase):
+    """降采样测试类"""
+
+    def setUp(self):
+        """构造带日变化和尖峰的模拟序列"""
+        hours = np.arange(24 * 365)
+        self.values = 20 + 8 * np.sin(hours * 2 * np.pi / 24)
+        self.values[5000] = 45.0  # 尖峰
+        self.values[7000] = -10.0  # 低谷
+
+    def test_lttb_keeps_endpoints_and_extremes(self):
+        """测试LTTB保留首末点和极值"""
+        indices = lttb_indices(self.values, 500)
+
+        self.assertEqual(len(indices), 500)
+        self.assertEqual(indices[0], 0)
+        self.assertEqual(indices[-1], len(self.values) - 1)
+        self.assertTrue(np.all(np.diff(indices) > 0))
+        self.assertIn(5000, indices)
+        self.assertIn(7000, indices)
+
+    def test_lttb_short_series_unchanged(self):
+        """测试短序列不做降采样"""
+        indices = lttb_indices(np.array([1.0, 2.0, 3.0]), 10)
+        self.assertEqual(indices.tolist(), [0, 1, 2])
+
+    def test_minmax_keeps_extremes(self):
+        """测试分桶最小/最大值保留极值"""
+        indices = minmax_indices(self.values, 100)
+
+        self.assertLessEqual(len(indices), 202)
+        self.assertIn(5000, indices)
+        self.assertIn(7000, indices)
+
+    def test_select_indices_shared_axis(self):
+        """测试多字段共享时间轴不超过点数上限且忽略空值"""
+        n = len(self.values)
+        columns = {
+            'datetime': [str(i) for i in range(n)],
+            'temperature_2m': self.values.tolist(),
+            'precipitation': [None if i % 2 else float(i % 7) for i in range(n)],
+        }
+
+        for method in ('lttb', 'minmax'):
+            indices = select_indices(columns, ['temperature_2m', 'precipitation'], 600, method)
+            self.assertLessEqual(len(indices), 600)
+            self.assertIn(5000, indices)
+
+    def test_downsample_columns(self):
+        """测试列式数据降采样"""
+        n = len(self.values)
+        columns = {
+            'datetime': [str(i) for i in range(n)],
+            'temperature_2m': self.values.tolist(),
+        }
+
+        result, total = downsample_columns(columns, ['temperature_2m'], 300)
+
+        self.assertEqual(total, n)
+        self.assertEqual(len(result['datetime']), 300)
+        self.assertEqual(len(result['temperature_2m']), 300)
+        self.assertEqual(result['temperature_2m'][result['datetime'].index('5000')], 45.0)
+
+    def test_invalid_method(self):
+        """测试不支持的算法"""
+        columns = {'datetime': ['a'] * 10, 'temperature_2m': [1.0] * 10}
+        with self.assertRaises(ValueError):
+            select_indices(columns, ['temperature_2m'], 5, 'mean')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+"""
+新能源资源分析单元测试
+测试辐照量、峰值日照时数、风功率密度与容量系数的计算
+"""
+import unittest
+import sys
+import os
+
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.services.energy_analyzer import (
+    solar_resource, wind_resource, screen_site, air_density, turbine_power,
+    validate_power_curve, DEFAULT_POWER_CURVE
+)
+
+
+def make_columns(days=3, start='2024-01-30'):
+    """生成白天 500 W/m²、100米风速恒定 36 km/h (10 m/s) 的模拟数据"""
+    index = pd.date_range(start, periods=days * 24, freq='h')
+    daylight = (index.hour >= 6) & (index.hour < 18)
+    return {
+        'datetime': index.strftime('%Y-%m-%dT%H:%M').tolist(),
+        'shortwave_radiation': np.where(daylight, 500.0, 0.0).tolist(),
+        'diffuse_radiation': np.where(daylight, 100.0, 0.0).tolist(),
+        'wind_speed_100m': [36.0] * len(index),
+    }
+
+
+class TestEnergyAnalyzer(unittest.TestCase):
+    """新能源资源分析测试类"""
+
+    def test_daily_solar_resource(self):
+        """测试逐日辐照量、峰值日照时数与光伏发电量"""
+        result = solar_resource(make_columns())
+
+        self.assertEqual(result['periods'], ['2024-01-30', '2024-01-31', '2024-02-01'])
+        series = result['series']
+        self.assertEqual(series['irradiation_kwh_m2'], [6.0, 6.0, 6.0])
+        self.assertEqual(series['irradiation_mj_m2'], [21.6, 21.6, 21.6])
+        self.assertEqual(series['peak_sun_hours'], [6.0, 6.0, 6.0])
+        self.assertEqual(series['diffuse_kwh_m2'], [1.2, 1.2, 1.2])
+        self.assertNotIn('dni_kwh_m2', series)
+        # 无气温时不做温度修正：6 kWh/m² x PR 0.8
+        self.assertEqual(series['pv_yield_kwh_per_kwp'], [4.8, 4.8, 4.8])
+        self.assertEqual(result['summary']['pv_capacity_factor'], 0.2)
+
+    def test_monthly_peak_sun_hours_is_daily_average(self):
+        """测试按月统计时峰值日照时数为日均值"""
+        result = solar_resource(make_columns(), period='month')
+
+        self.assertEqual(result['periods'], ['2024-01', '2024-02'])
+        self.assertEqual(result['series']['irradiation_kwh_m2'], [12.0, 6.0])
+        self.assertEqual(result['series']['peak_sun_hours'], [6.0, 6.0])
+        self.assertEqual(result['summary']['avg_peak_sun_hours'], 6.0)
+
+    def test_temperature_derating(self):
+        """测试高温降低光伏出力"""
+        columns = make_columns(days=1)
+        columns['temperature_2m'] = [35.0] * 24
+        hot = solar_resource(columns)['summary']['pv_yield_kwh_per_kwp']
+        columns['temperature_2m'] = [0.0] * 24
+        cold = solar_resource(columns)['summary']['pv_yield_kwh_per_kwp']
+        self.assertLess(hot, 4.8)
+        self.assertGreater(cold, hot)
+
+    def test_air_density(self):
+        """测试空气密度：标准大气约 1.225 kg/m³，缺失处回退为标准值"""
+        density = air_density(np.array([1013.25, np.nan]), np.array([15.0, 15.0]), 2)
+        self.assertAlmostEqual(density[0], 1.225, places=3)
+        self.assertEqual(density[1], 1.225)
+        self.assertTrue(np.all(air_density(None, None, 3) == 1.225))
+
+    def test_turbine_power_curve(self):
+        """测试功率曲线插值、切出风速与缺失值"""
+        power = turbine_power(np.array([2.0, 3.5, 10.0, 15.0, 30.0, np.nan]), DEFAULT_POWER_CURVE)
+        np.testing.assert_allclose(power[:5], [0.0, 33.0, 1341.0, 2000.0, 0.0])
+        self.assertTrue(np.isnan(power[5]))
+
+    def test_wind_resource(self):
+        """测试风功率密度、发电量与容量系数"""
+        result = wind_resource(make_columns(days=2))
+
+        summary = result['summary']
+        self.assertEqual(summary['hours'], 48)
+        self.assertAlmostEqual(summary['mean_speed_ms'], 10.0)
+        self.assertAlmostEqual(summary['power_density_w_m2'], 612.5)
+        self.assertAlmostEqual(summary['energy_mwh'], 1.341 * 48)
+        self.assertAlmostEqual(summary['capacity_factor'], 0.6705)
+        self.assertEqual(result['series']['energy_mwh'], [32.184, 32.184])
+
+        self.assertEqual(wind_resource(make_columns(), speed_field='wind_speed_80m')['periods'], [])
+
+    def test_screen_site(self):
+        """测试选址初筛汇总"""
+        result = screen_site(make_columns())
+        self.assertEqual(result['solar']['irradiation_kwh_m2'], 18.0)
+        self.assertEqual(result['wind']['hours'], 72)
+
+    def test_validate_power_curve(self):
+        """测试功率曲线校验"""
+        self.assertIsNone(validate_power_curve(DEFAULT_POWER_CURVE))
+        self.assertIsNotNone(validate_power_curve({'speeds': [0, 5], 'power_kw': [0]}))
+        self.assertIsNotNone(validate_power_curve({'speeds': [5, 0], 'power_kw': [0, 100]}))
+        self.assertIsNotNone(validate_power_curve([1, 2]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+"""
+导出文件缓存单元测试
+测试ExportCache的缓存键、读写与淘汰
+"""
+import unittest
+import sys
+import os
+import time
+import shutil
+from io import BytesIO
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.services.export_cache import ExportCache
+
+
+class TestExportCache(unittest.TestCase):
+    """导出文件缓存测试类"""
+
+    def setUp(self):
+        """每个测试使用独立的缓存目录"""
+        self.cache_dir = 'data/test_export_cache'
+        self.cache = ExportCache(self.cache_dir, max_size=250)
+
+    def tearDown(self):
+        """清理缓存目录"""
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def test_make_key(self):
+        """测试缓存键与参数顺序无关、随数据版本变化"""
+        key = ExportCache.make_key({'cities': [1], 'versions': {1: [3]}})
+        self.assertEqual(key, ExportCache.make_key({'versions': {1: [3]}, 'cities': [1]}))
+        self.assertNotEqual(key, ExportCache.make_key({'cities': [1], 'versions': {1: [4]}}))
+
+    def test_put_and_get(self):
+        """测试写入后命中，源文件保持打开"""
+        self.assertIsNone(self.cache.get('abc', '.xlsx'))
+
+        source = BytesIO(b'workbook')
+        path = self.cache.put('abc', '.xlsx', source)
+        self.assertFalse(source.closed)
+        with self.cache.get('abc', '.xlsx') as f:
+            self.assertEqual(f.name, path)
+            self.assertEqual(f.read(), b'workbook')
+        self.assertEqual(os.listdir(self.cache_dir), ['abc.xlsx'])
+
+    def test_get_survives_eviction(self):
+        """测试命中后文件被并发淘汰时，已返回的文件仍可读取"""
+        self.cache.put('abc', '.xlsx', BytesIO(b'workbook'))
+        with self.cache.get('abc', '.xlsx') as f:
+            self.cache.clear()
+            self.assertEqual(f.read(), b'workbook')
+        self.assertIsNone(self.cache.get('abc', '.xlsx'))
+
+    def test_evict_least_recently_used(self):
+        """测试超过上限时淘汰最久未使用的文件"""
+        self.cache.put('a', '.xlsx', BytesIO(b'x' * 100))
+        self.cache.put('b', '.xlsx', BytesIO(b'x' * 100))
+        past = time.time() - 60
+        os.utime(os.path.join(self.cache_dir, 'a.xlsx'), (past, past))
+        os.utime(os.path.join(self.cache_dir, 'b.xlsx'), (past - 60, past - 60))
+
+        # 命中更新访问时间，a 成为最近使用
+        self.cache.get('a', '.xlsx').close()
+        self.cache.put('c', '.xlsx', BytesIO(b'x' * 100))
+
+        self.assertEqual(sorted(os.listdir(self.cache_dir)), ['a.xlsx', 'c.xlsx'])
+
+    def test_oversized_file_is_kept(self):
+        """测试刚写入的文件即使超过上限也不会被立即淘汰"""
+        path = self.cache.put('big', '.xlsx', BytesIO(b'x' * 500))
+        self.assertTrue(os.path.exists(path))
+
+
+if __name__ == '__main__':
+    unittest.main()
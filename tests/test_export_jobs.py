@@ -0,0 +1,180 @@
+"""
+异步导出任务单元测试
+测试ExportJobManager的任务执行、进度、取消与过期清理
+"""
+import unittest
+import sys
+import os
+import time
+import tempfile
+import threading
+from io import BytesIO
+from unittest import mock
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.services import export_jobs
+from backend.services.export_jobs import (
+    ExportJobManager, JOB_DONE, JOB_FAILED
+)
+
+
+def wait_for(manager, job_id, timeout=5.0):
+    """等待任务结束"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = manager.get(job_id)
+        if job is None or job['finished_at'] is not None:
+            return job
+        time.sleep(0.01)
+    raise AssertionError("导出任务超时")
+
+
+class TestExportJobManager(unittest.TestCase):
+    """异步导出任务管理器测试类"""
+
+    def setUp(self):
+        """每个测试使用独立的导出目录"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.export_dir = self.temp_dir.name
+        self.manager = ExportJobManager(self.export_dir, max_workers=1, expire_hours=1)
+
+    def tearDown(self):
+        """清理导出目录"""
+        self.manager.shutdown()
+        self.temp_dir.cleanup()
+
+    def test_iterator_result(self):
+        """测试字节块结果写入文件并报告进度"""
+        def produce(progress):
+            for i in range(3):
+                progress(i, 3)
+                yield f"chunk{i}\n".encode()
+
+        job = self.manager.submit(produce, 'a.csv', 'text/csv')
+        self.assertNotIn('path', job)
+        job = wait_for(self.manager, job['job_id'])
+
+        self.assertEqual(job['status'], JOB_DONE)
+        self.assertEqual(job['progress'], 1.0)
+        path = self.manager.result_path(job['job_id'])
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), b'chunk0\nchunk1\nchunk2\n')
+        self.assertEqual(job['size'], os.path.getsize(path))
+
+    def test_file_result(self):
+        """测试文件对象结果被复制并关闭"""
+        source = BytesIO(b'x' * 100)
+        job = wait_for(self.manager, self.manager.submit(lambda progress: source, 'a.xlsx', 'x')['job_id'])
+        self.assertEqual(job['size'], 100)
+        self.assertTrue(source.closed)
+
+    def test_failed_job(self):
+        """测试生成失败时记录错误且不留下文件"""
+        def produce(progress):
+            yield b'partial'
+            raise ValueError('boom')
+
+        job = wait_for(self.manager, self.manager.submit(produce, 'a.csv', 'text/csv')['job_id'])
+        self.assertEqual(job['status'], JOB_FAILED)
+        self.assertEqual(job['error'], 'boom')
+        self.assertIsNone(self.manager.result_path(job['job_id']))
+        self.assertEqual(os.listdir(self.export_dir), [])
+
+    def test_cancel_running_job(self):
+        """测试取消运行中的任务"""
+        started = threading.Event()
+        release = threading.Event()
+
+        def produce(progress):
+            started.set()
+            release.wait(5)
+            progress(1, 2)
+            yield b'never'
+
+        job_id = self.manager.submit(produce, 'a.csv', 'text/csv')['job_id']
+        started.wait(5)
+        self.assertTrue(self.manager.cancel(job_id))
+        release.set()
+        self.manager.shutdown()
+
+        self.assertIsNone(self.manager.get(job_id))
+        self.assertEqual(os.listdir(self.export_dir), [])
+        self.assertFalse(self.manager.cancel(job_id))
+
+    def test_cleanup_expired(self):
+        """测试过期任务及文件被删除"""
+        job_id = self.manager.submit(lambda progress: iter([b'data']), 'a.csv', 'text/csv')['job_id']
+        wait_for(self.manager, job_id)
+        path = self.manager.result_path(job_id)
+
+        self.assertEqual(self.manager.cleanup_expired(), 0)
+        self.manager.jobs[job_id]['finished_at'] -= 2 * 3600
+        self.assertEqual(self.manager.cleanup_expired(), 1)
+        self.assertIsNone(self.manager.get(job_id))
+        self.assertFalse(os.path.exists(path))
+
+    def test_cleanup_on_get(self):
+        """测试查询任务时清理过期任务"""
+        job_id = self.manager.submit(lambda progress: iter([b'data']), 'a.csv', 'text/csv')['job_id']
+        wait_for(self.manager, job_id)
+        path = self.manager.result_path(job_id)
+
+        self.manager.jobs[job_id]['finished_at'] -= 2 * 3600
+        self.assertIsNone(self.manager.get(job_id))
+        self.assertFalse(os.path.exists(path))
+
+    def test_cancel_during_rename(self):
+        """测试完成重命名时到达的取消请求不留下结果文件"""
+        job_id = None
+        cancel_threads = []
+        real_replace = os.replace
+
+        def replace(src, dst):
+            # 在重命名前从另一线程发起取消
+            thread = threading.Thread(target=self.manager.cancel, args=(job_id,))
+            thread.start()
+            cancel_threads.append(thread)
+            time.sleep(0.05)
+            real_replace(src, dst)
+
+        started = threading.Event()
+
+        def produce(progress):
+            started.wait(5)
+            yield b'data'
+
+        with mock.patch.object(export_jobs.os, 'replace', side_effect=replace):
+            job_id = self.manager.submit(produce, 'a.csv', 'text/csv')['job_id']
+            started.set()
+            self.manager.shutdown()
+        for thread in cancel_threads:
+            thread.join(5)
+
+        self.assertEqual(len(cancel_threads), 1)
+        self.assertIsNone(self.manager.get(job_id))
+        self.assertEqual(os.listdir(self.export_dir), [])
+
+    def test_startup_removes_expired_job_files(self):
+        """测试重启后只清理过期的任务结果文件"""
+        old = time.time() - 2 * 3600
+        names = {
+            'expired': 'a' * 32,
+            'expired_part': 'b' * 32 + '.part',
+            'recent': 'c' * 32,
+            'other': 'notes.txt',
+        }
+        for key, name in names.items():
+            path = os.path.join(self.export_dir, name)
+            with open(path, 'wb') as f:
+                f.write(b'old')
+            if key != 'recent':
+                os.utime(path, (old, old))
+
+        ExportJobManager(self.export_dir, expire_hours=1).shutdown()
+        self.assertEqual(sorted(os.listdir(self.export_dir)), sorted([names['recent'], names['other']]))
+
+
+if __name__ == '__main__':
+    unittest.main()
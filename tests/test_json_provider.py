@@ -0,0 +1,91 @@
+"""
+JSON序列化提供器单元测试
+测试FastJSONProvider对numpy/pandas类型和NaN的处理
+"""
+import unittest
+import sys
+import os
+import json
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from flask import Flask
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend import json_provider
+from backend.json_provider import FastJSONProvider, dumps_compact
+
+
+SAMPLE = {
+    'avg': np.float64(21.5),
+    'count': np.int64(3),
+    'values': np.array([1.0, np.nan, 3.0]),
+    'missing': float('nan'),
+    'series': pd.Series([1, 2]),
+    'timestamp': pd.Timestamp('2024-01-01T06:00'),
+    'name': '南宁',
+}
+
+EXPECTED = {
+    'avg': 21.5,
+    'count': 3,
+    'values': [1.0, None, 3.0],
+    'missing': None,
+    'series': [1, 2],
+    'timestamp': '2024-01-01T06:00:00',
+    'name': '南宁',
+}
+
+
+class TestFastJSONProvider(unittest.TestCase):
+    """JSON序列化提供器测试类"""
+
+    def setUp(self):
+        """创建使用该提供器的应用"""
+        self.app = Flask(__name__)
+        self.app.json = FastJSONProvider(self.app)
+
+    def test_dumps_native_types(self):
+        """测试numpy/pandas类型和NaN直接序列化"""
+        self.assertEqual(json.loads(self.app.json.dumps(SAMPLE)), EXPECTED)
+
+    def test_dumps_stdlib_fallback(self):
+        """测试未安装orjson时的标准库回退路径"""
+        with mock.patch.object(json_provider, 'orjson', None):
+            self.assertEqual(json.loads(self.app.json.dumps(SAMPLE)), EXPECTED)
+            self.assertEqual(json.loads(dumps_compact(SAMPLE)), EXPECTED)
+
+    def test_jsonify_response(self):
+        """测试jsonify输出UTF-8且不转义中文"""
+        with self.app.app_context():
+            from flask import jsonify
+            response = jsonify({'code': 200, 'data': SAMPLE})
+
+        self.assertEqual(response.mimetype, 'application/json')
+        self.assertIn('南宁'.encode('utf-8'), response.data)
+        self.assertEqual(json.loads(response.data)['data'], EXPECTED)
+
+    @unittest.skipIf(json_provider.orjson is None, "未安装orjson")
+    def test_jsonify_debug_uses_orjson(self):
+        """测试调试模式下缩进输出仍使用orjson"""
+        self.app.debug = True
+        with self.app.app_context(), \
+                mock.patch.object(json_provider.json, 'dumps', side_effect=AssertionError):
+            from flask import jsonify
+            response = jsonify({'code': 200, 'data': SAMPLE})
+
+        self.assertTrue(response.data.startswith(b'{\n  "code": 200'))
+        self.assertTrue(response.data.endswith(b'\n'))
+        self.assertEqual(json.loads(response.data)['data'], EXPECTED)
+
+    def test_dumps_compact_keeps_order(self):
+        """测试紧凑序列化保持键顺序"""
+        line = dumps_compact({'type': 'meta', 'b': 1, 'a': np.float32(0.5)})
+        self.assertEqual(line, '{"type":"meta","b":1,"a":0.5}')
+
+
+if __name__ == '__main__':
+    unittest.main()
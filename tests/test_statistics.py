@@ -0,0 +1,122 @@
+"""
+流式统计量单元测试
+测试RunningStats、CodeHistogram与SummaryAccumulator的分块累积与合并
+"""
+import unittest
+import sys
+import os
+import json
+
+import numpy as np
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.services.statistics import RunningStats, CodeHistogram, FixedBinHistogram
+from backend.services.data_analyzer import DataAnalyzer, SummaryAccumulator
+from tests.test_data_analyzer import make_records
+
+
+class TestRunningStats(unittest.TestCase):
+    """可合并统计量测试类"""
+
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.values = rng.normal(1000, 3, 1000)
+        self.values[::50] = np.nan
+
+    def test_chunked_update_matches_full(self):
+        """测试分块累积与一次性计算一致"""
+        running = RunningStats()
+        for chunk in np.array_split(self.values, 7):
+            running.update(chunk)
+
+        valid = self.values[~np.isnan(self.values)]
+        self.assertEqual(running.count, len(valid))
+        self.assertAlmostEqual(running.mean, valid.mean(), places=9)
+        self.assertAlmostEqual(running.std, valid.std(ddof=1), places=9)
+        self.assertEqual(running.maximum, valid.max())
+
+    def test_merge_and_roundtrip(self):
+        """测试分段合并及序列化恢复"""
+        left = RunningStats().update(self.values[:300])
+        right = RunningStats().update(self.values[300:])
+        restored = RunningStats.from_dict(json.loads(json.dumps(left.to_dict())))
+
+        merged = restored + right
+        full = RunningStats().update(self.values)
+        self.assertEqual(merged.count, full.count)
+        self.assertAlmostEqual(merged.m2, full.m2, places=6)
+        self.assertEqual(RunningStats().merge(RunningStats()).count, 0)
+
+    def test_from_moments(self):
+        """测试由数据库矩统计量构造"""
+        values = [1.0, 2.0, 4.0]
+        running = RunningStats.from_moments(3, 7.0, 21.0, 1.0, 4.0, 3)
+        self.assertAlmostEqual(running.std, np.std(values, ddof=1))
+        self.assertIsNone(RunningStats().update([5.0]).std)
+
+
+class TestCodeHistogram(unittest.TestCase):
+    """频数直方图测试类"""
+
+    def test_mode_after_merge(self):
+        """测试合并后的众数，并列时取最小值"""
+        left = CodeHistogram().update([3, 3, 61, None])
+        right = CodeHistogram().update([61, 0])
+        merged = CodeHistogram.from_dict(json.loads(json.dumps(left.to_dict()))) + right
+
+        self.assertEqual(merged.mode, 3)
+        self.assertEqual(merged.count, 5)
+        self.assertIsNone(CodeHistogram().mode)
+
+
+class TestFixedBinHistogram(unittest.TestCase):
+    """固定分箱直方图测试类"""
+
+    def test_quantiles_within_bin_width(self):
+        """测试合并后的近似分位数误差不超过箱宽"""
+        rng = np.random.default_rng(2)
+        values = rng.normal(25, 6, 20000)
+        left = FixedBinHistogram(-50.0, 0.1, 1000).update(values[:7000])
+        right = FixedBinHistogram(-50.0, 0.1, 1000).update(values[7000:])
+        merged = left.merge(right)
+
+        self.assertEqual(merged.count, len(values))
+        for p, approx in zip((5, 50, 95), merged.quantiles([5, 50, 95])):
+            self.assertAlmostEqual(approx, np.percentile(values, p), delta=0.1)
+
+    def test_add_counts_and_clamp(self):
+        """测试按箱号累加以及越界值计入首末箱"""
+        histogram = FixedBinHistogram(0.0, 1.0, 10).update([-5.0, 3.5, 99.0, None])
+        histogram.add_counts([3, 3], [1, 2])
+
+        self.assertEqual(histogram.nonzero_bins(), {'edges': [0.0, 3.0, 9.0], 'counts': [1, 4, 1]})
+        self.assertEqual(FixedBinHistogram(0.0, 1.0, 10).quantiles([50]), [None])
+        with self.assertRaises(ValueError):
+            histogram.merge(FixedBinHistogram(0.0, 0.5, 10))
+
+
+class TestSummaryAccumulator(unittest.TestCase):
+    """统计摘要累积器测试类"""
+
+    def test_daily_partials_match_summary(self):
+        """测试按块累积再合并的摘要与calculate_summary一致"""
+        records = make_records(480)
+        fields = list(records[0].keys())
+        expected = DataAnalyzer().calculate_summary(records)
+
+        partials = []
+        for start in range(0, len(records), 24):
+            rows = [tuple(r[f] for f in fields) for r in records[start:start + 24]]
+            partials.append(SummaryAccumulator().update_rows(rows, fields).to_dict())
+
+        combined = SummaryAccumulator()
+        for partial in partials:
+            combined.merge(SummaryAccumulator.from_dict(partial))
+
+        self.assertEqual(combined.summary(), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+"""
+天气代码统计单元测试
+测试分组众数、代码分布与导出每日主要天气
+"""
+import unittest
+import sys
+import os
+
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.services.weather_codes import (
+    grouped_code_counts, grouped_modes, code_distribution, weather_code_label, weather_code_labels
+)
+from backend.services.data_exporter import DataExporter
+
+
+class TestWeatherCodes(unittest.TestCase):
+    """天气代码统计测试类"""
+
+    def test_grouped_modes_match_pandas(self):
+        """测试分组众数与 pandas mode 一致（并列取最小代码）"""
+        rng = np.random.default_rng(0)
+        codes = rng.choice([0, 1, 2, 3, 61, 63, 95], size=2000).astype(np.float64)
+        codes[rng.choice(2000, 100, replace=False)] = np.nan
+        groups = rng.integers(0, 40, size=2000)
+
+        modes, has_values = grouped_modes(codes, groups, 41)
+        expected = pd.Series(codes).groupby(groups).agg(lambda x: x.mode().iloc[0])
+        np.testing.assert_array_equal(modes[:40], expected.to_numpy().astype(np.int64))
+        self.assertTrue(has_values[:40].all())
+        self.assertFalse(has_values[40])
+
+    def test_code_distribution(self):
+        """测试代码分布"""
+        values, counts = grouped_code_counts(np.array([61, 3, 61, np.nan, 95, 61]))
+        self.assertEqual(values.tolist(), [3, 61, 95])
+        self.assertEqual(code_distribution(values, counts[0]), {'3': 1, '61': 3, '95': 1})
+
+        values, counts = grouped_code_counts(np.array([np.nan]))
+        self.assertEqual(counts.shape, (1, 0))
+        self.assertFalse(grouped_modes(np.array([np.nan]))[1][0])
+
+    def test_weather_code_labels(self):
+        """测试批量格式化与逐个格式化结果一致"""
+        codes = [61.0, np.nan, 0.0, 7.0, 150.0, 95.0]
+        self.assertEqual(
+            weather_code_labels(codes).tolist(),
+            [weather_code_label(code) for code in codes]
+        )
+        self.assertEqual(len(weather_code_labels([])), 0)
+
+    def test_weather_code_label(self):
+        """测试天气代码格式化"""
+        self.assertEqual(weather_code_label(61.0), '61 (小雨)')
+        self.assertEqual(weather_code_label(7), '7 (未知)')
+        self.assertIsNone(weather_code_label(float('nan')))
+
+    def test_daily_main_weather(self):
+        """测试导出每日汇总的主要天气"""
+        df = pd.DataFrame({
+            '日期': ['2024-01-02'] * 3 + ['2024-01-01'] * 4,
+            '城市': ['南宁'] * 7,
+            '天气代码': ['61 (小雨)', '3 (阴天)', '61 (小雨)', '3 (阴天)', '2 (多云)', '2 (多云)', None],
+        })
+        groups = df.groupby(['日期', '城市'], sort=True).ngroup().to_numpy()
+        modes = DataExporter._daily_main_weather(df['天气代码'], groups, 3)
+        self.assertEqual(modes.tolist(), ['2 (多云)', '61 (小雨)', None])
+
+
+if __name__ == '__main__':
+    unittest.main()